@@ -164,6 +164,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcAntiAffinityPolicy:
 
@@ -219,6 +227,11 @@ class ClcAntiAffinityPolicy:
         else:
             changed, policy = self._ensure_policy_is_present(p)
 
+        if changed and clc_common:
+            # clc_server looks anti affinity policies up by name from the lookup cache
+            clc_common.LookupCache('aa_policies').invalidate(
+                [self.clc.ALIAS])
+
         if hasattr(policy, 'data'):
             policy = policy.data
         elif hasattr(policy, '__dict__'):
@@ -249,6 +262,9 @@ class ClcAntiAffinityPolicy:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -338,8 +354,10 @@ class ClcAntiAffinityPolicy:
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
@@ -207,6 +207,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcAlertPolicy:
 
@@ -275,6 +283,10 @@ class ClcAlertPolicy:
         else:
             changed, policy = self._ensure_alert_policy_is_absent()
 
+        if changed and clc_common:
+            # clc_server looks alert policies up by name from the lookup cache
+            clc_common.LookupCache('alert_policies').invalidate([p['alias']])
+
         self.module.exit_json(changed=changed, policy=policy)
 
     def _set_clc_credentials_from_env(self):
@@ -300,6 +312,9 @@ class ClcAlertPolicy:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -525,8 +540,10 @@ class ClcAlertPolicy:
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
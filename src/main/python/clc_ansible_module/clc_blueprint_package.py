@@ -128,6 +128,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcBlueprintPackage:
 
@@ -169,7 +177,10 @@ class ClcBlueprintPackage:
             changed, changed_server_ids, request_list = self.ensure_package_installed(
                 server_ids, package_id, package_params)
             self._wait_for_requests_to_complete(request_list)
-        self.module.exit_json(changed=changed, server_ids=changed_server_ids)
+        result = dict(changed=changed, server_ids=changed_server_ids)
+        if clc_common:
+            clc_common.add_wait_stats(self.module, result)
+        self.module.exit_json(**result)
 
     @staticmethod
     def define_argument_spec():
@@ -244,6 +255,12 @@ class ClcBlueprintPackage:
         """
         if not self.module.params['wait']:
             return
+        if clc_common:
+            outcome = clc_common.get_request_waiter(self.module).wait(request_lst)
+            if outcome['failed'] or outcome['pending']:
+                self.module.fail_json(
+                    msg='Unable to process package install request')
+            return
         for request in request_lst:
             request.WaitUntilComplete()
             for request_details in request.requests:
@@ -286,6 +303,9 @@ class ClcBlueprintPackage:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -293,8 +313,10 @@ class ClcBlueprintPackage:
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
@@ -0,0 +1,1162 @@
+#!/usr/bin/env python
+
+# CenturyLink Cloud Ansible Modules.
+#
+# These Ansible modules enable the CenturyLink Cloud v2 API to be called
+# from an within Ansible Playbook.
+#
+# This file is part of CenturyLink Cloud, and is maintained
+# by the Workflow as a Service Team
+#
+# Copyright 2015 CenturyLink
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# CenturyLink Cloud: http://www.CenturyLinkCloud.com
+# API Documentation: https://www.centurylinkcloud.com/api-docs/v2/
+#
+
+"""
+Helpers shared by the CenturyLink Cloud Ansible modules.
+
+This is not a module itself.  The modules import it from the installed
+clc_ansible_module package, and keep their previous behaviour when it can not
+be imported.
+
+Bearer token cache
+------------------
+Every task used to log in to the v2 API with the username and password.  The
+login response is now cached on disk, keyed by endpoint, username and password,
+and reused by every task until it is older than the cache ttl.  Concurrent tasks
+wait on a file lock so that only one of them logs in.  When the API rejects a
+token, because it was revoked or the password changed, it is dropped from the
+cache and the call is made again after a new login.
+
+    export CLC_TOKEN_CACHE_PATH=<directory to store tokens in, default ~/.ansible/tmp/clc_tokens>
+    export CLC_TOKEN_CACHE_TTL=<seconds a token is reused, default 86400, 0 disables the cache>
+
+HTTP client
+-----------
+ClcSession is the requests session the modules hand to the clc-sdk, and use for
+their own API calls.  It keeps a pool of keep-alive connections, applies a default
+timeout, retries throttled (429) and failed calls with a jittered exponential
+backoff, and accounts for the number and latency of the calls it makes.  Calls that
+change state are only retried when the API can not have acted on them.  The
+clc-sdk rewrites the Authorization and content-type headers of its session before
+every call, so each thread works on its own copy of the session headers, and the
+calls of one thread can not change the headers of another thread's call.  The
+counters of the session set_user_agent hands the clc-sdk are added to the module
+result as api_stats.
+
+    export CLC_API_TIMEOUT=<seconds to wait for a response, default 120>
+    export CLC_API_RETRIES=<number of retries of a failed call, default 3>
+    export CLC_API_POOL_SIZE=<number of keep-alive connections, default 25>
+
+Request waiter
+--------------
+RequestWaiter waits for the queued requests of many clc-sdk Requests together,
+instead of one WaitUntilComplete loop after another.  Every poll interval the
+status of each outstanding request is read once, the calls made concurrently
+over the pooled connections.  The interval grows while no request completes
+and as the requests age, and waiting stops at an overall deadline.  The number
+of status calls, their average latency and the total time waited are added to
+the module result as wait_stats.  A function can be called as the requests of
+each job complete, to queue the next steps of that job into the same sweeps.
+
+    export CLC_WAIT_TIMEOUT=<seconds to wait for queued requests, default 7200>
+
+RequestWaiter.poll waits for a single resource, like a new server, to become
+visible in the API.  The interval between attempts grows from 1 to at most 15
+seconds, with jitter, until an overall deadline.
+
+    export CLC_RESOLVE_TIMEOUT=<seconds to wait for a resource, default 900>
+
+Parallel calls
+--------------
+parallel_map makes independent API calls, like the POSTs of a multi server
+build, concurrently instead of one after another.
+
+    export CLC_API_CONCURRENCY=<number of calls made at once, default 10>
+
+Lookup cache
+------------
+LookupCache memoizes values looked up from the API, like the templates and
+networks of a datacenter or the policies of an account, for the rest of the run
+and on disk for the next tasks, until they are older than the cache ttl.  A
+search that finds nothing in a cached value looks it up again, and the modules
+that change a cached value invalidate it explicitly.
+
+GroupIndex indexes a datacenter's group tree by id, name and description, so
+that finding a group takes one lookup instead of a tree walk.  The index is
+built in memory once per run.  The group tree is only persisted on disk for the
+next tasks when its own ttl is set, and clc_group invalidates it when it
+creates or deletes a group.
+
+    export CLC_LOOKUP_CACHE_PATH=<directory to store lookups in, default ~/.ansible/tmp/clc_cache>
+    export CLC_LOOKUP_CACHE_TTL=<seconds a lookup is reused, default 300, 0 disables the cache>
+    export CLC_GROUP_CACHE_TTL=<seconds a persisted group tree is reused, default 0, not persisted>
+"""
+
+__version__ = '${version}'
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+TOKEN_CACHE_PATH_DEFAULT = '~/.ansible/tmp/clc_tokens'
+# Bearer tokens are valid for two weeks, refresh them well before that
+TOKEN_CACHE_TTL_DEFAULT = 86400
+
+LOOKUP_CACHE_PATH_DEFAULT = '~/.ansible/tmp/clc_cache'
+LOOKUP_CACHE_TTL_DEFAULT = 300
+GROUP_CACHE_TTL_DEFAULT = 0
+
+API_TIMEOUT_DEFAULT = 120
+API_CONNECT_TIMEOUT = 10
+API_RETRIES_DEFAULT = 3
+API_POOL_SIZE_DEFAULT = 25
+API_CONCURRENCY_DEFAULT = 10
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+POLL_FREQ = 2
+MAX_POLL_FREQ = 30
+WAIT_TIMEOUT_DEFAULT = 7200
+# The sdk reports None until the first status call succeeds
+PENDING_STATUSES = (None, 'notStarted', 'executing', 'resumed', 'queued', 'running')
+# Seconds between sweeps per second waited, e.g. a sweep every 10s after waiting 100s
+AGE_POLL_FACTOR = 0.1
+RESOLVE_BACKOFF_BASE = 1
+RESOLVE_BACKOFF_CAP = 15
+RESOLVE_TIMEOUT_DEFAULT = 900
+
+_THREAD_CALLS = threading.local()
+_API_SESSION = None
+_WAITERS = weakref.WeakKeyDictionary()
+_WAITERS_LOCK = threading.Lock()
+_LOOKUPS = {}
+_GROUP_INDEXES = {}
+_LOOKUPS_LOCK = threading.Lock()
+
+
+def get_login(api_url, username, password, login, rejected_token=None):
+    """
+    Return the login response for a user, reusing a cached bearer token while it is valid
+    :param api_url: the v2 API endpoint
+    :param username: the Control Portal username
+    :param password: the Control Portal password
+    :param login: function that logs in and returns the login response
+    :param rejected_token: a bearer token the API rejected, which is dropped from the cache
+    :return: dictionary with the bearerToken, accountAlias and locationAlias
+    """
+    ttl = _get_env_int('CLC_TOKEN_CACHE_TTL', TOKEN_CACHE_TTL_DEFAULT)
+    cache_file = None
+    if ttl > 0 and isinstance(api_url, string_types):
+        cache_file = _get_token_cache_file(api_url, username, password)
+    if cache_file is None:
+        return login()
+
+    token = _read_token(cache_file, ttl)
+    if token is not None and token['bearerToken'] != rejected_token:
+        return token
+
+    with _lock(cache_file):
+        # Another task may have logged in while we waited on the lock
+        token = _read_token(cache_file, ttl)
+        if token is None or token['bearerToken'] == rejected_token:
+            _remove_token(cache_file)
+            token = login()
+            _write_token(cache_file, token)
+    return token
+
+
+def set_cached_login(clc, username, password):
+    """
+    Give the clc-sdk a cached bearer token so that it does not log in again.  The
+    credentials must already be set on the sdk.  When no token can be found the sdk
+    is left to log in by itself on its first call, and reports any login error then.
+    :param clc: the clc-sdk instance to use
+    :param username: the Control Portal username
+    :param password: the Control Portal password
+    :return: none
+    """
+    def login():
+        clc.v2.API._Login()
+        return {'bearerToken': clc._LOGIN_TOKEN_V2,
+                'accountAlias': clc.ALIAS,
+                'locationAlias': clc.LOCATION}
+
+    def set_login(token):
+        clc._LOGIN_TOKEN_V2 = token['bearerToken']
+        clc.ALIAS = token['accountAlias']
+        clc.LOCATION = token['locationAlias']
+
+    api_url = clc.defaults.ENDPOINT_URL_V2
+    try:
+        token = get_login(api_url, username, password, login)
+    except Exception:
+        return
+
+    set_login(token)
+    set_login_renewal(getattr(clc, '_REQUESTS_SESSION', None),
+                      api_url, username, password, login, set_login)
+
+
+def set_login_renewal(session, api_url, username, password, login, on_login):
+    """
+    Have a ClcSession log in again when the API rejects the bearer token of a call, like
+    a cached token that was revoked or whose password changed.  The rejected token is
+    dropped from the cache, and the call is made once more with the new token.
+    :param session: the ClcSession the calls are made with
+    :param api_url: the v2 API endpoint
+    :param username: the Control Portal username
+    :param password: the Control Portal password
+    :param login: function that logs in and returns the login response
+    :param on_login: function called with the new login response
+    :return: none
+    """
+    def renew_login(rejected_token):
+        try:
+            token = get_login(api_url, username, password, login, rejected_token)
+        except Exception:
+            return None
+        on_login(token)
+        return token['bearerToken']
+
+    if isinstance(session, ClcSession):
+        session.renew_login = renew_login
+
+
+def get_session(agent_string):
+    """
+    Return a ClcSession identifying itself as the given api client
+    :param agent_string: the api client name and version
+    :return: the ClcSession
+    """
+    session = ClcSession()
+    headers = session.headers
+    headers.update({"Api-Client": agent_string})
+    headers['User-Agent'] += " " + agent_string
+    session.headers = headers
+    return session
+
+
+def set_user_agent(clc, agent_string):
+    """
+    Hand the clc-sdk a ClcSession identifying itself as the given api client.  Its
+    call counters are added to the module result by add_wait_stats.
+    :param clc: the clc-sdk instance to use
+    :param agent_string: the api client name and version
+    :return: none
+    """
+    global _API_SESSION
+    if hasattr(clc, 'SetRequestsSession'):
+        _API_SESSION = get_session(agent_string)
+        clc.SetRequestsSession(_API_SESSION)
+
+
+def get_thread_api_calls():
+    """
+    Return the number of API calls made by the current thread, with any ClcSession
+    :return: the number of calls
+    """
+    return getattr(_THREAD_CALLS, 'count', 0)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """
+    Return a random delay before the next attempt, drawn from an exponentially
+    growing window so that concurrent clients do not retry in lock step
+    :param attempt: the number of attempts made so far, starting at 0
+    :param base: the window of the first retry, in seconds
+    :param cap: the largest window, in seconds
+    :return: the delay in seconds
+    """
+    # The window reaches any sensible cap long before 2 ** 32
+    return random.uniform(0, min(cap, base * 2 ** min(attempt, 32)))
+
+
+class ClcSession(requests.Session if requests else object):
+    """
+    requests session with a pool of keep-alive connections, a default timeout,
+    jittered retries and latency accounting.  Its headers are per thread.
+    """
+
+    def __init__(self, pool_size=None, timeout=None, retries=None):
+        """
+        Construct the session.  Unset settings are read from the environment.
+        :param pool_size: the number of keep-alive connections to keep per host
+        :param timeout: the number of seconds to wait for a response
+        :param retries: the number of times a failed call is retried
+        """
+        super(ClcSession, self).__init__()
+        pool_size = pool_size or _get_env_int('CLC_API_POOL_SIZE', API_POOL_SIZE_DEFAULT)
+        timeout = timeout or _get_env_int('CLC_API_TIMEOUT', API_TIMEOUT_DEFAULT)
+        self.timeout = (min(API_CONNECT_TIMEOUT, timeout), timeout)
+        self.retries = retries if retries is not None else _get_env_int(
+            'CLC_API_RETRIES', API_RETRIES_DEFAULT)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.stats = {'calls': 0, 'retries': 0, 'errors': 0, 'time': 0.0, 'max_time': 0.0}
+        self._stats_lock = threading.Lock()
+        self.renew_login = None
+        self._renewed_tokens = {}
+        self._renew_lock = threading.RLock()
+
+    @property
+    def headers(self):
+        """
+        The headers of the calls made by the current thread, a copy of the session
+        headers taken the first time the thread uses them
+        :return: the requests CaseInsensitiveDict of headers
+        """
+        headers = getattr(self._thread_headers, 'headers', None)
+        if headers is None:
+            headers = self._thread_headers.headers = requests.structures.CaseInsensitiveDict(
+                self._headers)
+        return headers
+
+    @headers.setter
+    def headers(self, headers):
+        """
+        Set the session headers every thread starts from
+        :param headers: dictionary of headers
+        :return: none
+        """
+        self._headers = headers
+        self._thread_headers = threading.local()
+
+    def request(self, method, url, **kwargs):
+        """
+        Make a call, retrying it while it fails with a retryable error
+        :param method: the HTTP method
+        :param url: the url to call
+        :param kwargs: the arguments of requests.Session.request
+        :return: the requests.Response
+        """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        renewed = False
+        while True:
+            start = time.time()
+            response = error = None
+            try:
+                response = super(ClcSession, self).request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ex:
+                error = ex
+            self._account(time.time() - start, response)
+
+            if (not renewed and response is not None and response.status_code == 401 and
+                    self._renew_authorization(kwargs)):
+                renewed = True
+                continue
+
+            if attempt >= self.retries or not self._is_retryable(response, error, idempotent):
+                if error is not None:
+                    raise error
+                return response
+
+            delay = backoff_delay(attempt)
+            if response is not None:
+                delay = max(delay, _get_retry_after(response))
+            with self._stats_lock:
+                self.stats['retries'] += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def get_stats(self):
+        """
+        Return a summary of the calls made with this session
+        :return: dictionary of the number of calls, retries and errors, and their latency in seconds
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['avg_time'] = stats['time'] / stats['calls'] if stats['calls'] else 0.0
+        return stats
+
+    def _renew_authorization(self, kwargs):
+        """
+        Log in again after the API rejected the bearer token of a call, and give the call
+        the new token.  The calls rejected with the same token share one new login.
+        :param kwargs: the arguments of the rejected call, updated with the new token
+        :return: True if the call can be made again with a new token
+        """
+        headers = kwargs.get('headers') or {}
+        authorization = headers.get('Authorization') or self.headers.get('Authorization')
+        if self.renew_login is None or not authorization:
+            return False
+
+        rejected_token = authorization.split(' ')[-1]
+        with self._renew_lock:
+            # A token of a new login that is rejected too is not renewed again, and the
+            # login itself must not try to log in again
+            if (rejected_token not in self._renewed_tokens and
+                    rejected_token not in self._renewed_tokens.values()):
+                self._renewed_tokens[rejected_token] = None
+                self._renewed_tokens[rejected_token] = self.renew_login(rejected_token)
+            token = self._renewed_tokens.get(rejected_token)
+        if not token or token == rejected_token:
+            return False
+
+        authorization = 'Bearer ' + token
+        if 'Authorization' in headers:
+            kwargs['headers'] = dict(headers, Authorization=authorization)
+        if 'Authorization' in self.headers:
+            self.headers['Authorization'] = authorization
+        return True
+
+    def _account(self, elapsed, response):
+        """
+        Record the latency and outcome of a single call
+        :param elapsed: the number of seconds the call took
+        :param response: the requests.Response, or None if the call raised
+        :return: none
+        """
+        _THREAD_CALLS.count = getattr(_THREAD_CALLS, 'count', 0) + 1
+        with self._stats_lock:
+            self.stats['calls'] += 1
+            self.stats['time'] += elapsed
+            self.stats['max_time'] = max(self.stats['max_time'], elapsed)
+            if response is None or response.status_code >= 400:
+                self.stats['errors'] += 1
+
+    @staticmethod
+    def _is_retryable(response, error, idempotent):
+        """
+        Check whether a failed call can safely be made again.  Throttled calls and
+        calls that never connected were not acted on, other failures are only
+        retried for methods that can be repeated without side effects.
+        :param response: the requests.Response, or None if the call raised
+        :param error: the exception raised by the call, if any
+        :param idempotent: whether the HTTP method can be repeated safely
+        :return: True if the call should be retried
+        """
+        if error is not None:
+            return idempotent or isinstance(error, requests.exceptions.ConnectTimeout)
+        if response.status_code == 429:
+            return True
+        return idempotent and response.status_code in RETRY_STATUS_CODES
+
+
+class PollTimeout(Exception):
+    """
+    Raised by RequestWaiter.poll when a resource is not ready in the attempts or time allowed
+    """
+
+    def __init__(self, attempts):
+        super(PollTimeout, self).__init__('Not ready after {0} attempts'.format(attempts))
+        self.attempts = attempts
+
+
+class RequestWaiter(object):
+    """
+    Wait for many clc-sdk queue requests at once, with an adaptive poll interval
+    and an overall deadline
+    """
+
+    def __init__(self, poll_freq=POLL_FREQ, max_poll_freq=MAX_POLL_FREQ, timeout=None, pool_size=None):
+        """
+        Construct the waiter
+        :param poll_freq: the shortest number of seconds between two status sweeps
+        :param max_poll_freq: the longest number of seconds between two status sweeps
+        :param timeout: the number of seconds to wait in total, read from CLC_WAIT_TIMEOUT if unset
+        :param pool_size: the number of status calls made at once, read from CLC_API_POOL_SIZE if unset
+        """
+        self.poll_freq = poll_freq
+        self.max_poll_freq = max_poll_freq
+        self.timeout = timeout or _get_env_int('CLC_WAIT_TIMEOUT', WAIT_TIMEOUT_DEFAULT)
+        self.pool_size = pool_size or _get_env_int('CLC_API_POOL_SIZE', API_POOL_SIZE_DEFAULT)
+        self.stats = {'polls': 0, 'sweeps': 0, 'poll_time': 0.0, 'wait_time': 0.0,
+                      'resolves': 0, 'resolve_attempts': 0, 'resolve_time': 0.0}
+        self._stats_lock = threading.Lock()
+        self._active = {'wait_time': 0, 'resolve_time': 0}
+        self._active_since = {}
+
+    def wait(self, requests_lst, on_complete=None):
+        """
+        Block until every queued request has completed or the deadline has passed
+        :param requests_lst: list of clc-sdk Requests, as returned by the calls that queue work
+        :param on_complete: function called after a sweep with the list of the Requests of requests_lst
+                 whose requests all succeeded in it.  It may return a list of further Requests, which
+                 are waited for in the same sweeps.
+        :return: dictionary of the clc-sdk Request objects that 'succeeded', 'failed',
+                 or were still 'pending' at the deadline
+        """
+        # Every pending request is kept with the index of its Requests in requests_lst, or None
+        pending = [(request, index) for index, requests in enumerate(requests_lst)
+                   for request in requests.requests]
+        remaining = [len(requests.requests) for requests in requests_lst]
+        completed_requests = [requests for requests in requests_lst if not requests.requests]
+        outcome = {'succeeded': [], 'failed': [], 'pending': []}
+        started = time.time()
+        deadline = started + self.timeout
+        interval = self.poll_freq
+        pool = None
+        pool_size = self.pool_size if on_complete else min(self.pool_size, len(pending))
+        if pool_size > 1:
+            pool = ThreadPool(pool_size)
+        self._start_timer('wait_time')
+        try:
+            if on_complete and completed_requests:
+                pending.extend(self._get_pending(on_complete(completed_requests)))
+            while pending:
+                still_pending = []
+                completed_requests = []
+                statuses = self._sweep(pool, [request for request, index in pending])
+                for (request, index), status in zip(pending, statuses):
+                    if status in PENDING_STATUSES:
+                        still_pending.append((request, index))
+                        continue
+                    if status == 'succeeded':
+                        outcome['succeeded'].append(request)
+                    else:
+                        outcome['failed'].append(request)
+                    if index is not None:
+                        # A failed request never lets its Requests complete
+                        remaining[index] = remaining[index] - 1 if status == 'succeeded' else -1
+                        if remaining[index] == 0:
+                            completed_requests.append(requests_lst[index])
+
+                completed = len(still_pending) < len(pending)
+                pending = still_pending
+                if on_complete and completed_requests:
+                    pending.extend(self._get_pending(on_complete(completed_requests)))
+                if not pending:
+                    break
+                now = time.time()
+                # Poll quickly while requests are completing, and back off while they are not.
+                # Long running jobs are polled less often the longer they have been running.
+                interval = self.poll_freq if completed else min(self.max_poll_freq, interval * 1.5)
+                interval = max(interval, min(self.max_poll_freq, (now - started) * AGE_POLL_FACTOR))
+                if now + interval > deadline:
+                    outcome['pending'] = [request for request, index in pending]
+                    break
+                time.sleep(interval)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            self._stop_timer('wait_time')
+        return outcome
+
+    @staticmethod
+    def _get_pending(requests_lst):
+        """
+        Return the requests queued by an on_complete function, to wait for
+        :param requests_lst: list of clc-sdk Requests, or None
+        :return: list of the clc-sdk Request objects, each with the index None
+        """
+        return [(request, None) for requests in requests_lst or [] for request in requests.requests]
+
+    def poll(self, func, is_retryable=None, attempts=None, timeout=None):
+        """
+        Call a function until it returns a resource, sleeping a growing, capped and
+        jittered interval between the calls.  Used to wait for a resource, like a new
+        server, to become visible in the API.
+        :param func: function that returns the resource, or None while it is not ready
+        :param is_retryable: function that returns whether an exception raised by func is retried
+        :param attempts: the most calls to make, unlimited if unset
+        :param timeout: the number of seconds to keep calling, read from CLC_RESOLVE_TIMEOUT if unset
+        :return: the resource
+        :raises: the last exception raised by func, or PollTimeout, once out of attempts or time
+        """
+        timeout = timeout or _get_env_int('CLC_RESOLVE_TIMEOUT', RESOLVE_TIMEOUT_DEFAULT)
+        deadline = time.time() + timeout
+        attempt = 0
+        self._start_timer('resolve_time')
+        try:
+            while True:
+                attempt += 1
+                error = None
+                try:
+                    result = func()
+                    if result is not None:
+                        return result
+                except Exception as ex:
+                    if not is_retryable or not is_retryable(ex):
+                        raise
+                    error = ex
+
+                delay = backoff_delay(attempt - 1, RESOLVE_BACKOFF_BASE, RESOLVE_BACKOFF_CAP)
+                if (attempts and attempt >= attempts) or time.time() + delay > deadline:
+                    if error is not None:
+                        raise error
+                    raise PollTimeout(attempt)
+                time.sleep(delay)
+        finally:
+            with self._stats_lock:
+                self.stats['resolves'] += 1
+                self.stats['resolve_attempts'] += attempt
+            self._stop_timer('resolve_time')
+
+    def get_stats(self):
+        """
+        Return the polling counters of this waiter
+        :return: dictionary with the status calls made, their average latency and the total time waited
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['avg_poll_latency'] = stats['poll_time'] / stats['polls'] if stats['polls'] else 0.0
+        return stats
+
+    def _start_timer(self, key):
+        """
+        Start timing a wait.  The waits of concurrent threads are timed together, so that
+        the counter is the elapsed wall time rather than the sum of overlapping waits.
+        :param key: the stats counter to add the elapsed time to
+        :return: none
+        """
+        with self._stats_lock:
+            if not self._active[key]:
+                self._active_since[key] = time.time()
+            self._active[key] += 1
+
+    def _stop_timer(self, key):
+        """
+        Stop timing a wait, adding the elapsed time to the counter once no other thread is waiting
+        :param key: the stats counter to add the elapsed time to
+        :return: none
+        """
+        with self._stats_lock:
+            self._active[key] -= 1
+            if not self._active[key]:
+                self.stats[key] += time.time() - self._active_since[key]
+
+    def _sweep(self, pool, pending):
+        """
+        Read the status of every outstanding request once, over the pooled API connections
+        :param pool: the ThreadPool to make the status calls in, None to make them in this thread
+        :param pending: list of clc-sdk Request objects
+        :return: list of statuses, in the order of pending
+        """
+        with self._stats_lock:
+            self.stats['sweeps'] += 1
+        if pool is None:
+            return [self._get_status(request) for request in pending]
+        return pool.map(self._get_status, pending)
+
+    def _get_status(self, request):
+        """
+        Read the current status of a queued request
+        :param request: the clc-sdk Request
+        :return: the status, 'failed' if it can not be read
+        """
+        start = time.time()
+        try:
+            return request.Status()
+        except Exception:
+            # The sdk raises for any failed status call but a 500, which it retries itself
+            return 'failed'
+        finally:
+            with self._stats_lock:
+                self.stats['polls'] += 1
+                self.stats['poll_time'] += time.time() - start
+
+
+def get_request_waiter(module):
+    """
+    Return the RequestWaiter of an Ansible module run, so that its counters cover every wait of the run
+    :param module: the AnsibleModule object
+    :return: the RequestWaiter
+    """
+    with _WAITERS_LOCK:
+        waiter = _WAITERS.get(module)
+        if waiter is None:
+            waiter = _WAITERS[module] = RequestWaiter()
+        return waiter
+
+
+def add_wait_stats(module, result):
+    """
+    Add the polling counters of an Ansible module run to its result, if it waited on any requests,
+    and the call counters of the clc-sdk session as api_stats, if it made any calls
+    :param module: the AnsibleModule object
+    :param result: the dictionary to pass to exit_json
+    :return: the result
+    """
+    if _API_SESSION is not None:
+        stats = _API_SESSION.get_stats()
+        if stats['calls']:
+            result['api_stats'] = {
+                'calls': stats['calls'],
+                'retries': stats['retries'],
+                'errors': stats['errors'],
+                'avg_time': round(stats['avg_time'], 3),
+                'max_time': round(stats['max_time'], 3)}
+    waiter = _WAITERS.get(module)
+    if waiter is None:
+        return result
+    stats = waiter.get_stats()
+    if stats['sweeps']:
+        result.setdefault('wait_stats', {}).update({
+            'polls': stats['polls'],
+            'avg_poll_latency': round(stats['avg_poll_latency'], 3),
+            'wait_time': round(stats['wait_time'], 3)})
+    if stats['resolves']:
+        result.setdefault('wait_stats', {}).update({
+            'resolve_attempts': stats['resolve_attempts'],
+            'resolve_time': round(stats['resolve_time'], 3)})
+    return result
+
+
+class LookupCache(object):
+    """
+    Values looked up from the API, memoized for the run and persisted for the cache ttl
+    """
+
+    def __init__(self, namespace, ttl=None):
+        """
+        Construct the cache
+        :param namespace: the kind of value cached, like 'groups'
+        :param ttl: the number of seconds a value is reused, read from CLC_LOOKUP_CACHE_TTL if unset
+        """
+        self.namespace = namespace
+        self.ttl = ttl if ttl is not None else _get_env_int('CLC_LOOKUP_CACHE_TTL', LOOKUP_CACHE_TTL_DEFAULT)
+
+    def get(self, key, lookup):
+        """
+        Return a cached value, or look it up and cache it
+        :param key: list of strings identifying the value, like the account alias and datacenter
+        :param lookup: function that looks the value up from the API, and returns None if it is missing
+        :return: the value
+        """
+        return self._get(key, lookup)[0]
+
+    def find(self, key, lookup, match):
+        """
+        Search a cached value, or look it up and cache it.  A cached value with no
+        match is looked up again, since what is searched for may be newer than the cache.
+        :param key: list of strings identifying the value, like the account alias and datacenter
+        :param lookup: function that looks the value up from the API, and returns None if it is missing
+        :param match: function that searches the value, and returns None if nothing matches
+        :return: the match, or None
+        """
+        value, from_cache = self._get(key, lookup)
+        result = match(value) if value is not None else None
+        if result is None and from_cache:
+            self.invalidate(key)
+            value = self._get(key, lookup)[0]
+            result = match(value) if value is not None else None
+        return result
+
+    def _get(self, key, lookup):
+        """
+        Return a cached value, or look it up and cache it
+        :param key: list of strings identifying the value
+        :param lookup: function that looks the value up from the API
+        :return: tuple of the value and whether it was read from the cache
+        """
+        if not self._is_cacheable(key):
+            return lookup(), False
+        memo_key = (self.namespace,) + tuple(key)
+        with _LOOKUPS_LOCK:
+            cached = _LOOKUPS.get(memo_key)
+        if cached is not None and 0 <= time.time() - cached[0] < self.ttl:
+            return cached[1], True
+
+        cache_file = self._get_cache_file(key)
+        cached = _read_lookup(cache_file, self.ttl) if cache_file else None
+        from_cache = cached is not None
+        if cached is None:
+            cached = (time.time(), lookup())
+            if cached[1] is None:
+                return None, False
+            if cache_file:
+                _write_lookup(cache_file, cached)
+        with _LOOKUPS_LOCK:
+            _LOOKUPS[memo_key] = cached
+        return cached[1], from_cache
+
+    def invalidate(self, key):
+        """
+        Forget a cached value, so that the next get looks it up again
+        :param key: list of strings identifying the value
+        :return: none
+        """
+        if not self._is_cacheable(key):
+            return
+        with _LOOKUPS_LOCK:
+            _LOOKUPS.pop((self.namespace,) + tuple(key), None)
+        cache_file = self._get_cache_file(key, create=False)
+        if cache_file:
+            try:
+                os.remove(cache_file)
+            except OSError:
+                pass
+
+    def _is_cacheable(self, key):
+        """
+        Return whether values with this key are cached at all
+        :param key: list of strings identifying the value
+        :return: boolean
+        """
+        return self.ttl > 0 and all(isinstance(part, string_types) for part in key)
+
+    def _get_cache_file(self, key, create=True):
+        """
+        Return the path of the file a value is persisted in.  The directory is read from
+        the CLC_LOOKUP_CACHE_PATH env var and created, readable by the owner only, if missing.
+        :param key: list of strings identifying the value
+        :param create: whether to create the cache directory
+        :return: path of the cache file, or None if the cache directory can not be created
+        """
+        cache_dir = os.path.expanduser(
+            os.environ.get('CLC_LOOKUP_CACHE_PATH', LOOKUP_CACHE_PATH_DEFAULT))
+        try:
+            if create:
+                os.makedirs(cache_dir, 0o700)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                return None
+        cache_key = '|'.join(key)
+        if not isinstance(cache_key, bytes):
+            cache_key = cache_key.encode('utf-8')
+        cache_key = hashlib.sha256(cache_key).hexdigest()
+        return os.path.join(cache_dir, 'clc_{0}_{1}.json'.format(self.namespace, cache_key[:32]))
+
+
+class GroupIndex(object):
+    """
+    Index of the groups of a datacenter by id, name and description
+    """
+
+    def __init__(self, root_group_data):
+        """
+        Index the group tree of a datacenter.  Like a search of the tree, the group
+        closest to the root wins when several groups share a name or description.
+        :param root_group_data: the data of the datacenter's root group, with its nested groups
+        """
+        self._groups = {}
+        self._parents = {}
+        level = [(group, None) for group in root_group_data.get('groups', [])]
+        while level:
+            next_level = []
+            for group, parent in level:
+                self._parents[group['id']] = parent
+                for key in (group.get('id'), group.get('name'), group.get('description')):
+                    if key:
+                        self._groups.setdefault(key.lower(), group)
+                next_level.extend((subgroup, group) for subgroup in group.get('groups', []))
+            level = next_level
+
+    def get(self, key):
+        """
+        Find a group by its id, name or description
+        :param key: the id, name or description, in any case
+        :return: the group's data, or None if there is no such group
+        """
+        return self._groups.get(key.lower()) if key else None
+
+    def get_parents(self, group_id):
+        """
+        Return the chain of parents of a group, nearest first, up to a top level group
+        :param group_id: the id of the group
+        :return: list of the data of the parent groups
+        """
+        parents = []
+        parent = self._parents.get(group_id)
+        while parent is not None:
+            parents.append(parent)
+            parent = self._parents.get(parent['id'])
+        return parents
+
+
+def get_group_index(alias, location, get_root_group_data):
+    """
+    Return the group index of a datacenter, built once per run from its group tree.  The
+    group tree is only persisted for the following tasks when CLC_GROUP_CACHE_TTL is set.
+    :param alias: the account alias
+    :param location: the datacenter id
+    :param get_root_group_data: function that returns the data of the datacenter's root group
+    :return: the GroupIndex, or None if the datacenter is unknown or its group tree can not be read
+    """
+    if not all(isinstance(part, string_types) for part in (alias, location)):
+        return None
+    with _LOOKUPS_LOCK:
+        index = _GROUP_INDEXES.get((alias, location))
+    if index is None:
+        root_group_data = _get_group_cache().get([alias, location], get_root_group_data)
+        if root_group_data is None:
+            return None
+        with _LOOKUPS_LOCK:
+            index = _GROUP_INDEXES.setdefault((alias, location), GroupIndex(root_group_data))
+    return index
+
+
+def invalidate_group_index(alias, location):
+    """
+    Forget the group tree of a datacenter, after a group was not found in it or was changed
+    :param alias: the account alias
+    :param location: the datacenter id
+    :return: none
+    """
+    _get_group_cache().invalidate([alias, location])
+    with _LOOKUPS_LOCK:
+        _GROUP_INDEXES.pop((alias, location), None)
+
+
+def _get_group_cache():
+    """
+    Return the cache the group trees of datacenters are persisted in, for CLC_GROUP_CACHE_TTL seconds
+    :return: the LookupCache, that caches nothing unless CLC_GROUP_CACHE_TTL is set
+    """
+    return LookupCache('groups', ttl=_get_env_int('CLC_GROUP_CACHE_TTL', GROUP_CACHE_TTL_DEFAULT))
+
+
+class _DeferredFailure(Exception):
+    """
+    Raised in place of fail_json by a call made from parallel_map
+    """
+
+    def __init__(self, kwargs):
+        super(_DeferredFailure, self).__init__(kwargs.get('msg'))
+        self.kwargs = kwargs
+
+
+def parallel_map(module, func, items, concurrency=None):
+    """
+    Call a function on every item, at most concurrency calls at a time.  A fail_json
+    made by one of the calls ends that call only; once every call has returned, the
+    first failure in the order of items is reported with the module's fail_json.
+    :param module: the AnsibleModule object
+    :param func: function to call with each item
+    :param items: list of items
+    :param concurrency: the number of calls made at once, read from CLC_API_CONCURRENCY if unset
+    :return: list of the results in the order of items, None for the calls that failed
+    """
+    items = list(items)
+    concurrency = concurrency or _get_env_int('CLC_API_CONCURRENCY', API_CONCURRENCY_DEFAULT)
+    concurrency = min(concurrency, len(items))
+
+    def defer_failure(**kwargs):
+        raise _DeferredFailure(kwargs)
+
+    def call(item):
+        try:
+            return func(item), None
+        except _DeferredFailure as failure:
+            return None, failure.kwargs
+
+    fail_json = module.fail_json
+    # fail_json exits the process, which a worker thread can not do.  Keep the
+    # calls from writing several results and report the first failure instead.
+    module.fail_json = defer_failure
+    try:
+        if concurrency > 1:
+            pool = ThreadPool(concurrency)
+            try:
+                results = pool.map(call, items)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [call(item) for item in items]
+    finally:
+        module.fail_json = fail_json
+
+    failures = [failure for result, failure in results if failure is not None]
+    if failures:
+        fail_json(**failures[0])
+    return [result for result, failure in results]
+
+
+def _get_retry_after(response):
+    """
+    Read the number of seconds the API asked to wait before retrying
+    :param response: the requests.Response
+    :return: the number of seconds, 0 if the API did not say, capped at BACKOFF_CAP
+    """
+    try:
+        return min(BACKOFF_CAP, max(0, float(response.headers.get('Retry-After', 0))))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _get_env_int(name, default):
+    """
+    Read an integer environment variable
+    :param name: name of the environment variable
+    :param default: value to use when the variable is unset or not an integer
+    :return: the integer value
+    """
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _get_token_cache_file(api_url, username, password):
+    """
+    Return the path of the token cache file for a user.  The directory is read from
+    the CLC_TOKEN_CACHE_PATH env var and created, readable by the owner only, if missing.
+    :param api_url: the v2 API endpoint
+    :param username: the Control Portal username
+    :param password: the Control Portal password
+    :return: path of the cache file, or None if the cache directory can not be created
+    """
+    cache_dir = os.path.expanduser(
+        os.environ.get('CLC_TOKEN_CACHE_PATH', TOKEN_CACHE_PATH_DEFAULT))
+    try:
+        os.makedirs(cache_dir, 0o700)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            return None
+
+    # Key by password too, so that a changed or mistyped password never reuses another login
+    cache_key = '|'.join([api_url, username, password])
+    if not isinstance(cache_key, bytes):
+        cache_key = cache_key.encode('utf-8')
+    cache_key = hashlib.sha256(cache_key).hexdigest()
+    return os.path.join(cache_dir, 'clc_token_' + cache_key[:32] + '.json')
+
+
+def _read_token(cache_file, ttl):
+    """
+    Return the cached login response if it is younger than the ttl
+    :param cache_file: path of the cache file
+    :param ttl: number of seconds a token is reused
+    :return: the login response, or None if it is missing, expired or unreadable
+    """
+    try:
+        with open(cache_file) as f:
+            token = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(token, dict) or not isinstance(token.get('bearerToken'), string_types):
+        return None
+    if not 0 <= time.time() - token.get('created', 0) < ttl:
+        return None
+    return token
+
+
+def _remove_token(cache_file):
+    """
+    Remove the cached login response, if there is one
+    :param cache_file: path of the cache file
+    :return: none
+    """
+    try:
+        os.remove(cache_file)
+    except OSError:
+        pass
+
+
+def _write_token(cache_file, token):
+    """
+    Atomically replace the cached login response.  The file is readable by the owner only.
+    :param cache_file: path of the cache file
+    :param token: the login response to cache
+    :return: none
+    """
+    if not isinstance(token.get('bearerToken'), string_types):
+        return  # Never cache a failed login
+    try:
+        token = {'bearerToken': token['bearerToken'],
+                 'accountAlias': token['accountAlias'],
+                 'locationAlias': token['locationAlias'],
+                 'created': time.time()}
+        output = json.dumps(token)
+    except (KeyError, TypeError):
+        return  # Never cache an incomplete login response
+
+    tmp_file = None
+    try:
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(cache_file), prefix='.clc_token_')
+        with os.fdopen(fd, 'w') as f:
+            f.write(output)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _read_lookup(cache_file, ttl):
+    """
+    Return a persisted lookup if it is younger than the ttl
+    :param cache_file: path of the cache file
+    :param ttl: number of seconds a lookup is reused
+    :return: tuple of the time the value was looked up and the value, or None if it is missing, expired or unreadable
+    """
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+        created, value = cached['created'], cached['value']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+    if value is None or not 0 <= time.time() - created < ttl:
+        return None
+    return created, value
+
+
+def _write_lookup(cache_file, cached):
+    """
+    Atomically replace a persisted lookup.  The file is readable by the owner only.
+    :param cache_file: path of the cache file
+    :param cached: tuple of the time the value was looked up and the value
+    :return: none
+    """
+    try:
+        output = json.dumps({'created': cached[0], 'value': cached[1]})
+    except (TypeError, ValueError):
+        return  # Only values the API returned as json are persisted
+
+    tmp_file = None
+    try:
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(cache_file), prefix='.clc_lookup_')
+        with os.fdopen(fd, 'w') as f:
+            f.write(output)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+@contextmanager
+def _lock(cache_file):
+    """
+    Hold an exclusive lock on the cache file while it is rebuilt
+    :param cache_file: path of the cache file
+    :return: none
+    """
+    with open(cache_file + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -206,6 +206,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcFirewallPolicy:
 
@@ -334,6 +342,9 @@ class ClcFirewallPolicy:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -571,6 +582,19 @@ class ClcFirewallPolicy:
         wait = self.module.params.get('wait')
         count = 0
         firewall_policy = None
+        if wait and clc_common:
+            polled = []
+
+            def get_active_firewall_policy():
+                polled.append(self._get_firewall_policy(
+                    source_account_alias, location, firewall_policy_id))
+                return polled[-1] if polled[-1].get('status') == 'active' else None
+
+            try:
+                return clc_common.get_request_waiter(self.module).poll(
+                    get_active_firewall_policy, attempts=wait_limit)
+            except clc_common.PollTimeout:
+                return polled[-1]
         while wait:
             count += 1
             firewall_policy = self._get_firewall_policy(
@@ -585,8 +609,10 @@ class ClcFirewallPolicy:
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
@@ -246,10 +246,19 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcGroup(object):
 
     clc = None
+    datacenter = None
     root_group = None
 
     def __init__(self, module):
@@ -299,7 +308,13 @@ class ClcGroup(object):
             group = group.data
         except AttributeError:
             group = group_name
-        self.module.exit_json(changed=changed, group=group)
+        if changed and not self.module.check_mode and clc_common:
+            # Servers find their group in the group index of the datacenter
+            clc_common.invalidate_group_index(self.datacenter.alias, self.datacenter.id)
+        result = dict(changed=changed, group=group)
+        if clc_common:
+            clc_common.add_wait_stats(self.module, result)
+        self.module.exit_json(**result)
 
     @staticmethod
     def _define_module_argument_spec():
@@ -340,6 +355,9 @@ class ClcGroup(object):
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -460,8 +478,8 @@ class ClcGroup(object):
         :param datacenter: string - the datacenter to walk (ex: 'UC1')
         :return: a dictionary of groups and parents
         """
-        self.root_group = self.clc.v2.Datacenter(
-            location=datacenter).RootGroup()
+        self.datacenter = self.clc.v2.Datacenter(location=datacenter)
+        self.root_group = self.datacenter.RootGroup()
         return self._walk_groups_recursive(
             parent_group=None,
             child_group=self.root_group)
@@ -491,6 +509,12 @@ class ClcGroup(object):
         """
         if not self.module.params['wait']:
             return
+        if clc_common:
+            outcome = clc_common.get_request_waiter(self.module).wait(requests_lst)
+            if outcome['failed'] or outcome['pending']:
+                self.module.fail_json(
+                    msg='Unable to process group request')
+            return
         for request in requests_lst:
             request.WaitUntilComplete()
             for request_details in request.requests:
@@ -500,8 +524,10 @@ class ClcGroup(object):
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
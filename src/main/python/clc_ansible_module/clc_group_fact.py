@@ -199,6 +199,14 @@ except ImportError:
 else:
     REQUESTS_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcGroupFact:
 
@@ -212,6 +220,12 @@ class ClcGroupFact:
             self.module.fail_json(
                 msg='requests library is required for this module')
 
+        if clc_common:
+            self.requests = clc_common.get_session(
+                "ClcAnsibleModule/" + __version__)
+        else:
+            self.requests = requests
+
     def process_request(self):
         """
         Process the request - Main Code Path
@@ -220,7 +234,7 @@ class ClcGroupFact:
         self._set_clc_credentials_from_env()
         group_id = self.module.params.get('group_id')
 
-        r = requests.get(self._get_endpoint(group_id), headers={
+        r = self.requests.get(self._get_endpoint(group_id), headers={
             'Authorization': 'Bearer ' + self.v2_api_token
         })
 
@@ -268,24 +282,49 @@ class ClcGroupFact:
 
         elif v2_api_username and v2_api_passwd:
 
-            r = requests.post(self.api_url + '/v2/authentication/login', json={
-                'username': v2_api_username,
-                'password': v2_api_passwd
-            })
-
-            if r.status_code not in [200]:
-                self.module.fail_json(
-                    msg='Failed to authenticate with clc V2 api.')
-
-            r = r.json()
-            self.v2_api_token = r['bearerToken']
-            self.clc_alias = r['accountAlias']
+            if clc_common:
+                login = lambda: self._login(v2_api_username, v2_api_passwd)
+                r = clc_common.get_login(
+                    self.api_url, v2_api_username, v2_api_passwd, login)
+                clc_common.set_login_renewal(
+                    self.requests, self.api_url, v2_api_username, v2_api_passwd,
+                    login, self._set_login)
+            else:
+                r = self._login(v2_api_username, v2_api_passwd)
+            self._set_login(r)
 
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
                     "environment variables")
 
+    def _set_login(self, r):
+        """
+        Use the bearer token and account alias of a login response
+        :param r: the login response
+        :return: none
+        """
+        self.v2_api_token = r['bearerToken']
+        self.clc_alias = r['accountAlias']
+
+    def _login(self, v2_api_username, v2_api_passwd):
+        """
+        Log in to the v2 API with a username and password
+        :param v2_api_username: the Control Portal username
+        :param v2_api_passwd: the Control Portal password
+        :return: the login response with the bearerToken and accountAlias
+        """
+        r = self.requests.post(self.api_url + '/v2/authentication/login', json={
+            'username': v2_api_username,
+            'password': v2_api_passwd
+        })
+
+        if r.status_code not in [200]:
+            self.module.fail_json(
+                msg='Failed to authenticate with clc V2 api.')
+
+        return r.json()
+
 
 def main():
     """
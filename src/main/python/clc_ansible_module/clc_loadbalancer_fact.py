@@ -169,6 +169,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcLoadbalancerFact:
 
@@ -191,6 +199,19 @@ class ClcLoadbalancerFact:
             self.module.fail_json(
                 msg='requests library  version should be >= 2.5.0')
 
+        self._set_user_agent(self.clc)
+
+    @staticmethod
+    def _set_user_agent(clc):
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
+            ses = requests.Session()
+            ses.headers.update({"Api-Client": agent_string})
+            ses.headers['User-Agent'] += " " + agent_string
+            clc.SetRequestsSession(ses)
+
     def process_request(self):
         """
         Process the request - Main Code Path
@@ -246,6 +267,9 @@ class ClcLoadbalancerFact:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -381,6 +381,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcModifyServer:
     clc = clc_sdk
@@ -429,10 +437,13 @@ class ClcModifyServer:
         (changed, server_dict_array, changed_server_ids) = self._modify_servers(
             server_ids=server_ids)
 
-        self.module.exit_json(
+        result = dict(
             changed=changed,
             server_ids=changed_server_ids,
             servers=server_dict_array)
+        if clc_common:
+            clc_common.add_wait_stats(self.module, result)
+        self.module.exit_json(**result)
 
     @staticmethod
     def _define_module_argument_spec():
@@ -483,6 +494,9 @@ class ClcModifyServer:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -518,10 +532,6 @@ class ClcModifyServer:
             'additional_network': p.get('additional_network'),
         }
         changed = False
-        server_changed = False
-        aa_changed = False
-        ap_changed = False
-        nic_changed = False
         server_dict_array = []
         result_server_ids = []
         request_list = []
@@ -534,32 +544,16 @@ class ClcModifyServer:
         servers = self._get_servers_from_clc(
             server_ids,
             'Failed to obtain server list from the CLC API')
+        if clc_common:
+            # Look the policies up by name once, instead of once for every server
+            self._find_policy_ids(server_params)
+        # The servers are reconciled one after the other, since their policy and nic
+        # calls mix JSON and form encoded requests on the session of the clc-sdk
         for server in servers:
-            if state == 'present':
-                server_changed, server_result = self._ensure_server_config(
-                    server, server_params)
-                if server_result:
-                    request_list.append(server_result)
-                aa_changed = self._ensure_aa_policy_present(
-                    server,
-                    server_params)
-                ap_changed = self._ensure_alert_policy_present(
-                    server,
-                    server_params)
-                nic_changed = self._ensure_nic_present(
-                    server,
-                    server_params)
-            elif state == 'absent':
-                aa_changed = self._ensure_aa_policy_absent(
-                    server,
-                    server_params)
-                ap_changed = self._ensure_alert_policy_absent(
-                    server,
-                    server_params)
-                nic_changed = self._ensure_nic_absent(
-                    server,
-                    server_params)
-            if server_changed or aa_changed or ap_changed or nic_changed:
+            server_changed, server_result = self._modify_server(server, state, server_params)
+            if server_result:
+                request_list.append(server_result)
+            if server_changed:
                 changed_servers.append(server)
                 changed = True
 
@@ -572,6 +566,68 @@ class ClcModifyServer:
 
         return changed, server_dict_array, result_server_ids
 
+    def _modify_server(self, server, state, server_params):
+        """
+        Reconcile the configuration, policies and nics of a server
+        :param server: the CLC server object
+        :param state: the state of the module, present or absent
+        :param server_params: the dictionary of server parameters
+        :return: (changed, result) -
+            changed: Boolean whether a change was made
+            result: The queued request of a configuration change, or None
+        """
+        server_changed = False
+        server_result = None
+        aa_changed = False
+        ap_changed = False
+        nic_changed = False
+        if state == 'present':
+            # The configuration change is queued, and waited for with those of the other
+            # servers, while the policies and nics of the server are reconciled
+            server_changed, server_result = self._ensure_server_config(
+                server, server_params)
+            aa_changed = self._ensure_aa_policy_present(
+                server,
+                server_params)
+            ap_changed = self._ensure_alert_policy_present(
+                server,
+                server_params)
+            nic_changed = self._ensure_nic_present(
+                server,
+                server_params)
+        elif state == 'absent':
+            aa_changed = self._ensure_aa_policy_absent(
+                server,
+                server_params)
+            ap_changed = self._ensure_alert_policy_absent(
+                server,
+                server_params)
+            nic_changed = self._ensure_nic_absent(
+                server,
+                server_params)
+        changed = bool(server_changed or aa_changed or ap_changed or nic_changed)
+        return changed, server_result
+
+    def _find_policy_ids(self, server_params):
+        """
+        Look up the ids of the anti affinity and alert policies given by name
+        :param server_params: the dictionary of server parameters, updated with the policy ids
+        :return: none
+        """
+        acct_alias = self.clc.v2.Account.GetAlias()
+        if not server_params.get('anti_affinity_policy_id') and server_params.get('anti_affinity_policy_name'):
+            server_params['anti_affinity_policy_id'] = self._get_aa_policy_id_by_name(
+                self.clc,
+                self.module,
+                acct_alias,
+                server_params.get('anti_affinity_policy_name'))
+        if not server_params.get('alert_policy_id') and server_params.get('alert_policy_name'):
+            server_params['alert_policy_id'] = self._get_alert_policy_id_by_name(
+                self.clc,
+                self.module,
+                acct_alias,
+                server_params.get('alert_policy_name'))
+
     def _ensure_server_config(
             self, server, server_params):
         """
@@ -800,9 +856,13 @@ class ClcModifyServer:
         """
         wait = module.params.get('wait')
         if wait:
-            # Requests.WaitUntilComplete() returns the count of failed requests
-            failed_requests_count = sum(
-                [request.WaitUntilComplete() for request in request_list])
+            if clc_common:
+                outcome = clc_common.get_request_waiter(module).wait(request_list)
+                failed_requests_count = len(outcome['failed']) + len(outcome['pending'])
+            else:
+                # Requests.WaitUntilComplete() returns the count of failed requests
+                failed_requests_count = sum(
+                    [request.WaitUntilComplete() for request in request_list])
 
             if failed_requests_count > 0:
                 module.fail_json(
@@ -816,7 +876,7 @@ class ClcModifyServer:
         :param servers: list of clc-sdk.Server instances to refresh
         :return: none
         """
-        for server in servers:
+        def refresh_server(server):
             try:
                 server.Refresh()
             except CLCException as ex:
@@ -824,6 +884,12 @@ class ClcModifyServer:
                     server.id, ex.message
                 ))
 
+        if clc_common and len(servers) > 1:
+            clc_common.parallel_map(module, refresh_server, servers)
+        else:
+            for server in servers:
+                refresh_server(server)
+
     def _ensure_aa_policy_present(
             self, server, server_params):
         """
@@ -1153,8 +1219,10 @@ class ClcModifyServer:
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
@@ -164,6 +164,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcPublicIp(object):
     clc = clc_sdk
@@ -208,8 +216,10 @@ class ClcPublicIp(object):
         else:
             return self.module.fail_json(msg="Unknown State: " + state)
         self._wait_for_requests_to_complete(requests)
-        return self.module.exit_json(changed=changed,
-                                     server_ids=changed_server_ids)
+        result = dict(changed=changed, server_ids=changed_server_ids)
+        if clc_common:
+            clc_common.add_wait_stats(self.module, result)
+        return self.module.exit_json(**result)
 
     @staticmethod
     def _define_module_argument_spec():
@@ -323,6 +333,12 @@ class ClcPublicIp(object):
         """
         if not self.module.params['wait']:
             return
+        if clc_common:
+            outcome = clc_common.get_request_waiter(self.module).wait(requests_lst)
+            if outcome['failed'] or outcome['pending']:
+                self.module.fail_json(
+                    msg='Unable to process public ip request')
+            return
         for request in requests_lst:
             request.WaitUntilComplete()
             for request_details in request.requests:
@@ -353,6 +369,9 @@ class ClcPublicIp(object):
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -369,8 +388,10 @@ class ClcPublicIp(object):
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
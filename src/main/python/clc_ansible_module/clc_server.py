@@ -117,6 +117,19 @@ options:
         group, deleting them to reach that count. Requires count_group to be set.
     default: None
     required: False
+  wave_size:
+    description:
+      - The number of servers created or deleted at a time to reach exact_count, min_count or max_count.  When wait
+        is True, each wave of servers completes before the next one is started.  By default all of them are created
+        or deleted in a single wave.
+    default: None
+    required: False
+  max_in_flight:
+    description:
+      - The number of server builds, deletes or power state changes, and of the public ips and alert policies of
+        new servers, submitted to the API at once.  Defaults to the CLC_API_CONCURRENCY environment variable, or 10.
+    default: None
+    required: False
   group:
     description:
       - The Server Group to create servers under.
@@ -243,6 +256,13 @@ options:
     default: True
     required: False
     choices: [True, False]
+  return_group:
+    description:
+      - Whether to return the server group, with the ids of its servers, when wait is True.  Large groups that are
+        not registered can set this to False to skip loading the group.
+    default: True
+    required: False
+    choices: [True, False]
 requirements:
     - python = 2.7
     - requests >= 2.5.0
@@ -309,7 +329,7 @@ changed:
     type: boolean
     sample: True
 group:
-    description: The state of the group after all operations have completed. If wait is False then this value is not set.
+    description: The state of the group after all operations have completed. If wait or return_group is False then this value is not set.
     returned: success
     type: dict
     sample:
@@ -537,6 +557,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcServer:
     clc = clc_sdk
@@ -548,6 +576,7 @@ class ClcServer:
         self.clc = clc_sdk
         self.module = module
         self.group_dict = {}
+        self.group_snapshot = None
 
         if not CLC_FOUND:
             self.module.fail_json(
@@ -629,19 +658,31 @@ class ClcServer:
 
         group = None
         wait = self.module.params.get('wait')
-        if wait:
-            datacenter = self._find_datacenter(self.clc, self.module)
-            group = ClcServer._find_group(module=self.module, datacenter=datacenter, lookup_group=p.get('group'))
-            servers = group.Servers().Servers()
+        if wait and p.get('return_group', True):
+            if self.group_snapshot and p.get('group') in (self.group_snapshot[0].id, p.get('count_group')):
+                # The count group was loaded, and reconciled, already.  The group is either
+                # given like the count group, or was resolved to its id by _validate_module_params
+                group, group_server_ids = self.group_snapshot
+            else:
+                datacenter = self._find_datacenter(self.clc, self.module)
+                group = ClcServer._find_group(module=self.module, datacenter=datacenter, lookup_group=p.get('group'))
+                if clc_common:
+                    # A group from the cached index lists the servers it had when it was cached
+                    group.Refresh()
+                # The ids are read from the group's links, without getting every server
+                group_server_ids = list(group.Servers().servers_lst)
             group = group.data
-            group['servers'] = map(lambda s: s.id, servers)
+            group['servers'] = group_server_ids
 
-        self.module.exit_json(
+        result = dict(
             changed=changed,
             server_ids=new_server_ids,
             group=group,
             partially_created_server_ids=partial_servers_ids,
             servers=server_dict_array)
+        if clc_common:
+            clc_common.add_wait_stats(self.module, result)
+        self.module.exit_json(**result)
 
     @staticmethod
     def _define_module_argument_spec():
@@ -692,6 +733,8 @@ class ClcServer:
             min_count=dict(type='int', default=None),
             max_count=dict(type='int', default=None),
             count_group=dict(),
+            wave_size=dict(type='int', default=None),
+            max_in_flight=dict(type='int', default=None),
             server_ids=dict(type='list', default=[]),
             add_public_ip=dict(type='bool', default=False),
             public_ip_protocol=dict(
@@ -709,7 +752,8 @@ class ClcServer:
                              'windows2012R2Standard_64Bit',
                              'ubuntu14_64Bit'
                          ]),
-            wait=dict(type='bool', default=True))
+            wait=dict(type='bool', default=True),
+            return_group=dict(type='bool', default=True))
 
         mutually_exclusive = [
             ['exact_count', 'count'],
@@ -748,6 +792,9 @@ class ClcServer:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -935,6 +982,10 @@ class ClcServer:
         if min_count and max_count and min_count > max_count:
             module.fail_json(msg=str("min_count can't be greater than max_count"))
 
+        for param in ('wave_size', 'max_in_flight'):
+            if module.params.get(param) is not None and module.params.get(param) < 1:
+                module.fail_json(msg=str("{0} must be at least 1".format(param)))
+
     @staticmethod
     def _find_ttl(clc, module):
         """
@@ -970,16 +1021,27 @@ class ClcServer:
         type = module.params.get('type')
         result = None
 
+        def search_templates():
+            templates = datacenter.Templates().Search(lookup_template)
+            return templates[0] if templates else None
+
         if state == 'present' and type != 'bareMetal':
             try:
-                result = datacenter.Templates().Search(lookup_template)[0].id
+                if clc_common:
+                    template = ClcServer._find_in_deployment_capabilities(
+                        datacenter, search_templates)
+                else:
+                    template = search_templates()
             except CLCException:
-                module.fail_json(
+                template = None
+            if template is None:
+                return module.fail_json(
                     msg=str(
                         "Unable to find a template: " +
                         lookup_template +
                         " in location: " +
                         datacenter.id))
+            result = template.id
         return result
 
     @staticmethod
@@ -990,27 +1052,81 @@ class ClcServer:
         :param datacenter: the datacenter to search for a network id
         :return: a valid network id
         """
-        network_id = module.params.get('network_id')
+        lookup_network = module.params.get('network_id')
         # Validates provided network id
         # Allows lookup of network by id, name, or cidr notation
-        if network_id:
-          network_id = datacenter.Networks(forced_load=True).Get(network_id).id
-
-        if not network_id:
-            try:
-                network_id = datacenter.Networks().networks[0].id
-                # -- added for clc-sdk 2.23 compatibility
-                # datacenter_networks = clc_sdk.v2.Networks(
-                #   networks_lst=datacenter._DeploymentCapabilities()['deployableNetworks'])
-                # network_id = datacenter_networks.networks[0].id
-                # -- end
-            except CLCException:
-                module.fail_json(
+        if lookup_network:
+            if clc_common:
+                network_id = clc_common.LookupCache('networks').find(
+                    [datacenter.alias, datacenter.id],
+                    lambda: [network.data for network in datacenter.Networks(forced_load=True).networks],
+                    lambda networks: ClcServer._match_network_id(networks, lookup_network))
+            else:
+                network = datacenter.Networks(forced_load=True).Get(lookup_network)
+                network_id = network.id if network else None
+            if not network_id:
+                return module.fail_json(
                     msg=str(
-                        "Unable to find a network in location: " +
+                        "Unable to find network: " +
+                        lookup_network +
+                        " in location: " +
                         datacenter.id))
+            return network_id
+
+        def first_network():
+            networks = datacenter.Networks().networks
+            return networks[0] if networks else None
+
+        try:
+            if clc_common:
+                network = ClcServer._find_in_deployment_capabilities(
+                    datacenter, first_network)
+            else:
+                network = first_network()
+            # -- added for clc-sdk 2.23 compatibility
+            # datacenter_networks = clc_sdk.v2.Networks(
+            #   networks_lst=datacenter._DeploymentCapabilities()['deployableNetworks'])
+            # network_id = datacenter_networks.networks[0].id
+            # -- end
+        except CLCException:
+            network = None
+        if network is None:
+            return module.fail_json(
+                msg=str(
+                    "Unable to find a network in location: " +
+                    datacenter.id))
+        return network.id
+
+    @staticmethod
+    def _match_network_id(networks, lookup_network):
+        """
+        Find a network by id, name or cidr notation, like clc-sdk.Networks.Get
+        :param networks: list of the network data of a datacenter
+        :param lookup_network: the id, name or cidr of the network
+        :return: the network id, or None if no network matches
+        """
+        for network in networks:
+            if lookup_network in (network.get('id'), network.get('name'), network.get('cidr')):
+                return network.get('id')
+        return None
+
+    @staticmethod
+    def _find_in_deployment_capabilities(datacenter, search):
+        """
+        Search the deployment capabilities of a datacenter, which list its templates and
+        deployable networks, with the capabilities read from the lookup cache
+        :param datacenter: the clc-sdk.Datacenter instance to search
+        :param search: function that searches the datacenter, and returns None if nothing matches
+        :return: the match, or None
+        """
+        def search_capabilities(capabilities):
+            datacenter.deployment_capabilities = capabilities
+            return search()
 
-        return network_id
+        return clc_common.LookupCache('deployment_capabilities').find(
+            [datacenter.alias, datacenter.id],
+            lambda: datacenter._DeploymentCapabilities(cached=False),
+            search_capabilities)
 
     @staticmethod
     def _find_aa_policy_id(clc, module):
@@ -1108,8 +1224,55 @@ class ClcServer:
 
         if not changed:
             return server_dict_array, created_server_ids, partial_created_servers_ids, changed
-        for i in range(0, count):
-            if not module.check_mode:
+        if not module.check_mode and clc_common:
+            concurrency = p.get('max_in_flight')
+            request_list = [req for req in clc_common.parallel_map(
+                module,
+                lambda i: self._create_clc_server(clc=clc, module=module, server_params=params),
+                range(count),
+                concurrency=concurrency) if req]
+            builds = [(req, server) for req, server in zip(request_list, clc_common.parallel_map(
+                module,
+                lambda req: req.requests[0].Server(),
+                request_list,
+                concurrency=concurrency)) if server]
+            servers_by_build = dict((id(req), server) for req, server in builds)
+            servers = [server for req, server in builds]
+            failed_servers = []
+
+            def provision_servers(completed_builds):
+                # Take each server through its remaining steps as soon as its own build
+                # completes, instead of after the slowest one
+                results = [result for result in clc_common.parallel_map(
+                    module,
+                    lambda req: self._provision_server(clc=clc,
+                                                       module=module,
+                                                       server=servers_by_build[id(req)],
+                                                       add_public_ip=add_public_ip,
+                                                       public_ip_protocol=public_ip_protocol,
+                                                       public_ip_ports=public_ip_ports),
+                    completed_builds,
+                    concurrency=concurrency) if result]
+                failed_servers.extend(server for server, ip_requests, is_partial in results if is_partial)
+                return [req for server, ip_requests, is_partial in results for req in ip_requests]
+
+            if p.get('wait'):
+                self._wait_for_requests(module, [req for req, server in builds], on_complete=provision_servers)
+            else:
+                provision_servers([req for req, server in builds])
+            self._refresh_servers(module, servers)
+
+            for server in servers:
+                if server in failed_servers:
+                    partial_created_servers_ids.append(server.id)
+                else:
+                    self._add_server_addresses(server, add_public_ip)
+                    created_server_ids.append(server.id)
+                server_dict_array.append(server.data)
+            return server_dict_array, created_server_ids, partial_created_servers_ids, changed
+
+        if not module.check_mode:
+            for i in range(0, count):
                 req = self._create_clc_server(clc=clc,
                                               module=module,
                                               server_params=params)
@@ -1118,7 +1281,6 @@ class ClcServer:
                 servers.append(server)
 
         self._wait_for_requests(module, request_list)
-        self._refresh_servers(module, servers)
 
         ip_failed_servers = self._add_public_ip_to_servers(
             module=module,
@@ -1129,24 +1291,68 @@ class ClcServer:
         ap_failed_servers = self._add_alert_policy_to_servers(clc=clc,
                                                               module=module,
                                                               servers=servers)
+        self._refresh_servers(module, servers)
 
         for server in servers:
             if server in ip_failed_servers or server in ap_failed_servers:
                 partial_created_servers_ids.append(server.id)
             else:
-                # reload server details
-                server = clc.v2.Server(server.id)
-                server.data['ipaddress'] = server.details[
-                    'ipAddresses'][0]['internal']
-
-                if add_public_ip and len(server.PublicIPs().public_ips) > 0:
-                    server.data['publicip'] = str(
-                        server.PublicIPs().public_ips[0])
+                self._add_server_addresses(server, add_public_ip)
                 created_server_ids.append(server.id)
             server_dict_array.append(server.data)
 
         return server_dict_array, created_server_ids, partial_created_servers_ids, changed
 
+    def _provision_server(
+            self,
+            clc,
+            module,
+            server,
+            add_public_ip,
+            public_ip_protocol,
+            public_ip_ports):
+        """
+        Queue the public ip, and add the alert policy, of a new server whose build completed
+        :param clc: the clc-sdk instance to use
+        :param module: the AnsibleModule object
+        :param server: the clc-sdk.Server instance
+        :param add_public_ip: boolean - whether or not to provision a public ip for the server
+        :param public_ip_protocol: a protocol to allow for the public ip
+        :param public_ip_ports: list of ports to allow for the public ip
+        :return: tuple of the server, the list of its public ip requests to wait for,
+                 and whether its public ip or alert policy failed
+        """
+        api_calls = clc_common.get_thread_api_calls()
+        ip_requests, ip_failed_servers = self._queue_public_ips(
+            module=module,
+            should_add_public_ip=add_public_ip,
+            servers=[server],
+            public_ip_protocol=public_ip_protocol,
+            public_ip_ports=public_ip_ports)
+        ap_failed_servers = self._add_alert_policy_to_servers(clc=clc,
+                                                              module=module,
+                                                              servers=[server])
+        module.debug('Provisioned server {0} with {1} API calls'.format(
+            server.id, clc_common.get_thread_api_calls() - api_calls))
+        return server, ip_requests, bool(ip_failed_servers or ap_failed_servers)
+
+    @staticmethod
+    def _add_server_addresses(server, add_public_ip):
+        """
+        Add the ip addresses of a refreshed server to its data, without calling the API
+        :param server: the clc-sdk.Server instance
+        :param add_public_ip: boolean - whether a public ip was provisioned for the server
+        :return: none
+        """
+        server.data['ipaddress'] = server.details[
+            'ipAddresses'][0]['internal']
+
+        # The sdk caches the public ips of a server, rebuild them from the refreshed details
+        server.public_ips = None
+        if add_public_ip and len(server.PublicIPs().public_ips) > 0:
+            server.data['publicip'] = str(
+                server.PublicIPs().public_ips[0])
+
     def _enforce_count(self, module, clc):
         """
         Enforce that there is the right number of servers in the provided group.
@@ -1165,6 +1371,7 @@ class ClcServer:
         server_dict_array = []
         partial_servers_ids = []
         changed_server_ids = []
+        remove_ids = []
 
         # fail here if the exact count was specified without filtering
         # on a group, as this may lead to a undesired removal of instances
@@ -1180,14 +1387,16 @@ class ClcServer:
             return module.fail_json(
                 msg="you must use the 'count_group option with max_count")
 
+        group = self._find_group(module, datacenter, count_group)
         servers, running_servers = self._find_running_servers_by_group(
-            module, datacenter, count_group)
+            module, datacenter, count_group, group=group)
+        group_server_ids = [s.id for s in servers]
 
         if exact_count:
             if len(running_servers) < exact_count:
                 to_create = exact_count - len(running_servers)
                 server_dict_array, changed_server_ids, partial_servers_ids, changed \
-                    = self._create_servers(module, clc, override_count=to_create)
+                    = self._create_servers_in_waves(module, clc, to_create)
 
                 for server in server_dict_array:
                     running_servers.append(server)
@@ -1198,13 +1407,13 @@ class ClcServer:
                 remove_ids = all_server_ids[0:to_remove]
 
                 (changed, server_dict_array, changed_server_ids) \
-                    = ClcServer._delete_servers(module, clc, remove_ids)
+                    = self._delete_servers_in_waves(module, clc, remove_ids)
 
         if min_count:
             if len(running_servers) < min_count:
                 to_create = min_count - len(running_servers)
                 server_dict_array, changed_server_ids, partial_servers_ids, changed \
-                    = self._create_servers(module, clc, override_count=to_create)
+                    = self._create_servers_in_waves(module, clc, to_create)
 
                 for server in server_dict_array:
                     running_servers.append(server)
@@ -1216,24 +1425,86 @@ class ClcServer:
                 remove_ids = all_server_ids[0:to_remove]
 
                 changed, server_dict_array, changed_server_ids \
-                    = self._delete_servers(module, clc, remove_ids)
+                    = self._delete_servers_in_waves(module, clc, remove_ids)
 
+        # Keep the servers of the group, as reconciled, for the result of the run
+        if remove_ids:
+            group_server_ids = [i for i in group_server_ids if i not in changed_server_ids]
+        else:
+            group_server_ids = group_server_ids + changed_server_ids + partial_servers_ids
+        self.group_snapshot = (group, group_server_ids)
 
         return server_dict_array, changed_server_ids, partial_servers_ids, changed
 
+    def _create_servers_in_waves(self, module, clc, count):
+        """
+        Create servers in waves of at most wave_size servers, each wave after the previous one completed
+        :param module: the AnsibleModule object
+        :param clc: the clc-sdk instance to use
+        :param count: the number of servers to create
+        :return: a list of dictionaries with server information about the servers that were created
+        """
+        wave_size = module.params.get('wave_size')
+        if not wave_size or wave_size >= count:
+            return self._create_servers(module, clc, override_count=count)
+        server_dict_array = []
+        created_server_ids = []
+        partial_created_servers_ids = []
+        changed = False
+
+        for wave_start in range(0, count, wave_size):
+            wave_dict_array, wave_server_ids, wave_partial_ids, wave_changed \
+                = self._create_servers(module, clc, override_count=min(wave_size, count - wave_start))
+            server_dict_array.extend(wave_dict_array)
+            created_server_ids.extend(wave_server_ids)
+            partial_created_servers_ids.extend(wave_partial_ids)
+            changed = changed or wave_changed
+
+        return server_dict_array, created_server_ids, partial_created_servers_ids, changed
+
+    def _delete_servers_in_waves(self, module, clc, server_ids):
+        """
+        Delete servers in waves of at most wave_size servers, each wave after the previous one completed
+        :param module: the AnsibleModule object
+        :param clc: the clc-sdk instance to use
+        :param server_ids: list of servers to delete, in the order they are deleted in
+        :return: a list of dictionaries with server information about the servers that were deleted
+        """
+        wave_size = module.params.get('wave_size')
+        if not wave_size or wave_size >= len(server_ids):
+            return self._delete_servers(module, clc, server_ids)
+        server_dict_array = []
+        terminated_server_ids = []
+        changed = False
+
+        for wave_start in range(0, len(server_ids), wave_size):
+            wave_changed, wave_dict_array, wave_server_ids \
+                = self._delete_servers(module, clc, server_ids[wave_start:wave_start + wave_size])
+            server_dict_array.extend(wave_dict_array)
+            terminated_server_ids.extend(wave_server_ids)
+            changed = changed or wave_changed
+
+        return changed, server_dict_array, terminated_server_ids
+
     @staticmethod
-    def _wait_for_requests(module, request_list):
+    def _wait_for_requests(module, request_list, on_complete=None):
         """
         Block until server provisioning requests are completed.
         :param module: the AnsibleModule object
         :param request_list: a list of clc-sdk.Request instances
+        :param on_complete: function called with the requests that completed in a status sweep,
+                 returning further requests to wait for.  Only used with the shared helpers.
         :return: none
         """
         wait = module.params.get('wait')
         if wait:
-            # Requests.WaitUntilComplete() returns the count of failed requests
-            failed_requests_count = sum(
-                [request.WaitUntilComplete() for request in request_list])
+            if clc_common:
+                outcome = clc_common.get_request_waiter(module).wait(request_list, on_complete=on_complete)
+                failed_requests_count = len(outcome['failed']) + len(outcome['pending'])
+            else:
+                # Requests.WaitUntilComplete() returns the count of failed requests
+                failed_requests_count = sum(
+                    [request.WaitUntilComplete() for request in request_list])
 
             if failed_requests_count > 0:
                 module.fail_json(
@@ -1247,7 +1518,7 @@ class ClcServer:
         :param servers: list of clc-sdk.Server instances to refresh
         :return: none
         """
-        for server in servers:
+        def refresh_server(server):
             try:
                 server.Refresh()
             except CLCException as ex:
@@ -1255,6 +1526,12 @@ class ClcServer:
                     server.id, ex.message
                 ))
 
+        if clc_common and len(servers) > 1:
+            clc_common.parallel_map(module, refresh_server, servers)
+        else:
+            for server in servers:
+                refresh_server(server)
+
     @staticmethod
     def _add_public_ip_to_servers(
             module,
@@ -1271,12 +1548,39 @@ class ClcServer:
         :param public_ip_ports: list of ports to allow for the public ips
         :return: none
         """
+        request_list, failed_servers = ClcServer._queue_public_ips(
+            module,
+            should_add_public_ip,
+            servers,
+            public_ip_protocol,
+            public_ip_ports)
+        ClcServer._wait_for_requests(module, request_list)
+        return failed_servers
+
+    @staticmethod
+    def _queue_public_ips(
+            module,
+            should_add_public_ip,
+            servers,
+            public_ip_protocol,
+            public_ip_ports):
+        """
+        Queue the creation of a public IP for servers, without waiting for it
+        :param module: the AnsibleModule object
+        :param should_add_public_ip: boolean - whether or not to provision a public ip for servers.  Skipped if False
+        :param servers: List of servers to add public ips to
+        :param public_ip_protocol: a protocol to allow for the public ips
+        :param public_ip_ports: list of ports to allow for the public ips
+        :return: (request_list, failed_servers) -
+            request_list: the list of clc-sdk.Requests instances queued
+            failed_servers: the list of servers whose public ip could not be queued
+        """
         failed_servers = []
+        request_list = []
         if not should_add_public_ip:
-            return failed_servers
+            return request_list, failed_servers
 
         ports_lst = []
-        request_list = []
         server = None
 
         for port in public_ip_ports:
@@ -1289,8 +1593,7 @@ class ClcServer:
                     request_list.append(request)
         except APIFailedResponse:
             failed_servers.append(server)
-        ClcServer._wait_for_requests(module, request_list)
-        return failed_servers
+        return request_list, failed_servers
 
     @staticmethod
     def _add_alert_policy_to_servers(clc, module, servers):
@@ -1352,18 +1655,26 @@ class ClcServer:
         :param alert_policy_name: the name of the alert policy
         :return: alert_policy_id: the alert policy id
         """
-        alert_policy_id = None
-        policies = clc.v2.API.Call('GET', '/v2/alertPolicies/%s' % alias)
-        if not policies:
+        def get_alert_policies():
+            policies = clc.v2.API.Call('GET', '/v2/alertPolicies/%s' % alias)
+            return policies.get('items') if policies else None
+
+        def find_alert_policy_id(policies):
+            alert_policy_id = None
+            for policy in policies:
+                if policy.get('name') == alert_policy_name:
+                    if not alert_policy_id:
+                        alert_policy_id = policy.get('id')
+                    else:
+                        return module.fail_json(
+                            msg='multiple alert policies were found with policy name : %s' % alert_policy_name)
             return alert_policy_id
-        for policy in policies.get('items'):
-            if policy.get('name') == alert_policy_name:
-                if not alert_policy_id:
-                    alert_policy_id = policy.get('id')
-                else:
-                    return module.fail_json(
-                        msg='multiple alert policies were found with policy name : %s' % alert_policy_name)
-        return alert_policy_id
+
+        if clc_common:
+            return clc_common.LookupCache('alert_policies').find(
+                [alias], get_alert_policies, find_alert_policy_id)
+        policies = get_alert_policies()
+        return find_alert_policy_id(policies) if policies is not None else None
 
     @staticmethod
     def _delete_servers(module, clc, server_ids):
@@ -1382,10 +1693,17 @@ class ClcServer:
             return module.fail_json(
                 msg='server_ids should be a list of servers, aborting')
 
-        servers = clc.v2.Servers(server_ids).Servers()
-        for server in servers:
-            if not module.check_mode:
-                request_list.append(server.Delete())
+        servers = ClcServer._get_servers(module, clc, server_ids)
+        if not module.check_mode:
+            if clc_common:
+                request_list = clc_common.parallel_map(
+                    module,
+                    lambda server: server.Delete(),
+                    servers,
+                    concurrency=module.params.get('max_in_flight'))
+            else:
+                for server in servers:
+                    request_list.append(server.Delete())
         ClcServer._wait_for_requests(module, request_list)
 
         for server in servers:
@@ -1404,8 +1722,6 @@ class ClcServer:
         """
         p = module.params
         state = p.get('state')
-        changed = False
-        changed_servers = []
         server_dict_array = []
         result_server_ids = []
         request_list = []
@@ -1414,22 +1730,28 @@ class ClcServer:
             return module.fail_json(
                 msg='server_ids should be a list of servers, aborting')
 
-        servers = clc.v2.Servers(server_ids).Servers()
-        for server in servers:
-            if server.powerState != state:
-                changed_servers.append(server)
-                if not module.check_mode:
+        servers = ClcServer._get_servers(module, clc, server_ids)
+        changed_servers = [server for server in servers if server.powerState != state]
+        changed = len(changed_servers) > 0
+        if not module.check_mode:
+            if clc_common:
+                request_list = clc_common.parallel_map(
+                    module,
+                    lambda server: ClcServer._change_server_power_state(module, server, state),
+                    changed_servers,
+                    concurrency=module.params.get('max_in_flight'))
+            else:
+                for server in changed_servers:
                     request_list.append(
                         ClcServer._change_server_power_state(
                             module,
                             server,
                             state))
-                changed = True
 
         ClcServer._wait_for_requests(module, request_list)
         ClcServer._refresh_servers(module, changed_servers)
 
-        for server in set(changed_servers + servers):
+        for server in servers:
             try:
                 server.data['ipaddress'] = server.details[
                     'ipAddresses'][0]['internal']
@@ -1443,6 +1765,35 @@ class ClcServer:
 
         return changed, server_dict_array, result_server_ids
 
+    @staticmethod
+    def _get_servers(module, clc, server_ids):
+        """
+        Get the servers on the provided list
+        :param module: the AnsibleModule object
+        :param clc: the clc-sdk instance to use
+        :param server_ids: list of servers to get
+        :return: list of clc-sdk.Server instances, in the order of server_ids
+        """
+        return ClcServer._load_servers(module, clc, clc.v2.Servers(server_ids))
+
+    @staticmethod
+    def _load_servers(module, clc, servers):
+        """
+        Load the servers of a clc-sdk.Servers instance
+        :param module: the AnsibleModule object
+        :param clc: the clc-sdk instance to use
+        :param servers: the clc-sdk.Servers instance
+        :return: list of clc-sdk.Server instances
+        """
+        if clc_common:
+            # Servers() gets the servers one after another, load them concurrently instead
+            servers._servers = clc_common.parallel_map(
+                module,
+                lambda server_id: clc.v2.Server(id=server_id, alias=servers.alias),
+                servers.servers_lst,
+                concurrency=module.params.get('max_in_flight'))
+        return servers.Servers()
+
     @staticmethod
     def _change_server_power_state(module, server, state):
         """
@@ -1470,20 +1821,25 @@ class ClcServer:
         return result
 
     @staticmethod
-    def _find_running_servers_by_group(module, datacenter, count_group):
+    def _find_running_servers_by_group(module, datacenter, count_group, group=None):
         """
         Find a list of running servers in the provided group
         :param module: the AnsibleModule object
         :param datacenter: the clc-sdk.Datacenter instance to use to lookup the group
         :param count_group: the group to count the servers
+        :param group: the clc-sdk.Group instance of count_group, if it was already found
         :return: list of servers, and list of running servers
         """
-        group = ClcServer._find_group(
-            module=module,
-            datacenter=datacenter,
-            lookup_group=count_group)
+        if group is None:
+            group = ClcServer._find_group(
+                module=module,
+                datacenter=datacenter,
+                lookup_group=count_group)
+        if clc_common:
+            # A group from the cached index lists the servers it had when it was cached
+            group.Refresh()
 
-        servers = group.Servers().Servers()
+        servers = ClcServer._load_servers(module, clc_sdk, group.Servers())
         running_servers = [s for s in servers if (s.status == 'active' and s.powerState == 'started')]
 
         return servers, running_servers
@@ -1499,6 +1855,10 @@ class ClcServer:
         """
         if not lookup_group:
             lookup_group = module.params.get('group')
+        if clc_common:
+            group = ClcServer._find_group_in_index(datacenter, lookup_group)
+            if group is not None:
+                return group
         try:
             return datacenter.Groups().Get(lookup_group)
         except CLCException:
@@ -1520,6 +1880,27 @@ class ClcServer:
 
         return result
 
+    @staticmethod
+    def _find_group_in_index(datacenter, lookup_group):
+        """
+        Find a server group in the cached group index of a datacenter
+        :param datacenter: clc-sdk.Datacenter instance to search for the group
+        :param lookup_group: string name, id or description of the group to search for
+        :return: clc-sdk.Group instance, or None if it is not in the index
+        """
+        index = clc_common.get_group_index(
+            datacenter.alias,
+            datacenter.id,
+            lambda: datacenter.RootGroup().data)
+        if index is None:
+            return None
+        group_data = index.get(lookup_group)
+        if group_data is None:
+            # The group may be newer than the cached group tree
+            clc_common.invalidate_group_index(datacenter.alias, datacenter.id)
+            return None
+        return clc_sdk.v2.Group(id=group_data['id'], alias=datacenter.alias, group_obj=group_data)
+
     @staticmethod
     def _find_group_recursive(module, group_list, lookup_group):
         """
@@ -1623,21 +2004,30 @@ class ClcServer:
         :param aa_policy_name: the anti affinity policy name
         :return: aa_policy_id: The anti affinity policy id
         """
-        aa_policy_id = None
-        try:
-            aa_policies = clc.v2.API.Call(method='GET',
-                                          url='antiAffinityPolicies/%s' % alias)
-        except APIFailedResponse as ex:
-            return module.fail_json(msg='Unable to fetch anti affinity policies for account: {0}. {1}'.format(
-                alias, ex.response_text))
-        for aa_policy in aa_policies.get('items'):
-            if aa_policy.get('name') == aa_policy_name:
-                if not aa_policy_id:
-                    aa_policy_id = aa_policy.get('id')
-                else:
-                    return module.fail_json(
-                        msg='multiple anti affinity policies were found with policy name : %s' % aa_policy_name)
-        return aa_policy_id
+        def get_aa_policies():
+            try:
+                aa_policies = clc.v2.API.Call(method='GET',
+                                              url='antiAffinityPolicies/%s' % alias)
+            except APIFailedResponse as ex:
+                return module.fail_json(msg='Unable to fetch anti affinity policies for account: {0}. {1}'.format(
+                    alias, ex.response_text))
+            return aa_policies.get('items')
+
+        def find_aa_policy_id(aa_policies):
+            aa_policy_id = None
+            for aa_policy in aa_policies:
+                if aa_policy.get('name') == aa_policy_name:
+                    if not aa_policy_id:
+                        aa_policy_id = aa_policy.get('id')
+                    else:
+                        return module.fail_json(
+                            msg='multiple anti affinity policies were found with policy name : %s' % aa_policy_name)
+            return aa_policy_id
+
+        if clc_common:
+            return clc_common.LookupCache('aa_policies').find(
+                [alias], get_aa_policies, find_aa_policy_id)
+        return find_aa_policy_id(get_aa_policies())
 
     #
     #  This is the function that gets patched to the Request.server object using a lamda closure
@@ -1645,20 +2035,26 @@ class ClcServer:
 
     @staticmethod
     def _find_server_by_uuid_w_retry(
-            clc, module, svr_uuid, alias=None, retries=25, back_out=2):
+            clc, module, svr_uuid, alias=None, retries=None, back_out=2, timeout=None):
         """
         Find the clc server by the UUID returned from the provisioning request.  Retry the request if a 404 is returned.
         :param clc: the clc-sdk instance to use
         :param module: the AnsibleModule object
         :param svr_uuid: UUID of the server
-        :param retries: the number of retry attempts to make prior to fail. default is 5
+        :param retries: the number of retry attempts to make prior to fail, only limited by the timeout if unset
         :param alias: the Account Alias to search
+        :param timeout: the number of seconds to retry for, read from CLC_RESOLVE_TIMEOUT if unset
         :return: a clc-sdk.Server instance
         """
         if not alias:
             alias = clc.v2.Account.GetAlias()
 
+        if clc_common:
+            return ClcServer._find_server_by_uuid_w_backoff(
+                clc, module, svr_uuid, alias, retries, timeout)
+
         # Wait and retry if the api returns a 404 or a connection error from requests module
+        retries = retries or 25
         retry_count = retries
         while True:
             retry_count -= 1
@@ -1692,10 +2088,60 @@ class ClcServer:
                 sleep(back_out)
                 back_out *= 2
 
+    @staticmethod
+    def _find_server_by_uuid_w_backoff(clc, module, svr_uuid, alias, retries, timeout):
+        """
+        Find the clc server by the UUID returned from the provisioning request, polling
+        with a capped, jittered backoff until it is visible or the deadline passes.
+        :param clc: the clc-sdk instance to use
+        :param module: the AnsibleModule object
+        :param svr_uuid: UUID of the server
+        :param alias: the Account Alias to search
+        :param retries: the number of attempts to make prior to fail, only limited by the timeout if unset
+        :param timeout: the number of seconds to retry for, read from CLC_RESOLVE_TIMEOUT if unset
+        :return: a clc-sdk.Server instance
+        """
+        def is_retryable(ex):
+            # The server is not visible until the build has started
+            if isinstance(ex, APIFailedResponse):
+                return ex.response_status_code == 404
+            return isinstance(ex, requests.exceptions.ConnectionError)
+
+        attempts = []
+
+        def find_server():
+            attempts.append(svr_uuid)
+            return clc.v2.API.Call(
+                method='GET', url='servers/%s/%s?uuid=true' % (alias, svr_uuid))
+
+        try:
+            server_obj = clc_common.get_request_waiter(module).poll(
+                find_server,
+                is_retryable=is_retryable,
+                attempts=retries,
+                timeout=timeout)
+        except APIFailedResponse as e:
+            if e.response_status_code != 404:
+                return module.fail_json(
+                    msg='A failure response was received from CLC API when '
+                    'attempting to get details for a server:  UUID=%s, Code=%i, Message=%s' %
+                    (svr_uuid, e.response_status_code, e.message))
+            return module.fail_json(
+                msg='Unable to reach the CLC API after {0} attempts'.format(len(attempts)))
+        except requests.exceptions.ConnectionError as ce:
+            return module.fail_json(
+                msg='Unable to connect to the CLC API after {0} attempts. {1}'.format(len(attempts), ce.message))
+        return clc.v2.Server(
+            id=server_obj['id'],
+            alias=alias,
+            server_obj=server_obj)
+
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
@@ -248,6 +248,14 @@ except ImportError:
 else:
     REQUESTS_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcServerFact:
 
@@ -261,6 +269,12 @@ class ClcServerFact:
             self.module.fail_json(
                 msg='requests library is required for this module')
 
+        if clc_common:
+            self.requests = clc_common.get_session(
+                "ClcAnsibleModule/" + __version__)
+        else:
+            self.requests = requests
+
     def process_request(self):
         """
         Process the request - Main Code Path
@@ -269,7 +283,7 @@ class ClcServerFact:
         self._set_clc_credentials_from_env()
         server_id = self.module.params.get('server_id')
 
-        r = requests.get(self._get_endpoint(server_id), headers={
+        r = self.requests.get(self._get_endpoint(server_id), headers={
             'Authorization': 'Bearer ' + self.v2_api_token
         })
 
@@ -306,7 +320,7 @@ class ClcServerFact:
 
     def _get_server_credentials(self, server_id):
 
-        r = requests.get(self._get_endpoint(server_id) + '/credentials', headers={
+        r = self.requests.get(self._get_endpoint(server_id) + '/credentials', headers={
             'Authorization': 'Bearer ' + self.v2_api_token
         })
 
@@ -339,24 +353,49 @@ class ClcServerFact:
 
         elif v2_api_username and v2_api_passwd:
 
-            r = requests.post(self.api_url + '/v2/authentication/login', json={
-                'username': v2_api_username,
-                'password': v2_api_passwd
-            })
-
-            if r.status_code not in [200]:
-                self.module.fail_json(
-                    msg='Failed to authenticate with clc V2 api.')
-
-            r = r.json()
-            self.v2_api_token = r['bearerToken']
-            self.clc_alias = r['accountAlias']
+            if clc_common:
+                login = lambda: self._login(v2_api_username, v2_api_passwd)
+                r = clc_common.get_login(
+                    self.api_url, v2_api_username, v2_api_passwd, login)
+                clc_common.set_login_renewal(
+                    self.requests, self.api_url, v2_api_username, v2_api_passwd,
+                    login, self._set_login)
+            else:
+                r = self._login(v2_api_username, v2_api_passwd)
+            self._set_login(r)
 
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
                     "environment variables")
 
+    def _set_login(self, r):
+        """
+        Use the bearer token and account alias of a login response
+        :param r: the login response
+        :return: none
+        """
+        self.v2_api_token = r['bearerToken']
+        self.clc_alias = r['accountAlias']
+
+    def _login(self, v2_api_username, v2_api_passwd):
+        """
+        Log in to the v2 API with a username and password
+        :param v2_api_username: the Control Portal username
+        :param v2_api_passwd: the Control Portal password
+        :return: the login response with the bearerToken and accountAlias
+        """
+        r = self.requests.post(self.api_url + '/v2/authentication/login', json={
+            'username': v2_api_username,
+            'password': v2_api_passwd
+        })
+
+        if r.status_code not in [200]:
+            self.module.fail_json(
+                msg='Failed to authenticate with clc V2 api.')
+
+        return r.json()
+
 
 def main():
     """
@@ -147,6 +147,14 @@ except ImportError:
 else:
     CLC_FOUND = True
 
+#
+#  Shared helpers, available when the clc-ansible-module package is installed
+#
+try:
+    from clc_ansible_module import clc_common
+except ImportError:
+    clc_common = None
+
 
 class ClcSnapshot:
 
@@ -203,10 +211,13 @@ class ClcSnapshot:
                 ignore_failures=ignore_failures)
 
         self._wait_for_requests_to_complete(request_list)
-        return self.module.exit_json(
+        result = dict(
             changed=changed,
             server_ids=changed_servers,
             failed_server_ids=failed_servers)
+        if clc_common:
+            clc_common.add_wait_stats(self.module, result)
+        return self.module.exit_json(**result)
 
     def ensure_server_snapshot_present(self, server_ids, expiration_days, ignore_failures):
         """
@@ -372,6 +383,12 @@ class ClcSnapshot:
         """
         if not self.module.params['wait']:
             return
+        if clc_common:
+            outcome = clc_common.get_request_waiter(self.module).wait(requests_lst)
+            if outcome['failed'] or outcome['pending']:
+                self.module.fail_json(
+                    msg='Unable to process server snapshot request')
+            return
         for request in requests_lst:
             request.WaitUntilComplete()
             for request_details in request.requests:
@@ -435,6 +452,9 @@ class ClcSnapshot:
             self.clc.v2.SetCredentials(
                 api_username=v2_api_username,
                 api_passwd=v2_api_passwd)
+            if clc_common:
+                clc_common.set_cached_login(
+                    self.clc, v2_api_username, v2_api_passwd)
         else:
             return self.module.fail_json(
                 msg="You must set the CLC_V2_API_USERNAME and CLC_V2_API_PASSWD "
@@ -442,8 +462,10 @@ class ClcSnapshot:
 
     @staticmethod
     def _set_user_agent(clc):
-        if hasattr(clc, 'SetRequestsSession'):
-            agent_string = "ClcAnsibleModule/" + __version__
+        agent_string = "ClcAnsibleModule/" + __version__
+        if clc_common:
+            clc_common.set_user_agent(clc, agent_string)
+        elif hasattr(clc, 'SetRequestsSession'):
             ses = requests.Session()
             ses.headers.update({"Api-Client": agent_string})
             ses.headers['User-Agent'] += " " + agent_string
@@ -34,22 +34,80 @@ The following information is returned for each host:
     - ansible_ssh_host:  Set to the first internal ip address
     - clc_custom_fields:  A dictionary of custom fields set on the server in the Control Portal
     - clc_data:  A dictionary of all the data returned by the API
+
+The inventory is cached on disk so that repeated runs do not have to walk
+the whole account.  Caching is controlled by the following environment
+variables:
+
+    export CLC_INV_CACHE_PATH=<directory to store the cache in, default ~/.ansible/tmp/clc_inv>
+    export CLC_INV_CACHE_TTL=<seconds a cached inventory is valid, default 300, 0 disables the cache>
+
+Run the script with --refresh-cache to ignore the cached inventory and rebuild it.
+Run the script with --host <name> to return the hostvars of a single server.  These
+are read from the cache, or requested for that one server when it is not cached.
+
+When the cache is enabled the inventory can also be refreshed incrementally.  Only
+servers that are new, have moved between groups or have a changed
+changeInfo.modifiedDate are fetched from the API, all other servers reuse their
+cached hostvars:
+
+    export CLC_INV_INCREMENTAL=true
+
+Server details are requested concurrently over a shared pool of keep-alive
+connections.  The number of concurrent requests can be tuned with:
+
+    export CLC_INV_HOSTVAR_POOL_CNT=<number of concurrent requests, default 25>
+
+Server details can instead be requested in bulk, one request per group, with only
+servers missing from the group's response requested individually:
+
+    export CLC_INV_GROUP_DETAILS=true
+
+By default clc_data holds the complete server details returned by the API.  To
+shrink the inventory, list the fields to keep as a comma separated list of fields
+or dotted paths.  The fields used by the dynamic groups below are always kept:
+
+    export CLC_INV_HOSTVAR_FIELDS=id,name,os,details.ipAddresses,details.powerState
+
+Besides a group for each datacenter, servers are grouped by OS family, power state,
+status, storage type and server type, e.g. os_windows, power_started, status_active,
+storage_standard and type_standard.  Servers can also be grouped by the values of
+custom fields, e.g. cf_environment_production, by listing their names or ids:
+
+    export CLC_INV_CUSTOM_FIELD_GROUPS=Environment,Role
+
+The inventory is streamed to stdout as servers are read.  For large inventories
+the output can be printed without indentation to reduce its size:
+
+    export CLC_INV_COMPACT=true
 '''
 
 #  @author: Brian Albrecht
 #
-#  TODO: Add caching
 #  TODO: Add ability to specify AccountAlias
 
 import sys
 import os
-from multiprocessing import Pool
-import itertools
+import argparse
+import errno
+import fcntl
+import hashlib
+import re
+import tempfile
+import time
+import types
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 import json
 import clc
 from clc import CLCException, APIFailedResponse
 
 HOSTVAR_POOL_CNT = 25
+GROUP_POOL_CNT = 12
+CACHE_PATH_DEFAULT = '~/.ansible/tmp/clc_inv'
+CACHE_TTL_DEFAULT = 300
+STATE_VERSION = 1
+DYNAMIC_GROUP_FIELDS = ['locationId', 'os', 'status', 'storageType', 'type', 'details.powerState']
 
 
 def main():
@@ -57,36 +115,467 @@ def main():
     Main function
     :return: None
     '''
-    print_inventory_json()
+    args = _parse_args()
+    if args.host:
+        print_host_json(args.host, refresh_cache=args.refresh_cache)
+    else:
+        print_inventory_json(refresh_cache=args.refresh_cache)
     sys.exit(0)
 
 
-def print_inventory_json():
+def _parse_args():
+    '''
+    Parse the command line arguments passed to the script by Ansible
+    :return: argparse.Namespace of the parsed arguments
+    '''
+    parser = argparse.ArgumentParser(
+        description='CenturyLink Cloud dynamic inventory script')
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument('--list', action='store_true', default=True,
+                        help='List all servers and groups (default)')
+    action.add_argument('--host',
+                        help='Return the hostvars of a single server')
+    parser.add_argument('--refresh-cache', action='store_true', default=False,
+                        help='Ignore the cached inventory and rebuild it from the CLC API')
+    return parser.parse_args()
+
+
+def print_inventory_json(refresh_cache=False):
+    '''
+    Print the inventory in json.  This is the main execution path for the script.
+    A cached inventory is printed instead when one exists that is younger than the cache ttl.
+    The inventory is streamed to stdout, and to the cache, as servers are read from the API.
+    :param refresh_cache: True to ignore any cached inventory and rebuild it
+    :return: None
+    '''
+    cache_ttl = _get_cache_ttl()
+    cache_file = _get_cache_file() if cache_ttl > 0 else None
+    if cache_file is None:
+        _write_inventory([sys.stdout])
+        return
+
+    if not refresh_cache and _copy_cache(cache_file, cache_ttl, sys.stdout):
+        return
+
+    with _cache_lock(cache_file):
+        # Another invocation may have rebuilt the cache while we waited on the lock
+        if refresh_cache or not _copy_cache(cache_file, cache_ttl, sys.stdout):
+            cache_out = _CacheWriter(cache_file)
+            index_out = _CacheWriter(_get_host_index_file(cache_file))
+            try:
+                _write_inventory([sys.stdout, cache_out], index_out, cache_file)
+                cache_out.commit()
+                index_out.commit()
+            finally:
+                cache_out.abort()
+                index_out.abort()
+
+
+def print_host_json(host, refresh_cache=False):
+    '''
+    Print the hostvars of a single server in json.  The hostvars are read from the cached
+    host index when it is valid, otherwise only that one server is requested from the API.
+    :param host: the name of the server
+    :param refresh_cache: True to ignore the cached host index
+    :return: None
+    '''
+    hostvars = None
+    cache_ttl = _get_cache_ttl()
+    cache_file = _get_cache_file() if cache_ttl > 0 else None
+    if cache_file and not refresh_cache:
+        host_index = _read_cache(_get_host_index_file(cache_file), cache_ttl)
+        try:
+            hostvars = json.loads(host_index).get(host) if host_index else None
+        except ValueError:
+            hostvars = None
+
+    if hostvars is None:
+        _set_clc_credentials_from_env()
+        result = _find_hostvars_single_server(host)
+        hostvars = list(result.values())[0] if result else {}
+
+    sys.stdout.write(_to_json(hostvars))
+
+
+def _to_json(data):
+    '''
+    Serialize inventory data the way it is printed to Ansible
+    :param data: the data to serialize
+    :return: json string
+    '''
+    return _dumps(data, _is_env_flag_set('CLC_INV_COMPACT')) + '\n'
+
+
+def _dumps(data, compact, level=0):
+    '''
+    Serialize a json value, either compact or indented to the given nesting level
+    :param data: the data to serialize
+    :param compact: True to leave out all whitespace
+    :param level: the nesting level the value is written at
+    :return: json string
+    '''
+    if compact:
+        return json.dumps(data, separators=(',', ':'), sort_keys=True)
+    return json.dumps(data, indent=2, separators=(',', ': '), sort_keys=True).replace(
+        '\n', '\n' + '  ' * level)
+
+
+def _write_json_object(write, items, compact, level=0):
     '''
-    Print the inventory in json.  This is the main execution path for the script
+    Stream a json object from an iterable of (key, value) pairs, writing each member as soon
+    as it is produced.  Values that are generators of (key, value) pairs are streamed the same way.
+    :param write: function to write each piece of json with
+    :param items: iterable of (key, value) pairs
+    :param compact: True to leave out all whitespace
+    :param level: the nesting level of the object
     :return: None
     '''
+    pad = '' if compact else '\n' + '  ' * (level + 1)
+    write('{')
+    first = True
+    for key, value in items:
+        write(('' if first else ',') + pad + json.dumps(key) + (':' if compact else ': '))
+        if isinstance(value, types.GeneratorType):
+            _write_json_object(write, value, compact, level + 1)
+        else:
+            write(_dumps(value, compact, level + 1))
+        first = False
+    if not first and not compact:
+        write('\n' + '  ' * level)
+    write('}')
+
+
+def _write_inventory(outs, index_out=None, cache_file=None):
+    '''
+    Stream the inventory to each of the outputs.  Hostvars are written as each server is read,
+    followed by the groups, so that the whole inventory is never held in memory.
+    :param outs: list of file like objects to write the inventory to
+    :param index_out: optional file like object to write the per host index of hostvars to
+    :param cache_file: path of the cache file, used to locate the incremental refresh state
+    :return: None
+    '''
+    groups, hostvars = _find_inventory(cache_file)
+    dynamic_groups = {}
+
+    def write(data):
+        for out in outs:
+            out.write(data)
+
+    def host_items():
+        if index_out:
+            index_out.write('{')
+        for i, (name, host) in enumerate(hostvars):
+            _merge_groups(dynamic_groups, _build_hostvars_dynamic_groups({'hostvars': {name: host}}))
+            if index_out:
+                index_out.write(('' if i == 0 else ',') + json.dumps(name) + ':' + _dumps(host, True))
+            yield name, host
+        if index_out:
+            index_out.write('}')
+
+    def meta_items():
+        yield 'hostvars', host_items()
+
+    def inventory_items():
+        yield '_meta', meta_items()
+        # Dynamic groups are complete once every host has been written
+        groups.update(dynamic_groups)
+        for name in sorted(groups):
+            yield name, groups[name]
+
+    _write_json_object(write, inventory_items(), _is_env_flag_set('CLC_INV_COMPACT'))
+    write('\n')
+
+
+def _find_inventory(cache_file=None):
+    '''
+    Find the groups and servers of the inventory by calling the CLC API
+    :param cache_file: path of the cache file, used to locate the incremental refresh state
+    :return: tuple of the group dictionary and an iterable of (server name, hostvars) pairs
+    '''
     _set_clc_credentials_from_env()
+    _set_requests_session(max(GROUP_POOL_CNT, _get_hostvar_pool_cnt()))
+
+    incremental = cache_file and _is_env_flag_set('CLC_INV_INCREMENTAL')
+    details = {} if incremental or _is_env_flag_set('CLC_INV_GROUP_DETAILS') else None
+    groups = _find_all_groups(details)
+    if incremental:
+        state_file = _get_state_file(cache_file)
+        hostvars, state = _find_hostvars_incremental(
+            groups, details, _read_state(state_file))
+        _write_cache(state_file, json.dumps(state))
+        return groups, iter(sorted(hostvars['hostvars'].items()))
 
-    groups = _find_all_groups()
     servers = _get_servers_from_groups(groups)
-    hostvars = _find_all_hostvars_for_servers(servers)
-    dynamic_groups = _build_hostvars_dynamic_groups(hostvars)
-    groups.update(dynamic_groups)
+    return groups, _iter_hostvars_pairs(_iter_hostvars_for_server_ids(servers, details))
+
+
+def _iter_hostvars_pairs(results):
+    '''
+    Flatten per server hostvars dictionaries into (server name, hostvars) pairs
+    :param results: iterable of hostvars dictionaries, None for servers that could not be read
+    :return: generator of (server name, hostvars) pairs
+    '''
+    for result in results:
+        if result is not None:
+            for name, host in result.items():
+                yield name, host
+
+
+def _merge_groups(groups, new_groups):
+    '''
+    Add the hosts of a dictionary of dynamically built groups to another one
+    :param groups: dictionary of groups(k) and lists of hosts(v) to update
+    :param new_groups: dictionary of groups(k) and lists of hosts(v) to add
+    :return: None
+    '''
+    for group, hosts in new_groups.items():
+        groups.setdefault(group, []).extend(hosts)
+
+
+def _is_env_flag_set(name):
+    '''
+    Check whether a boolean environment variable is set to a true value
+    :param name: name of the environment variable
+    :return: True if the variable is set to true, yes or 1
+    '''
+    return os.environ.get(name, '').lower() in ('true', 'yes', '1')
+
+
+def _get_env_int(name, default):
+    '''
+    Read an integer environment variable
+    :param name: name of the environment variable
+    :param default: value to use when the variable is unset or not an integer
+    :return: the integer value
+    '''
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _get_env_list(name):
+    '''
+    Read a comma separated list environment variable
+    :param name: name of the environment variable
+    :return: list of the non empty, stripped values
+    '''
+    return [value.strip() for value in os.environ.get(name, '').split(',') if value.strip()]
+
+
+def _get_cache_ttl():
+    '''
+    Return the number of seconds a cached inventory is valid, read from the CLC_INV_CACHE_TTL env var
+    :return: cache ttl in seconds.  0 or less disables the cache
+    '''
+    return _get_env_int('CLC_INV_CACHE_TTL', CACHE_TTL_DEFAULT)
+
+
+def _get_hostvar_pool_cnt():
+    '''
+    Return the number of concurrent server requests, read from the CLC_INV_HOSTVAR_POOL_CNT env var
+    :return: the number of worker threads, at least 1
+    '''
+    return max(1, _get_env_int('CLC_INV_HOSTVAR_POOL_CNT', HOSTVAR_POOL_CNT))
+
+
+def _get_cache_file():
+    '''
+    Return the path of the cache file for the current credentials and datacenter filter.
+    The directory is read from the CLC_INV_CACHE_PATH env var and created if missing.
+    :return: path of the cache file, or None if the cache directory can not be created
+    '''
+    env = os.environ
+    cache_dir = os.path.expanduser(env.get('CLC_INV_CACHE_PATH', CACHE_PATH_DEFAULT))
+    try:
+        os.makedirs(cache_dir, 0o700)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            sys.stderr.write(
+                'Unable to create the inventory cache directory {0}: {1}\n'.format(cache_dir, ex))
+            return None
+
+    # Key the cache by account so that switching credentials never returns another account's inventory,
+    # and by the hostvar fields and custom field groups so that a changed projection or grouping
+    # is never served from the cache
+    cache_key = hashlib.sha1('|'.join([
+        env.get('CLC_V2_API_URL', ''),
+        env.get('CLC_ACCT_ALIAS', ''),
+        env.get('CLC_V2_API_USERNAME', ''),
+        env.get('CLC_FILTER_DATACENTERS', ''),
+        env.get('CLC_INV_HOSTVAR_FIELDS', ''),
+        env.get('CLC_INV_CUSTOM_FIELD_GROUPS', '')]).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'clc_inv_' + cache_key[:16] + '.json')
+
+
+def _read_cache(cache_file, cache_ttl):
+    '''
+    Return the cached inventory if it is younger than the cache ttl
+    :param cache_file: path of the cache file
+    :param cache_ttl: number of seconds the cache is valid
+    :return: the cached inventory json string, or None if it is missing or expired
+    '''
+    try:
+        if time.time() - os.path.getmtime(cache_file) > cache_ttl:
+            return None
+        with open(cache_file) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _copy_cache(cache_file, cache_ttl, out):
+    '''
+    Copy the cached inventory to the output if it is younger than the cache ttl.
+    The cache is read completely before anything is written, so that a failed read
+    never leaves a partial inventory on the output.
+    :param cache_file: path of the cache file
+    :param cache_ttl: number of seconds the cache is valid
+    :param out: file like object to copy the cached inventory to
+    :return: True if the cached inventory was copied
+    '''
+    inventory = _read_cache(cache_file, cache_ttl)
+    if inventory is None:
+        return False
+    out.write(inventory)
+    return True
+
+
+def _write_cache(cache_file, output):
+    '''
+    Atomically replace the cache file so that concurrent readers never see a partial inventory
+    :param cache_file: path of the cache file
+    :param output: the inventory json string to cache
+    :return: None
+    '''
+    cache_out = _CacheWriter(cache_file)
+    cache_out.write(output)
+    cache_out.commit()
+
+
+class _CacheWriter(object):
+    '''
+    File like object writing to a temporary file that atomically replaces the cache file
+    on commit, so that concurrent readers never see a partial inventory.  Write failures
+    are reported and leave the previous cache in place without interrupting the inventory.
+    '''
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.tmp_file = None
+        self.f = None
+        try:
+            fd, self.tmp_file = tempfile.mkstemp(
+                dir=os.path.dirname(cache_file), prefix='.clc_inv_')
+            self.f = os.fdopen(fd, 'w')
+        except (IOError, OSError) as ex:
+            self._fail(ex)
+
+    def write(self, data):
+        if self.f is None:
+            return
+        try:
+            self.f.write(data)
+        except (IOError, OSError) as ex:
+            self._fail(ex)
+
+    def commit(self):
+        if self.f is None:
+            return
+        try:
+            self.f.close()
+            self.f = None
+            os.rename(self.tmp_file, self.cache_file)
+        except (IOError, OSError) as ex:
+            self._fail(ex)
+
+    def abort(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        if self.tmp_file and os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+    def _fail(self, ex):
+        sys.stderr.write(
+            'Unable to write the inventory cache {0}: {1}\n'.format(self.cache_file, ex))
+        self.abort()
 
-    result = groups
-    result['_meta'] = hostvars
 
-    print(json.dumps(result, indent=2, sort_keys=True))
+def _get_state_file(cache_file):
+    '''
+    Return the path of the incremental refresh state kept alongside the cache file
+    :param cache_file: path of the cache file
+    :return: path of the state file
+    '''
+    return os.path.splitext(cache_file)[0] + '.state.json'
+
+
+def _get_host_index_file(cache_file):
+    '''
+    Return the path of the per host index of hostvars kept alongside the cache file
+    :param cache_file: path of the cache file
+    :return: path of the host index file
+    '''
+    return os.path.splitext(cache_file)[0] + '.hosts.json'
+
+
+def _read_state(state_file):
+    '''
+    Return the per server state saved by the previous incremental refresh
+    :param state_file: path of the state file
+    :return: dictionary of server id(k) and {'groups', 'modified', 'hostvars'}(v)
+    '''
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if state.get('version') != STATE_VERSION:
+        return {}
+    return state.get('servers', {})
+
+
+@contextmanager
+def _cache_lock(cache_file):
+    '''
+    Hold an exclusive lock on the cache so that only one invocation rebuilds it at a time
+    :param cache_file: path of the cache file to lock
+    :return: None
+    '''
+    with open(cache_file + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
-def _find_all_groups():
+def _find_all_groups(details=None):
     '''
-    Obtain a list of all datacenters for the account, and then return a list of their Server Groups
+    Obtain a list of all datacenters for the account, and then return a list of their Server Groups.
+    Datacenters are crawled concurrently, sharing the clc-sdk requests session.
+    :cvar GROUP_POOL_CNT: The number of threads to use
+    :param details: optional dictionary to collect the server details returned with each group into
     :return: group dictionary
     '''
-    datacenters = _filter_datacenters(clc.v2.Datacenter.Datacenters())
-    results = [_find_groups_for_datacenter(datacenter) for datacenter in datacenters]
+    alias = clc.v2.Account.GetAlias()
+    locations = _filter_datacenters(
+        [datacenter['id'] for datacenter in clc.v2.API.Call('GET', 'datacenters/%s' % alias, {})])
+    server_groups = [] if details is not None else None
+
+    p = ThreadPool(GROUP_POOL_CNT)
+    try:
+        results = p.map(
+            lambda location: _find_groups_for_datacenter(
+                clc.v2.Datacenter(location=location, alias=alias), server_groups),
+            locations)
+        if server_groups:
+            for group_details in p.map(_find_server_details_for_group, server_groups):
+                details.update(group_details)
+    finally:
+        p.close()
+        p.join()
 
     # Filter out results with no values
     results = [result for result in results if result]
@@ -107,23 +596,26 @@ def _filter_datacenters(datacenters):
         return datacenters
 
 
-def _find_groups_for_datacenter(datacenter):
+def _find_groups_for_datacenter(datacenter, server_groups=None):
     '''
     Return a dictionary of groups and hosts for the given datacenter
     :param datacenter: The datacenter to use for finding groups
+    :param server_groups: optional list to collect the groups that contain servers into
     :return: dictionary of { '<GROUP NAME>': 'hosts': [SERVERS]}
     '''
     result = {}
     groups = datacenter.Groups().groups
-    result = _find_all_servers_for_group( datacenter, groups )
+    result = _find_all_servers_for_group( datacenter, groups, server_groups )
     if result:
         return result
 
-def _find_all_servers_for_group( datacenter, groups):
+def _find_all_servers_for_group( datacenter, groups, server_groups=None):
     '''
     recursively walk down all groups retrieving server information.
+    The whole group tree is returned with the datacenter's root group, so the walk makes no API calls.
     :param datacenter: The datacenter being search.
     :param groups: The current group level which is being searched.
+    :param server_groups: optional list to collect the groups that contain servers into
     :return: dictionary of {'<GROUP NAME>': 'hosts': [SERVERS]}
     '''
     result = {}
@@ -131,7 +623,7 @@ def _find_all_servers_for_group( datacenter, groups):
         sub_groups = group.Subgroups().groups
         if ( len(sub_groups) > 0 ):
             sub_result = {}
-            sub_result = _find_all_servers_for_group( datacenter, sub_groups )
+            sub_result = _find_all_servers_for_group( datacenter, sub_groups, server_groups )
             if sub_result is not None:
                 result.update( sub_result )
 
@@ -143,6 +635,9 @@ def _find_all_servers_for_group( datacenter, groups):
         except CLCException:
             continue  # Skip any groups we can't read.
 
+        if servers and server_groups is not None:
+            server_groups.append(group)
+
         if servers:
             result[group.name] = {'hosts': servers}
             result[
@@ -155,25 +650,152 @@ def _find_all_servers_for_group( datacenter, groups):
         return result
 
 
-def _find_all_hostvars_for_servers(servers):
+def _find_server_details_for_group(group):
+    '''
+    Return the details of every server in a group.  The group is requested with its server
+    details expanded so that no request per server is needed.  Servers the API does not
+    return details for are simply left out, and are requested individually.
+    :param group: the clc-sdk.Group to read
+    :return: dictionary of lower case server id(k) and server details(v)
+    '''
+    details = {}
+    try:
+        group_obj = clc.v2.API.Call(method='GET',
+                                    url='groups/{0}/{1}'.format(group.alias, group.id),
+                                    payload={'serverDetail': 'detailed'})
+    except (CLCException, APIFailedResponse):
+        return details  # Fall back to requesting every server in the group
+
+    for server_obj in group_obj.get('servers') or []:
+        try:
+            details[server_obj['id'].lower()] = server_obj
+        except (KeyError, TypeError, AttributeError):
+            continue
+    return details
+
+
+def _get_modified_date(server_obj):
+    '''
+    Return the changeInfo.modifiedDate of a server
+    :param server_obj: the server details returned by the API
+    :return: the modifiedDate, or None if it is unknown
+    '''
+    try:
+        return server_obj['changeInfo']['modifiedDate']
+    except (KeyError, TypeError):
+        return None
+
+
+def _is_server_detail_complete(server_obj):
+    '''
+    Check that server details returned with a group hold everything hostvars are built from
+    :param server_obj: the server details returned by the API
+    :return: True if the details can be used without requesting the server
+    '''
+    try:
+        return ('name' in server_obj and 'os' in server_obj and 'locationId' in server_obj and
+                'ipAddresses' in server_obj['details'] and
+                'customFields' in server_obj['details'])
+    except (KeyError, TypeError):
+        return False
+
+
+def _get_server_memberships(groups):
+    '''
+    Return the sorted list of groups each server belongs to
+    :param groups: dictionary of groups to parse
+    :return: dictionary of server id(k) and list of group names(v)
+    '''
+    memberships = {}
+    for group in groups:
+        for server_id in groups[group]['hosts']:
+            memberships.setdefault(server_id, []).append(group)
+    for server_id in memberships:
+        memberships[server_id].sort()
+    return memberships
+
+
+def _find_hostvars_incremental(groups, details, previous):
     '''
-    Return a hostvars dictionary for the provided list of servers.
-    Multithreaded to optimize network calls.
-    :cvar HOSTVAR_POOL_CNT: The number of threads to use
-    :param servers: list of servers to find hostvars for
-    :return: dictionary of servers(k) and hostvars(v)
+    Return a hostvars dictionary reusing the previous state for every server whose
+    group membership and modifiedDate are unchanged.  New and changed servers are
+    fetched from the API and servers that no longer exist are dropped from the state.
+    :param groups: dictionary of groups and hosts
+    :param details: dictionary of lower case server id(k) and server details returned with its group(v)
+    :param previous: per server state saved by the previous refresh
+    :return: tuple of the hostvars dictionary and the new state to save
     '''
-    p = Pool(HOSTVAR_POOL_CNT)
-    results = p.map(_find_hostvars_single_server, servers)
-    p.close()
-    p.join()
+    state = {}
+    stale = []
+    for server_id, server_groups in _get_server_memberships(groups).items():
+        cached = previous.get(server_id)
+        modified = _get_modified_date(details.get(server_id.lower()))
+        if (cached and modified and cached.get('modified') == modified and
+                cached.get('groups') == server_groups):
+            state[server_id] = cached
+        else:
+            stale.append((server_id, server_groups, modified))
+
+    results = _find_hostvars_for_server_ids([server_id for server_id, _, _ in stale], details)
+    for (server_id, server_groups, modified), result in zip(stale, results):
+        if result is None:
+            continue  # Not cached, so that the server is retried on the next refresh
+        if not modified:
+            modified = list(result.values())[0]['clc_data'].get(
+                'changeInfo', {}).get('modifiedDate')
+        state[server_id] = {
+            'groups': server_groups,
+            'modified': modified,
+            'hostvars': result
+        }
 
     hostvars = {}
-    for result in results:
-        if result is not None:
-            hostvars.update(result)
+    for server_id in state:
+        hostvars.update(state[server_id]['hostvars'])
+
+    return {'hostvars': hostvars}, {'version': STATE_VERSION, 'servers': state}
+
+
+def _find_hostvars_for_server_ids(server_ids, details=None):
+    '''
+    Return the hostvars of each server, in the same order as the provided server ids.
+    :param server_ids: list of server ids to find hostvars for
+    :param details: optional dictionary of lower case server id(k) and server details returned with its group(v)
+    :return: list of hostvars dictionaries, None for servers that could not be read
+    '''
+    return list(_iter_hostvars_for_server_ids(server_ids, details))
+
+
+def _iter_hostvars_for_server_ids(server_ids, details=None):
+    '''
+    Yield the hostvars of each server, in the same order as the provided server ids, as soon
+    as they are read.  Servers with complete details returned with their group are built
+    without a request, the rest are requested individually.
+    Multithreaded to optimize network calls.  The threads share the keep-alive
+    connections of the clc-sdk requests session, and results stay in process.
+    :param server_ids: list of server ids to find hostvars for
+    :param details: optional dictionary of lower case server id(k) and server details returned with its group(v)
+    :return: generator of hostvars dictionaries, None for servers that could not be read
+    '''
+    server_ids = list(server_ids)
+    if not server_ids:
+        return
+    details = details if details is not None else {}
+
+    def find_hostvars(server_id):
+        # Drop the group details once they are used so that they do not outlive their server
+        server_obj = details.pop(server_id.lower(), None)
+        if _is_server_detail_complete(server_obj):
+            return _build_hostvars_single_server(server_id, server_obj)
+        return _find_hostvars_single_server(server_id)
 
-    return {'hostvars': hostvars}
+    p = ThreadPool(min(_get_hostvar_pool_cnt(), len(server_ids)))
+    try:
+        for result in p.imap(find_hostvars, server_ids):
+            yield result
+    finally:
+        p.close()
+        p.join()
 
 
 def _find_hostvars_single_server(server_id):
@@ -182,16 +804,28 @@ def _find_hostvars_single_server(server_id):
     :param server_id: the id of the server to query
     :return:
     '''
-    result = {}
     try:
-        session = clc.requests.Session()
-
+        # The alias is only known once logged in, when the credentials are a username and password
+        alias = clc.v2.Account.GetAlias()
         server_obj = clc.v2.API.Call(method='GET',
-                                     url='servers/{0}/{1}'.format(clc.ALIAS, server_id),
-                                     payload={},
-                                     session=session)
+                                     url='servers/{0}/{1}'.format(alias, server_id),
+                                     payload={})
+    except (CLCException, APIFailedResponse):
+        return  # Skip any servers that return an api exception
+
+    return _build_hostvars_single_server(server_id, server_obj)
+
 
-        server = clc.v2.Server(id=server_id, server_obj=server_obj)
+def _build_hostvars_single_server(server_id, server_obj):
+    '''
+    Return dictionary of hostvars for a single server from its details
+    :param server_id: the id of the server
+    :param server_obj: the server details returned by the API
+    :return:
+    '''
+    result = {}
+    try:
+        server = clc.v2.Server(id=server_id, alias=clc.ALIAS, server_obj=server_obj)
 
         if len(server.data['details']['ipAddresses']) == 0:
             return
@@ -202,9 +836,49 @@ def _find_hostvars_single_server(server_id):
             'clc_custom_fields': server.data['details']['customFields']
         }
         result = _add_windows_hostvars(result, server)
-    except (CLCException, APIFailedResponse, KeyError):
-        return  # Skip any servers that return bad data or an api exception
+    except (CLCException, KeyError):
+        return  # Skip any servers that return bad data
+
+    fields = _get_hostvar_fields()
+    if fields is not None:
+        result[server.name]['clc_data'] = _project_server_data(server.data, fields)
+    return result
 
+
+def _get_hostvar_fields():
+    '''
+    Return the fields of the server details to keep in clc_data, read from the
+    CLC_INV_HOSTVAR_FIELDS env var as a comma separated list of fields or dotted paths.
+    Fields used to build dynamic groups are always kept.
+    :return: list of fields, or None to keep all of the server details
+    '''
+    fields = _get_env_list('CLC_INV_HOSTVAR_FIELDS')
+    if not fields:
+        return None
+    return fields + [field for field in DYNAMIC_GROUP_FIELDS if field not in fields]
+
+
+def _project_server_data(data, fields):
+    '''
+    Copy only the listed fields of the server details.  Dotted paths select nested
+    fields, e.g. details.powerState, and keep their nesting in the result.
+    :param data: the server details returned by the API
+    :param fields: list of fields or dotted paths to keep
+    :return: dictionary of the selected server details
+    '''
+    result = {}
+    for field in fields:
+        keys = field.split('.')
+        value = data
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = result
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
     return result
 
 def _add_windows_hostvars(hostvars, server):
@@ -225,83 +899,111 @@ def _add_windows_hostvars(hostvars, server):
 def _build_hostvars_dynamic_groups(hostvars):
     '''
     Build a dictionary of dynamically generated groups, parsed from
-    the hostvars of each server.
+    the hostvars of each server in a single pass.
     :param hostvars: hostvars to process
     :return: dictionary of dynamically built groups based on server attributes
     '''
     result = {}
-    result.update(_build_datacenter_groups(hostvars=hostvars))
+    custom_fields = _get_env_list('CLC_INV_CUSTOM_FIELD_GROUPS')
+    hostvars = hostvars.get('hostvars')
+    for server in hostvars:
+        for group in _get_dynamic_group_names(hostvars[server], custom_fields):
+            if group not in result:
+                result[group] = []
+            result[group].append(server)
     return result
 
 
-def _build_datacenter_groups(hostvars):
+def _get_dynamic_group_names(host, custom_fields=None):
     '''
-    Return a dictionary of groups, one for each datacenter, containing all
-    of the servers in that datacenter
-    :param hostvars: The hostvars dictionary to parse
-    :return: Dictionary of dynamically built Datacenter groups
+    Return the names of the dynamic groups a server belongs to: its datacenter, plus
+    os_<family>, power_<state>, status_<status>, storage_<type> and type_<type> groups
+    and a cf_<field>_<value> group for each listed custom field that is set
+    :param host: the hostvars of the server
+    :param custom_fields: list of names or ids of the custom fields to group by
+    :return: list of group names
     '''
-    result = {}
-    hostvars = hostvars.get('hostvars')
-    for server in hostvars:
-        datacenter = hostvars[server]['clc_data']['locationId']
-        if datacenter not in result:
-            result[datacenter] = []
-        result[datacenter] += [server]
-    return result
+    data = host['clc_data']
+    details = data.get('details') or {}
+    groups = [data['locationId']]
+
+    os_family = re.match('[A-Za-z]*', data.get('os') or '').group(0)
+    for prefix, value in (('os', os_family),
+                          ('power', details.get('powerState')),
+                          ('status', data.get('status')),
+                          ('storage', data.get('storageType')),
+                          ('type', data.get('type'))):
+        if value:
+            groups.append(_sanitize_group_name(u'%s_%s' % (prefix, value)))
+
+    for field in host.get('clc_custom_fields') or []:
+        value = field.get('value')
+        if custom_fields and value not in (None, '') and (
+                field.get('name') in custom_fields or field.get('id') in custom_fields):
+            groups.append(_sanitize_group_name(u'cf_%s_%s' % (field.get('name'), value)))
+
+    return groups
+
+
+def _sanitize_group_name(name):
+    '''
+    Make a group name safe to use in Ansible patterns
+    :param name: the group name
+    :return: lower case group name with anything but letters, digits and underscores replaced
+    '''
+    return re.sub('[^a-z0-9_]', '_', name.lower())
 
 
 def _parse_groups_result_to_dict(lst):
     '''
-    Return a parsed list of groups that can be converted to Ansible Inventory JSON
+    Return a parsed list of groups that can be converted to Ansible Inventory JSON.
+    Groups of the same name in several datacenters are merged in a single pass, dropping
+    duplicate hosts and keeping the hosts in the order they were first seen.
     :param lst: list of group results to parse
     :return: dictionary of groups and hosts { '<GROUP NAME>': 'hosts': [SERVERS]}
     '''
     result = {}
-    for groups in sorted(lst):
-        for group in groups:
+    seen = {}
+    for groups in lst:
+        for group, value in groups.items():
             if group not in result:
-                result[group] = {'hosts': []}
-            result[group]['hosts'] += _flatten_list(groups[group]['hosts'])
+                result[group] = {'hosts': list(value['hosts'])}
+                continue
+            # Only groups found in more than one datacenter need a set of their hosts
+            if group not in seen:
+                seen[group] = set(result[group]['hosts'])
+            hosts = result[group]['hosts']
+            for host in value['hosts']:
+                if host not in seen[group]:
+                    seen[group].add(host)
+                    hosts.append(host)
     return result
 
 
 def _get_servers_from_groups(groups):
     '''
-    Return a flat list of servers for the provided dictionary of groups
+    Return a list of the unique servers in the provided dictionary of groups,
+    ordered by group name and then by their order in the group
     :param groups: dictionary of groups to parse
-    :return: flat list of servers ['SERVER1','SERVER2', etc]
+    :return: list of servers ['SERVER1','SERVER2', etc]
     '''
-    return set(_flatten_list([groups[group]['hosts'] for group in groups]))
+    seen = set()
+    return [host for group in sorted(groups) for host in groups[group]['hosts']
+            if not (host in seen or seen.add(host))]
 
 
-def _flatten_list(lst):
-    '''
-    Flattens a list of lists until at least one value is no longer iterable
-    :param lst: list to flatten
-    :return: flattened list
+def _set_requests_session(pool_size):
     '''
-    while not _is_list_flat(lst):
-        lst = list(itertools.chain.from_iterable(lst))
-    return lst
-
-
-def _is_list_flat(lst):
-    '''
-    Checks to see if the list contains any values that are not iterable.
-    :param lst: list to check
-    :return: True if any value in the list is not an iterable
+    Give the clc-sdk a requests session whose connection pool is large enough to
+    keep a connection alive for every worker thread
+    :param pool_size: the number of connections to keep alive
+    :return: None
     '''
-    result = True if len(lst) == 0 else False 
-    i = 0
-    while i < len(lst) and not result:
-        result |= (
-            not isinstance(lst[i], list) and
-            not isinstance(lst[i], dict) and
-            not isinstance(lst[i], tuple) and
-            not isinstance(lst[i], file))
-        i += 1
-    return result
+    session = clc.requests.Session()
+    adapter = clc.requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    clc.SetRequestsSession(session)
 
 
 def _set_clc_credentials_from_env():
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# Copyright 2015 CenturyLink
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Micro-benchmark of the clc_inv group aggregation, comparing it with the
+_flatten_list pipeline it replaced.  It is not run with the unit tests:
+
+    PYTHONPATH=src/main/python python src/unittest/python/benchmark_clc_inv.py
+
+The inventory has 10k hosts in 500 groups over 5 datacenters, and every group
+is also listed under its <DC>_<group> name, the way clc_inv reports them.
+'''
+
+import argparse
+import io
+import itertools
+import timeit
+
+import clc_inv
+
+try:
+    _FILE_TYPES = (file, io.IOBase)
+except NameError:
+    _FILE_TYPES = (io.IOBase,)
+
+
+def _old_parse_groups_result_to_dict(lst):
+    try:
+        lst = sorted(lst)
+    except TypeError:
+        lst = sorted(lst, key=sorted)  # Python 3 does not order dictionaries
+    result = {}
+    for groups in lst:
+        for group in groups:
+            if group not in result:
+                result[group] = {'hosts': []}
+            result[group]['hosts'] += _old_flatten_list(groups[group]['hosts'])
+    return result
+
+
+def _old_get_servers_from_groups(groups):
+    return set(_old_flatten_list([groups[group]['hosts'] for group in groups]))
+
+
+def _old_flatten_list(lst):
+    while not _old_is_list_flat(lst):
+        lst = list(itertools.chain.from_iterable(lst))
+    return lst
+
+
+def _old_is_list_flat(lst):
+    result = True if len(lst) == 0 else False
+    i = 0
+    while i < len(lst) and not result:
+        result |= (
+            not isinstance(lst[i], list) and
+            not isinstance(lst[i], dict) and
+            not isinstance(lst[i], tuple) and
+            not isinstance(lst[i], _FILE_TYPES))
+        i += 1
+    return result
+
+
+def build_group_results(hosts=10000, groups=500, datacenters=5):
+    '''
+    Return the per datacenter group results of a synthetic inventory
+    :param hosts: the number of hosts
+    :param groups: the number of groups
+    :param datacenters: the number of datacenters the groups are spread over
+    :return: list of dictionaries of groups and hosts, one per datacenter
+    '''
+    per_group = hosts // groups
+    results = []
+    for dc in range(datacenters):
+        result = {}
+        for group in range(dc, groups, datacenters):
+            group_hosts = ['DC%dSERVER%d' % (dc, group * per_group + i) for i in range(per_group)]
+            result['GROUP%d' % group] = {'hosts': group_hosts}
+            result['DC%d_GROUP%d' % (dc, group)] = {'hosts': list(group_hosts)}
+        results.append(result)
+    return results
+
+
+def best_time(func, arg, number, repeat):
+    '''
+    Return the best time of a function over several runs
+    :param func: the function to time
+    :param arg: the argument to call it with
+    :param number: the number of calls per run
+    :param repeat: the number of runs
+    :return: the best time of a single call, in milliseconds
+    '''
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the clc_inv group aggregation')
+    parser.add_argument('--hosts', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--datacenters', type=int, default=5)
+    parser.add_argument('--number', type=int, default=10, help='calls per run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs, the best is reported')
+    args = parser.parse_args()
+
+    lst = build_group_results(args.hosts, args.groups, args.datacenters)
+    old_groups = _old_parse_groups_result_to_dict(lst)
+    new_groups = clc_inv._parse_groups_result_to_dict(lst)
+    assert sorted(old_groups) == sorted(new_groups)
+    assert _old_get_servers_from_groups(old_groups) == set(clc_inv._get_servers_from_groups(new_groups))
+
+    print('%d hosts in %d groups over %d datacenters, best of %dx%d runs' % (
+        args.hosts, args.groups, args.datacenters, args.repeat, args.number))
+    print('%-30s %10s %10s' % ('', 'old (ms)', 'new (ms)'))
+    for name, old, new, arg_old, arg_new in [
+            ('_parse_groups_result_to_dict', _old_parse_groups_result_to_dict,
+             clc_inv._parse_groups_result_to_dict, lst, lst),
+            ('_get_servers_from_groups', _old_get_servers_from_groups,
+             clc_inv._get_servers_from_groups, old_groups, new_groups)]:
+        print('%-30s %10.2f %10.2f' % (name, best_time(old, arg_old, args.number, args.repeat),
+                                       best_time(new, arg_new, args.number, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
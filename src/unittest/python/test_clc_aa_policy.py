@@ -54,7 +54,8 @@ class TestClcAntiAffinityPolicy(unittest.TestCase):
 
     def testLoginMagic(self):
         self.policy.clc.v2.SetCredentials = mock.MagicMock()
-        with patch.dict('os.environ', {'CLC_V2_API_USERNAME':'passWORD', 'CLC_V2_API_PASSWD':'UsErnaME'}):
+        with patch.dict('os.environ', {'CLC_V2_API_USERNAME':'passWORD', 'CLC_V2_API_PASSWD':'UsErnaME',
+                                       'CLC_TOKEN_CACHE_TTL': '0'}):
             try:
                 self.policy.process_request()
             except:
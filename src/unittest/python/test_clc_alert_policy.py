@@ -48,7 +48,8 @@ class TestClcAlertPolicy(unittest.TestCase):
 
     def testLoginMagic(self):
         self.policy.clc.v2.SetCredentials = mock.MagicMock()
-        with patch.dict('os.environ', {'CLC_V2_API_USERNAME':'passWORD', 'CLC_V2_API_PASSWD':'UsErnaME'}):
+        with patch.dict('os.environ', {'CLC_V2_API_USERNAME':'passWORD', 'CLC_V2_API_PASSWD':'UsErnaME',
+                                       'CLC_TOKEN_CACHE_TTL': '0'}):
             try:
                 self.policy.process_request()
             except:
@@ -178,6 +179,24 @@ class TestClcAlertPolicy(unittest.TestCase):
         self.module.exit_json.assert_called_once_with(changed=True, policy='success')
         self.assertFalse(self.module.fail_json.called)
 
+    @patch.object(clc_alert_policy.clc_common, 'LookupCache')
+    @patch.object(ClcAlertPolicy, '_get_alert_policies')
+    @patch.object(ClcAlertPolicy, '_ensure_alert_policy_is_present')
+    @patch.object(ClcAlertPolicy, '_set_clc_credentials_from_env')
+    def test_process_request_invalidates_lookup_cache(self, mock_set_clc_creds, mock_ensure_alert_policy,
+                                                       mock_get_alert_policies, mock_lookup_cache):
+        self.module.params = {'name': 'testname', 'alias': 'testalias', 'state': 'present'}
+        self.module.check_mode = False
+
+        mock_ensure_alert_policy.return_value = False, 'success'
+        ClcAlertPolicy(self.module).process_request()
+        self.assertFalse(mock_lookup_cache.called)
+
+        mock_ensure_alert_policy.return_value = True, 'success'
+        ClcAlertPolicy(self.module).process_request()
+        mock_lookup_cache.assert_called_once_with('alert_policies')
+        mock_lookup_cache.return_value.invalidate.assert_called_once_with(['testalias'])
+
     @patch.object(ClcAlertPolicy, '_get_alert_policies')
     @patch.object(ClcAlertPolicy, '_ensure_alert_policy_is_absent')
     @patch.object(ClcAlertPolicy, '_set_clc_credentials_from_env')
@@ -0,0 +1,670 @@
+#!/usr/bin/env python
+# Copyright 2015 CenturyLink
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+import clc as clc_sdk
+import mock
+from mock import patch
+
+import clc_ansible_module.clc_common as clc_common
+
+LOGIN_RESPONSE = {'bearerToken': 'TOKEN', 'accountAlias': 'TST', 'locationAlias': 'UC1',
+                  'userName': 'hansolo', 'roles': ['AccountAdmin']}
+
+
+class TestClcCommonTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.env = patch.dict('os.environ', {'CLC_TOKEN_CACHE_PATH': self.cache_dir,
+                                             'CLC_TOKEN_CACHE_TTL': '300'})
+        self.env.start()
+        self.login = mock.MagicMock(return_value=dict(LOGIN_RESPONSE))
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_login_reuses_cached_token(self):
+        first = clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        second = clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        self.assertEqual(self.login.call_count, 1)
+        self.assertEqual(first['bearerToken'], 'TOKEN')
+        self.assertEqual(second['bearerToken'], 'TOKEN')
+        self.assertEqual(second['accountAlias'], 'TST')
+        self.assertEqual(second['locationAlias'], 'UC1')
+
+    def test_get_login_keyed_by_endpoint_user_and_password(self):
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'xwing', self.login)
+        clc_common.get_login('https://api.ctl.io', 'chewie', 'falcon', self.login)
+        clc_common.get_login('https://api.other', 'hansolo', 'falcon', self.login)
+        self.assertEqual(self.login.call_count, 4)
+
+    def test_get_login_expired_token(self):
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        with patch('clc_ansible_module.clc_common.time.time', return_value=time.time() + 301):
+            clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        self.assertEqual(self.login.call_count, 2)
+
+    def test_get_login_cache_disabled(self):
+        with patch.dict('os.environ', {'CLC_TOKEN_CACHE_TTL': '0'}):
+            clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+            clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        self.assertEqual(self.login.call_count, 2)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_get_login_failed_login_not_cached(self):
+        self.login.return_value = {'message': 'Invalid login'}
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        self.assertEqual(self.login.call_count, 2)
+
+    def test_get_login_cache_file_private(self):
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        cache_file = clc_common._get_token_cache_file('https://api.ctl.io', 'hansolo', 'falcon')
+        self.assertEqual(stat.S_IMODE(os.stat(cache_file).st_mode), 0o600)
+        with open(cache_file) as f:
+            cached = json.load(f)
+        self.assertEqual(sorted(cached), ['accountAlias', 'bearerToken', 'created', 'locationAlias'])
+
+    def test_set_cached_login(self):
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        mock_clc_sdk = mock.MagicMock()
+        mock_clc_sdk.defaults.ENDPOINT_URL_V2 = 'https://api.ctl.io'
+        clc_common.set_cached_login(mock_clc_sdk, 'hansolo', 'falcon')
+        self.assertFalse(mock_clc_sdk.v2.API._Login.called)
+        self.assertEqual(mock_clc_sdk._LOGIN_TOKEN_V2, 'TOKEN')
+        self.assertEqual(mock_clc_sdk.ALIAS, 'TST')
+        self.assertEqual(mock_clc_sdk.LOCATION, 'UC1')
+
+    def test_set_cached_login_logs_in_once(self):
+        mock_clc_sdk = mock.MagicMock()
+        mock_clc_sdk.defaults.ENDPOINT_URL_V2 = 'https://api.ctl.io'
+
+        def login():
+            mock_clc_sdk._LOGIN_TOKEN_V2 = 'TOKEN'
+            mock_clc_sdk.ALIAS = 'TST'
+            mock_clc_sdk.LOCATION = 'UC1'
+
+        mock_clc_sdk.v2.API._Login.side_effect = login
+        clc_common.set_cached_login(mock_clc_sdk, 'hansolo', 'falcon')
+        mock_clc_sdk._LOGIN_TOKEN_V2 = None
+        clc_common.set_cached_login(mock_clc_sdk, 'hansolo', 'falcon')
+        self.assertEqual(mock_clc_sdk.v2.API._Login.call_count, 1)
+        self.assertEqual(mock_clc_sdk._LOGIN_TOKEN_V2, 'TOKEN')
+
+    def test_get_login_drops_rejected_token(self):
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        self.login.return_value = dict(LOGIN_RESPONSE, bearerToken='TOKEN2')
+        token = clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login,
+                                     rejected_token='TOKEN')
+        self.assertEqual(token['bearerToken'], 'TOKEN2')
+        # A token rejected after another task already replaced it does not log in again
+        token = clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login,
+                                     rejected_token='TOKEN')
+        self.assertEqual(token['bearerToken'], 'TOKEN2')
+        self.assertEqual(self.login.call_count, 2)
+
+    def test_set_cached_login_renews_rejected_token(self):
+        clc_common.get_login('https://api.ctl.io', 'hansolo', 'falcon', self.login)
+        mock_clc_sdk = mock.MagicMock()
+        mock_clc_sdk.defaults.ENDPOINT_URL_V2 = 'https://api.ctl.io'
+        mock_clc_sdk._REQUESTS_SESSION = clc_common.ClcSession(retries=0)
+
+        def login():
+            mock_clc_sdk._LOGIN_TOKEN_V2 = 'TOKEN2'
+            mock_clc_sdk.ALIAS = 'TST'
+            mock_clc_sdk.LOCATION = 'UC1'
+
+        mock_clc_sdk.v2.API._Login.side_effect = login
+        clc_common.set_cached_login(mock_clc_sdk, 'hansolo', 'falcon')
+        self.assertEqual(mock_clc_sdk._LOGIN_TOKEN_V2, 'TOKEN')
+
+        session = mock_clc_sdk._REQUESTS_SESSION
+        session.headers['Authorization'] = 'Bearer TOKEN'
+        with patch('clc_ansible_module.clc_common.requests.Session.request',
+                   side_effect=[_response(401), _response(200)]) as mock_request:
+            response = session.request('GET', 'https://api.ctl.io/v2/datacenters/TST')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_clc_sdk.v2.API._Login.call_count, 1)
+        self.assertEqual(mock_clc_sdk._LOGIN_TOKEN_V2, 'TOKEN2')
+        self.assertEqual(session.headers['Authorization'], 'Bearer TOKEN2')
+        with open(clc_common._get_token_cache_file('https://api.ctl.io', 'hansolo', 'falcon')) as f:
+            self.assertEqual(json.load(f)['bearerToken'], 'TOKEN2')
+
+    def test_set_cached_login_failed_login(self):
+        mock_clc_sdk = mock.MagicMock()
+        mock_clc_sdk.defaults.ENDPOINT_URL_V2 = 'https://api.ctl.io'
+        mock_clc_sdk._LOGIN_TOKEN_V2 = None
+        mock_clc_sdk.v2.API._Login.side_effect = Exception('Invalid V2 API login.')
+        clc_common.set_cached_login(mock_clc_sdk, 'hansolo', 'falcon')
+        self.assertIsNone(mock_clc_sdk._LOGIN_TOKEN_V2)
+        self.assertEqual(os.listdir(self.cache_dir), [
+            os.path.basename(clc_common._get_token_cache_file(
+                'https://api.ctl.io', 'hansolo', 'falcon')) + '.lock'])
+
+
+def _response(status_code, headers=None):
+    response = mock.MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+@patch('clc_ansible_module.clc_common.time.sleep')
+@patch('clc_ansible_module.clc_common.requests.Session.request')
+class TestClcCommonSession(unittest.TestCase):
+
+    def test_request_applies_default_timeout(self, mock_request, mock_sleep):
+        mock_request.return_value = _response(200)
+        session = clc_common.ClcSession(timeout=30, retries=0)
+        session.get('https://api.ctl.io/v2/datacenters/TST')
+        mock_request.assert_called_once_with(
+            'GET', 'https://api.ctl.io/v2/datacenters/TST', allow_redirects=True, timeout=(10, 30))
+
+    def test_request_retries_get_on_server_error(self, mock_request, mock_sleep):
+        ok = _response(200)
+        mock_request.side_effect = [_response(503), ok]
+        session = clc_common.ClcSession(retries=3)
+        self.assertEqual(session.request('GET', 'https://api.ctl.io/v2/servers/TST/X'), ok)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+        stats = session.get_stats()
+        self.assertEqual((stats['calls'], stats['retries'], stats['errors']), (2, 1, 1))
+
+    def test_request_does_not_retry_post_on_server_error(self, mock_request, mock_sleep):
+        mock_request.return_value = _response(500)
+        session = clc_common.ClcSession(retries=3)
+        self.assertEqual(session.request('POST', 'https://api.ctl.io/v2/servers/TST').status_code, 500)
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+    def test_request_retries_post_when_throttled(self, mock_request, mock_sleep):
+        mock_request.side_effect = [_response(429, {'Retry-After': '7'}), _response(202)]
+        session = clc_common.ClcSession(retries=3)
+        self.assertEqual(session.request('POST', 'https://api.ctl.io/v2/servers/TST').status_code, 202)
+        self.assertTrue(mock_sleep.call_args[0][0] >= 7)
+
+    def test_request_gives_up_after_retries(self, mock_request, mock_sleep):
+        mock_request.side_effect = clc_common.requests.exceptions.ConnectionError('refused')
+        session = clc_common.ClcSession(retries=2)
+        self.assertRaises(clc_common.requests.exceptions.ConnectionError,
+                          session.request, 'GET', 'https://api.ctl.io/v2/datacenters/TST')
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(session.get_stats()['errors'], 3)
+
+    def test_request_retries_post_only_before_connecting(self, mock_request, mock_sleep):
+        mock_request.side_effect = clc_common.requests.exceptions.ConnectionError('reset')
+        session = clc_common.ClcSession(retries=2)
+        self.assertRaises(clc_common.requests.exceptions.ConnectionError,
+                          session.request, 'POST', 'https://api.ctl.io/v2/servers/TST')
+        self.assertEqual(mock_request.call_count, 1)
+
+        mock_request.reset_mock()
+        mock_request.side_effect = [clc_common.requests.exceptions.ConnectTimeout('timeout'), _response(202)]
+        self.assertEqual(session.request('POST', 'https://api.ctl.io/v2/servers/TST').status_code, 202)
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_request_renews_rejected_token_once(self, mock_request, mock_sleep):
+        mock_request.side_effect = [_response(401), _response(200), _response(401), _response(401)]
+        session = clc_common.ClcSession(retries=3)
+        session.renew_login = mock.MagicMock(return_value='TOKEN2')
+        response = session.request('GET', 'https://api.ctl.io/v2/servers/TST/X',
+                                   headers={'Authorization': 'Bearer TOKEN'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_args[1]['headers'], {'Authorization': 'Bearer TOKEN2'})
+
+        # A new token that is rejected too is not renewed again
+        response = session.request('GET', 'https://api.ctl.io/v2/servers/TST/X',
+                                   headers={'Authorization': 'Bearer TOKEN2'})
+        self.assertEqual(response.status_code, 401)
+        session.renew_login.assert_called_once_with('TOKEN')
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertFalse(mock_sleep.called)
+
+    def test_get_thread_api_calls(self, mock_request, mock_sleep):
+        mock_request.return_value = _response(200)
+        session = clc_common.ClcSession(retries=0)
+        before = clc_common.get_thread_api_calls()
+        session.get('https://api.ctl.io/v2/datacenters/TST')
+        session.get('https://api.ctl.io/v2/datacenters/TST')
+        other = []
+        thread = clc_common.threading.Thread(target=lambda: other.append(clc_common.get_thread_api_calls()))
+        thread.start()
+        thread.join()
+        self.assertEqual(clc_common.get_thread_api_calls() - before, 2)
+        self.assertEqual(other, [0])
+
+    def test_get_session_sets_user_agent(self, mock_request, mock_sleep):
+        session = clc_common.get_session('ClcAnsibleModule/1')
+        self.assertEqual(session.headers['Api-Client'], 'ClcAnsibleModule/1')
+        self.assertTrue(session.headers['User-Agent'].endswith(' ClcAnsibleModule/1'))
+        self.assertEqual(session.get_adapter('https://api.ctl.io')._pool_maxsize,
+                         clc_common.API_POOL_SIZE_DEFAULT)
+
+    def test_set_user_agent_adds_api_stats(self, mock_request, mock_sleep):
+        mock_request.return_value = _response(200)
+        clc = mock.MagicMock()
+        with patch.object(clc_common, '_API_SESSION', None):
+            clc_common.set_user_agent(clc, 'ClcAnsibleModule/1')
+            session = clc.SetRequestsSession.call_args[0][0]
+            self.assertEqual(session.headers['Api-Client'], 'ClcAnsibleModule/1')
+            self.assertEqual(clc_common.add_wait_stats(mock.MagicMock(), {}), {})
+            session.get('https://api.ctl.io/v2/datacenters/TST')
+            result = clc_common.add_wait_stats(mock.MagicMock(), {})
+        self.assertEqual(result['api_stats']['calls'], 1)
+        self.assertEqual(sorted(result['api_stats']), ['avg_time', 'calls', 'errors', 'max_time', 'retries'])
+
+    def test_backoff_delay(self, mock_request, mock_sleep):
+        for attempt in range(10):
+            delay = clc_common.backoff_delay(attempt, base=1, cap=5)
+            self.assertTrue(0 <= delay <= min(5, 2 ** attempt))
+
+
+class _RecordingAdapter(clc_common.requests.adapters.BaseAdapter):
+
+    def __init__(self):
+        super(_RecordingAdapter, self).__init__()
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append((request.method, request.headers['content-type'],
+                          request.headers['Api-Client']))
+        response = clc_common.requests.Response()
+        response.status_code = 200
+        response._content = b'{}'
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class TestClcCommonSessionThreads(unittest.TestCase):
+
+    def test_concurrent_calls_keep_their_own_headers(self):
+        adapter = _RecordingAdapter()
+        session = clc_common.get_session('ClcAnsibleModule/1')
+        session.mount('https://', adapter)
+
+        def call(index):
+            if index % 2:
+                clc_sdk.v2.API.Call('POST', 'servers/TST', json.dumps({'name': index}), session=session)
+            else:
+                clc_sdk.v2.API.Call('GET', 'servers/TST/%s' % index, {'id': index}, session=session)
+
+        pool = clc_common.ThreadPool(10)
+        with patch.object(clc_sdk, '_LOGIN_TOKEN_V2', 'TOKEN'):
+            try:
+                pool.map(call, range(1500))
+            finally:
+                pool.close()
+        self.assertEqual(len(adapter.sent), 1500)
+        for method, content_type, api_client in adapter.sent:
+            expected = 'Application/json' if method == 'POST' else 'application/x-www-form-urlencoded'
+            self.assertEqual(content_type, expected)
+            self.assertEqual(api_client, 'ClcAnsibleModule/1')
+
+
+def _requests(*statuses):
+    requests = mock.MagicMock()
+    requests.requests = []
+    for status in statuses:
+        request = mock.MagicMock()
+        if isinstance(status, list):
+            request.Status.side_effect = status
+        else:
+            request.Status.return_value = status
+        requests.requests.append(request)
+    return requests
+
+
+def _clock(mock_sleep, times=(), offset=0):
+    """
+    Return a time.time replacement that returns times first, then advances with every mocked sleep
+    """
+    times = list(times)
+    return lambda: times.pop(0) if times else offset + sum(c[0][0] for c in mock_sleep.call_args_list)
+
+
+@patch('clc_ansible_module.clc_common.time.sleep')
+class TestClcCommonRequestWaiter(unittest.TestCase):
+
+    def test_wait_polls_all_requests_each_sweep(self, mock_sleep):
+        first = _requests(['queued', 'running', 'succeeded'])
+        second = _requests(['running', 'succeeded'], ['executing', 'failed'])
+        waiter = clc_common.RequestWaiter(poll_freq=2, pool_size=1)
+        outcome = waiter.wait([first, second])
+        self.assertEqual(outcome['succeeded'], [second.requests[0], first.requests[0]])
+        self.assertEqual(outcome['failed'], [second.requests[1]])
+        self.assertEqual(outcome['pending'], [])
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(first.requests[0].Status.call_count, 3)
+        self.assertFalse(first.WaitUntilComplete.called)
+        stats = waiter.get_stats()
+        self.assertEqual((stats['polls'], stats['sweeps']), (7, 3))
+
+    def test_wait_polls_follow_up_requests_in_same_sweeps(self, mock_sleep):
+        first = _requests(['running', 'succeeded'])
+        second = _requests('failed')
+        follow_up = _requests(['running', 'succeeded'])
+        on_complete = mock.MagicMock(return_value=[follow_up])
+        waiter = clc_common.RequestWaiter(poll_freq=2, pool_size=1)
+        outcome = waiter.wait([first, second], on_complete=on_complete)
+        on_complete.assert_called_once_with([first])
+        self.assertEqual(outcome['succeeded'], [first.requests[0], follow_up.requests[0]])
+        self.assertEqual(outcome['failed'], [second.requests[0]])
+        self.assertEqual(outcome['pending'], [])
+        self.assertEqual(waiter.get_stats()['sweeps'], 4)
+
+    def test_wait_sweeps_concurrently(self, mock_sleep):
+        statuses = [['queued', 'succeeded'], ['running', 'failed'], 'succeeded', ['queued', 'queued', 'succeeded']]
+        waiting = _requests(*statuses * 10)
+        waiter = clc_common.RequestWaiter(poll_freq=2, pool_size=8)
+        outcome = waiter.wait([waiting])
+        self.assertEqual(len(outcome['succeeded']), 30)
+        self.assertEqual(outcome['failed'], waiting.requests[1::4])
+        self.assertEqual(outcome['pending'], [])
+        stats = waiter.get_stats()
+        self.assertEqual((stats['polls'], stats['sweeps']), (80, 3))
+
+    def test_wait_backs_off_while_nothing_completes(self, mock_sleep):
+        waiting = _requests(['queued'] * 5 + ['succeeded'], ['queued', 'succeeded'])
+        clc_common.RequestWaiter(poll_freq=2, max_poll_freq=4, pool_size=1).wait([waiting])
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list], [3.0, 2, 3.0, 4, 4])
+
+    def test_wait_backs_off_as_requests_age(self, mock_sleep):
+        waiting = _requests(['queued'] * 3 + ['succeeded'], ['queued', 'succeeded'])
+        clock = _clock(mock_sleep, [0], 100)
+        with patch('clc_ansible_module.clc_common.time.time', side_effect=clock):
+            clc_common.RequestWaiter(poll_freq=2, max_poll_freq=30, pool_size=1).wait([waiting])
+        for slept, expected in zip([c[0][0] for c in mock_sleep.call_args_list], [10, 11, 16.5]):
+            self.assertAlmostEqual(slept, expected)
+
+    def test_wait_stops_at_deadline(self, mock_sleep):
+        waiting = _requests('running', 'succeeded')
+        with patch('clc_ansible_module.clc_common.time.time', side_effect=_clock(mock_sleep)):
+            outcome = clc_common.RequestWaiter(poll_freq=2, max_poll_freq=4, timeout=12,
+                                               pool_size=1).wait([waiting])
+        self.assertEqual(outcome['pending'], [waiting.requests[0]])
+        self.assertEqual(outcome['succeeded'], [waiting.requests[1]])
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list], [2, 3.0, 4])
+
+    def test_wait_status_error_fails_request(self, mock_sleep):
+        waiting = _requests(None)
+        waiting.requests[0].Status.side_effect = Exception('Unable to reach the API')
+        outcome = clc_common.RequestWaiter().wait([waiting])
+        self.assertEqual(outcome['failed'], waiting.requests)
+        self.assertFalse(mock_sleep.called)
+
+    def test_wait_timeout_from_environment(self, mock_sleep):
+        with patch.dict('os.environ', {'CLC_WAIT_TIMEOUT': '60'}):
+            self.assertEqual(clc_common.RequestWaiter().timeout, 60)
+        self.assertEqual(clc_common.RequestWaiter().timeout, clc_common.WAIT_TIMEOUT_DEFAULT)
+
+    def test_poll_backs_off_until_ready(self, mock_sleep):
+        func = mock.MagicMock(side_effect=[None] * 9 + ['server'])
+        waiter = clc_common.RequestWaiter()
+        self.assertEqual(waiter.poll(func), 'server')
+        self.assertEqual(func.call_count, 10)
+        delays = [c[0][0] for c in mock_sleep.call_args_list]
+        self.assertEqual(len(delays), 9)
+        self.assertTrue(all(0 <= d <= clc_common.RESOLVE_BACKOFF_CAP for d in delays))
+        self.assertTrue(delays[0] <= clc_common.RESOLVE_BACKOFF_BASE)
+        stats = waiter.get_stats()
+        self.assertEqual((stats['resolves'], stats['resolve_attempts']), (1, 10))
+
+    def test_poll_retries_only_retryable_errors(self, mock_sleep):
+        func = mock.MagicMock(side_effect=[KeyError('404'), KeyError('404'), ValueError('500')])
+        waiter = clc_common.RequestWaiter()
+        self.assertRaises(ValueError, waiter.poll, func, is_retryable=lambda ex: isinstance(ex, KeyError))
+        self.assertEqual(func.call_count, 3)
+        self.assertRaises(ValueError, waiter.poll, mock.MagicMock(side_effect=ValueError('500')))
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_poll_raises_last_error_out_of_attempts(self, mock_sleep):
+        func = mock.MagicMock(side_effect=KeyError('404'))
+        waiter = clc_common.RequestWaiter()
+        self.assertRaises(KeyError, waiter.poll, func, is_retryable=lambda ex: True, attempts=3)
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_poll_stops_at_deadline(self, mock_sleep):
+        func = mock.MagicMock(return_value=None)
+        with patch('clc_ansible_module.clc_common.time.time', side_effect=_clock(mock_sleep)):
+            with patch.dict('os.environ', {'CLC_RESOLVE_TIMEOUT': '120'}):
+                self.assertRaises(clc_common.PollTimeout, clc_common.RequestWaiter().poll, func)
+        self.assertTrue(sum(c[0][0] for c in mock_sleep.call_args_list) <= 120)
+        self.assertTrue(func.call_count > 1)
+
+    def test_add_wait_stats(self, mock_sleep):
+        module = mock.MagicMock()
+        self.assertEqual(clc_common.add_wait_stats(module, {'changed': True}), {'changed': True})
+        waiter = clc_common.get_request_waiter(module)
+        self.assertIs(clc_common.get_request_waiter(module), waiter)
+        waiter.wait([_requests('succeeded'), _requests('succeeded')])
+        result = clc_common.add_wait_stats(module, {'changed': True})
+        self.assertEqual(result['wait_stats']['polls'], 2)
+        self.assertEqual(sorted(result['wait_stats']), ['avg_poll_latency', 'polls', 'wait_time'])
+        self.assertEqual(clc_common.add_wait_stats(mock.MagicMock(), {}), {})
+        waiter.poll(lambda: 'server')
+        result = clc_common.add_wait_stats(module, {})
+        self.assertEqual(result['wait_stats']['resolve_attempts'], 1)
+        self.assertEqual(result['wait_stats']['polls'], 2)
+
+    def test_wait_time_is_wall_time_of_overlapping_waits(self, mock_sleep):
+        waiter = clc_common.RequestWaiter()
+        with patch('clc_ansible_module.clc_common.time.time', side_effect=[0.0, 20.0]):
+            waiter._start_timer('wait_time')
+            waiter._start_timer('wait_time')
+            waiter._stop_timer('wait_time')
+            waiter._stop_timer('wait_time')
+        self.assertEqual(waiter.get_stats()['wait_time'], 20.0)
+
+    def test_wait_stats_from_concurrent_threads(self, mock_sleep):
+        waiter = clc_common.RequestWaiter()
+        threads = [clc_common.threading.Thread(
+            target=lambda: waiter.wait([_requests('succeeded', 'succeeded')])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = waiter.get_stats()
+        self.assertEqual((stats['sweeps'], stats['polls']), (8, 16))
+
+
+class TestClcCommonParallelMap(unittest.TestCase):
+
+    def setUp(self):
+        self.module = mock.MagicMock()
+        self.fail_json = self.module.fail_json
+
+    def test_parallel_map_keeps_order(self):
+        def slow_square(i):
+            time.sleep(0.01 * (5 - i))
+            return i * i
+
+        self.assertEqual(clc_common.parallel_map(self.module, slow_square, range(5), concurrency=5),
+                         [0, 1, 4, 9, 16])
+        self.assertFalse(self.fail_json.called)
+
+    def test_parallel_map_bounds_concurrency(self):
+        running = []
+        peak = []
+        lock = clc_common.threading.Lock()
+
+        def call(i):
+            with lock:
+                running.append(i)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(i)
+            return i
+
+        with patch.dict('os.environ', {'CLC_API_CONCURRENCY': '3'}):
+            self.assertEqual(clc_common.parallel_map(self.module, call, range(12)), list(range(12)))
+        self.assertTrue(max(peak) <= 3)
+
+    def test_parallel_map_reports_first_failure_once(self):
+        def call(i):
+            if i % 2:
+                return self.module.fail_json(msg='failed %d' % i)
+            return i
+
+        self.assertEqual(clc_common.parallel_map(self.module, call, range(6), concurrency=6),
+                         [0, None, 2, None, 4, None])
+        self.fail_json.assert_called_once_with(msg='failed 1')
+        self.assertIs(self.module.fail_json, self.fail_json)
+
+    def test_parallel_map_raises_errors(self):
+        def call(i):
+            raise ValueError(i)
+
+        self.assertRaises(ValueError, clc_common.parallel_map, self.module, call, range(3))
+        self.assertIs(self.module.fail_json, self.fail_json)
+
+
+GROUP_TREE = {'id': 'root', 'name': 'UC1 Hardware', 'groups': [
+    {'id': 'g1', 'name': 'Default Group', 'description': 'default', 'groups': [
+        {'id': 'g11', 'name': 'Web', 'description': 'web servers', 'groups': [
+            {'id': 'g111', 'name': 'Api', 'groups': []}]}]},
+    {'id': 'g2', 'name': 'Archive', 'groups': [
+        {'id': 'g21', 'name': 'web', 'groups': []}]}]}
+
+
+class TestClcCommonLookupCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.env = patch.dict('os.environ', {'CLC_LOOKUP_CACHE_PATH': self.cache_dir,
+                                             'CLC_LOOKUP_CACHE_TTL': '300'})
+        self.env.start()
+        self.lookup = mock.MagicMock(return_value={'id': 'template'})
+
+    def tearDown(self):
+        self.env.stop()
+        clc_common._LOOKUPS.clear()
+        clc_common._GROUP_INDEXES.clear()
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_memoizes_and_persists(self):
+        cache = clc_common.LookupCache('templates')
+        self.assertEqual(cache.get(['TST', 'UC1'], self.lookup), {'id': 'template'})
+        self.assertEqual(cache.get(['TST', 'UC1'], self.lookup), {'id': 'template'})
+        self.assertEqual(self.lookup.call_count, 1)
+        # A later task reads the value back from disk
+        clc_common._LOOKUPS.clear()
+        self.assertEqual(cache.get(['TST', 'UC1'], self.lookup), {'id': 'template'})
+        self.assertEqual(self.lookup.call_count, 1)
+        cache.get(['TST', 'VA1'], self.lookup)
+        self.assertEqual(self.lookup.call_count, 2)
+
+    def test_get_expired(self):
+        cache = clc_common.LookupCache('templates')
+        cache.get(['TST', 'UC1'], self.lookup)
+        with patch('clc_ansible_module.clc_common.time.time', return_value=time.time() + 301):
+            cache.get(['TST', 'UC1'], self.lookup)
+        self.assertEqual(self.lookup.call_count, 2)
+
+    def test_invalidate(self):
+        cache = clc_common.LookupCache('templates')
+        cache.get(['TST', 'UC1'], self.lookup)
+        cache.invalidate(['TST', 'UC1'])
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        cache.get(['TST', 'UC1'], self.lookup)
+        self.assertEqual(self.lookup.call_count, 2)
+
+    def test_get_not_cached(self):
+        self.assertEqual(clc_common.LookupCache('templates', ttl=0).get(['TST', 'UC1'], self.lookup),
+                         {'id': 'template'})
+        clc_common.LookupCache('templates').get([mock.MagicMock(), 'UC1'], self.lookup)
+        self.lookup.return_value = None
+        clc_common.LookupCache('templates').get(['TST', 'UC1'], self.lookup)
+        clc_common.LookupCache('templates').get(['TST', 'UC1'], self.lookup)
+        self.assertEqual(self.lookup.call_count, 4)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_find_looks_up_again_on_miss(self):
+        cache = clc_common.LookupCache('policies')
+        lookup = mock.MagicMock(side_effect=[[{'name': 'old', 'id': '1'}],
+                                             [{'name': 'old', 'id': '1'}, {'name': 'new', 'id': '2'}]])
+        match = lambda name: lambda policies: next((p['id'] for p in policies if p['name'] == name), None)
+        self.assertEqual(cache.find(['TST'], lookup, match('old')), '1')
+        self.assertEqual(cache.find(['TST'], lookup, match('old')), '1')
+        self.assertEqual(lookup.call_count, 1)
+        # A policy newer than the cached list is looked up again, and cached
+        self.assertEqual(cache.find(['TST'], lookup, match('new')), '2')
+        self.assertEqual(cache.find(['TST'], lookup, match('new')), '2')
+        self.assertEqual(lookup.call_count, 2)
+
+    def test_find_fresh_lookup_not_repeated(self):
+        lookup = mock.MagicMock(return_value=[])
+        self.assertIsNone(clc_common.LookupCache('policies').find(['TST'], lookup, lambda policies: None))
+        self.assertEqual(lookup.call_count, 1)
+
+    def test_group_index(self):
+        index = clc_common.GroupIndex(GROUP_TREE)
+        self.assertEqual(index.get('default group')['id'], 'g1')
+        self.assertEqual(index.get('g111')['name'], 'Api')
+        self.assertEqual(index.get('WEB SERVERS')['id'], 'g11')
+        # The group closest to the root wins
+        self.assertEqual(index.get('Web')['id'], 'g11')
+        self.assertIsNone(index.get('UC1 Hardware'))
+        self.assertIsNone(index.get('missing'))
+        self.assertEqual([g['id'] for g in index.get_parents('g111')], ['g11', 'g1'])
+        self.assertEqual(index.get_parents('g1'), [])
+
+    def test_get_group_index_built_once(self):
+        get_root = mock.MagicMock(return_value=GROUP_TREE)
+        index = clc_common.get_group_index('TST', 'UC1', get_root)
+        self.assertIs(clc_common.get_group_index('TST', 'UC1', get_root), index)
+        self.assertEqual(get_root.call_count, 1)
+        clc_common.invalidate_group_index('TST', 'UC1')
+        self.assertIsNot(clc_common.get_group_index('TST', 'UC1', get_root), index)
+        self.assertEqual(get_root.call_count, 2)
+        self.assertIsNone(clc_common.get_group_index(mock.MagicMock(), 'UC1', get_root))
+
+    def test_get_group_index_in_memory_only_by_default(self):
+        get_root = mock.MagicMock(return_value=GROUP_TREE)
+        with patch.dict('os.environ', {'CLC_LOOKUP_CACHE_TTL': '0'}):
+            index = clc_common.get_group_index('TST', 'UC1', get_root)
+            self.assertIs(clc_common.get_group_index('TST', 'UC1', get_root), index)
+        self.assertEqual(get_root.call_count, 1)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_get_group_index_persisted_with_group_cache_ttl(self):
+        get_root = mock.MagicMock(return_value=GROUP_TREE)
+        with patch.dict('os.environ', {'CLC_GROUP_CACHE_TTL': '300'}):
+            clc_common.get_group_index('TST', 'UC1', get_root)
+            # A following task reads the group tree from disk
+            clc_common._GROUP_INDEXES.clear()
+            clc_common._LOOKUPS.clear()
+            self.assertEqual(clc_common.get_group_index('TST', 'UC1', get_root).get('web')['id'], 'g11')
+            self.assertEqual(get_root.call_count, 1)
+            clc_common.invalidate_group_index('TST', 'UC1')
+            self.assertEqual(os.listdir(self.cache_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
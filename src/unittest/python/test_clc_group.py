@@ -137,6 +137,16 @@ class TestClcServerFunctions(unittest.TestCase):
 
         self.assertTrue(mock_clc_sdk.SetRequestsSession.called)
 
+    @patch.object(clc_group, 'clc_common', None)
+    @patch.object(clc_group, 'clc_sdk')
+    def test_set_user_agent_without_clc_common(self, mock_clc_sdk):
+        clc_group.__version__ = "1"
+        ClcGroup._set_user_agent(mock_clc_sdk)
+
+        session = mock_clc_sdk.SetRequestsSession.call_args[0][0]
+        self.assertEqual(session.headers['Api-Client'], 'ClcAnsibleModule/1')
+        self.assertTrue(session.headers['User-Agent'].endswith(' ClcAnsibleModule/1'))
+
     @patch.object(ClcGroup, 'clc')
     def test_set_clc_credentials_from_env(self, mock_clc_sdk):
         with patch.dict('os.environ', {'CLC_V2_API_TOKEN': 'dummyToken',
@@ -223,6 +233,28 @@ class TestClcServerFunctions(unittest.TestCase):
             changed=True,
             group='MyCoolGroup')
 
+    @patch.object(ClcGroup, '_set_clc_credentials_from_env')
+    @patch.object(clc_group, 'clc_sdk')
+    def test_process_request_invalidates_group_index(self, mock_clc_sdk, mock_set_creds):
+        self.module.params = {
+            'location': 'UC1',
+            'name': 'MyCoolGroup',
+            'state': 'present',
+            'wait': True
+        }
+        self.module.check_mode = False
+        mock_datacenter = mock_clc_sdk.v2.Datacenter.return_value
+        under_test = ClcGroup(self.module)
+        under_test._ensure_group_is_present = mock.MagicMock(return_value=(True, mock.MagicMock()))
+        with patch.object(clc_group.clc_common, 'invalidate_group_index') as mock_invalidate:
+            under_test.process_request()
+            mock_invalidate.assert_called_once_with(mock_datacenter.alias, mock_datacenter.id)
+
+            mock_invalidate.reset_mock()
+            under_test._ensure_group_is_present.return_value = (False, mock.MagicMock())
+            under_test.process_request()
+            self.assertFalse(mock_invalidate.called)
+
     def test_ensure_group_is_present_group_not_exist(self):
 
         # Setup Test
@@ -13,6 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
+import json
+import time
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 import clc_inv
 from clc import CLCException
 import clc as clc_sdk
@@ -52,8 +61,30 @@ class TestClcInvFunctions(unittest.TestCase):
         result = clc_inv._find_hostvars_single_server('testServerWithNoDetails')
         self.assertIsNone(result)
 
-    def test_find_hostvars_single_server_uses_unique_session(self):
-        pass
+    @patch('clc_inv.clc')
+    def test_find_hostvars_single_server_uses_shared_session(self, mock_clc_sdk):
+        mock_clc_sdk.v2.Account.GetAlias.return_value = 'TST'
+        clc_inv._find_hostvars_single_server('SERVER1')
+        mock_clc_sdk.v2.API.Call.assert_called_once_with(method='GET',
+                                                         url='servers/TST/SERVER1',
+                                                         payload={})
+        self.assertFalse(mock_clc_sdk.requests.Session.called)
+
+    @patch('clc_inv._find_hostvars_single_server')
+    def test_find_hostvars_for_server_ids_keeps_order(self, mock_find_hostvars):
+        mock_find_hostvars.side_effect = lambda server_id: {server_id: {}}
+        with patch.dict('os.environ', {'CLC_INV_HOSTVAR_POOL_CNT': '3'}):
+            res = clc_inv._find_hostvars_for_server_ids(['S%d' % i for i in range(10)])
+        self.assertEqual(res, [{'S%d' % i: {}} for i in range(10)])
+
+    def test_find_hostvars_for_server_ids_empty(self):
+        self.assertEqual(clc_inv._find_hostvars_for_server_ids([]), [])
+
+    def test_get_hostvar_pool_cnt(self):
+        with patch.dict('os.environ', {'CLC_INV_HOSTVAR_POOL_CNT': '40'}):
+            self.assertEqual(clc_inv._get_hostvar_pool_cnt(), 40)
+        with patch.dict('os.environ', {'CLC_INV_HOSTVAR_POOL_CNT': '0'}):
+            self.assertEqual(clc_inv._get_hostvar_pool_cnt(), 1)
 
     @patch.object(clc_inv, 'clc')
     def test_set_clc_credentials_from_env(self, mock_clc_sdk):
@@ -64,41 +95,478 @@ class TestClcInvFunctions(unittest.TestCase):
         self.assertFalse(mock_clc_sdk.v2.SetCredentials.called)
         self.assertEqual(self.module.fail_json.called, False)
 
-    def test_is_list_flat(self):
-        list = [1,2,3]
-        res = clc_inv._is_list_flat(list)
-        self.assertEqual(res, True)
-    
-    def test_is_list_flat_empty_list(self):
-        list = []
-        res = clc_inv._is_list_flat(list)
-        self.assertEqual(res, True)
-
-    def test_flatten_list(self):
-        list = [1,2,3]
-        res = clc_inv._flatten_list(list)
-        self.assertEqual(res, [1,2,3])
+    def test_parse_groups_result_to_dict(self):
+        input = [
+            {'Web': {'hosts': ['UC1WEB02', 'UC1WEB01']}, 'UC1_Web': {'hosts': ['UC1WEB02', 'UC1WEB01']}},
+            {'Web': {'hosts': ['CA1WEB01', 'UC1WEB01']}, 'CA1_Web': {'hosts': ['CA1WEB01']}}
+        ]
+        res = clc_inv._parse_groups_result_to_dict(input)
+        self.assertEqual(res, {
+            'Web': {'hosts': ['UC1WEB02', 'UC1WEB01', 'CA1WEB01']},
+            'UC1_Web': {'hosts': ['UC1WEB02', 'UC1WEB01']},
+            'CA1_Web': {'hosts': ['CA1WEB01']}})
+
+    def test_parse_groups_result_to_dict_many_groups(self):
+        input = [dict(('GROUP%d' % g, {'hosts': ['SERVER%d' % (g * 20 + i) for i in range(20)]})
+                      for g in range(dc, 500, 5)) for dc in range(5)]
+        res = clc_inv._parse_groups_result_to_dict(input)
+        self.assertEqual(len(res), 500)
+        self.assertEqual(len(clc_inv._get_servers_from_groups(res)), 10000)
 
+    def test_get_servers_from_groups(self):
+        groups = {'Web': {'hosts': ['SERVER2', 'SERVER1']}, 'UC1_Web': {'hosts': ['SERVER2', 'SERVER1']}}
+        self.assertEqual(clc_inv._get_servers_from_groups(groups), ['SERVER2', 'SERVER1'])
+
+    @patch.dict('os.environ', {'CLC_INV_CACHE_TTL': '0'})
     @patch('clc_inv._find_all_groups')
     @patch('clc_inv._get_servers_from_groups')
-    @patch('clc_inv._find_all_hostvars_for_servers')
+    @patch('clc_inv._iter_hostvars_for_server_ids')
     @patch('clc_inv._build_hostvars_dynamic_groups')
     @patch('clc_inv._set_clc_credentials_from_env')
     def test_print_inventory_json(self, mock_creds, mock_hostvars_d, mock_hostvars, mock_servers, mock_groups):
         try:
             mock_groups.return_value = {'groups':['group1', 'group2']}
             mock_servers.return_value = ['server1', 'server2']
-            mock_hostvars.return_value = ['var1', 'var2']
+            mock_hostvars.return_value = [{'server1': {'var': 1}}, None]
             mock_hostvars_d.return_value = {'dgroups':['dg1', 'dg2']}
             clc_inv.print_inventory_json()
         except:
             self.fail('Exception was thrown when it was not expected')
 
-    @patch('clc_inv._flatten_list')
-    def test_parse_groups_result_to_dict_empty(self, mock_flatten):
+    @patch('clc_inv._find_inventory')
+    def test_print_inventory_json_from_cache(self, mock_build):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_INV_CACHE_TTL': '300'}):
+                with open(clc_inv._get_cache_file(), 'w') as f:
+                    f.write('{"cached": true}\n')
+                with patch('sys.stdout') as mock_stdout:
+                    clc_inv.print_inventory_json()
+            self.assertFalse(mock_build.called)
+            mock_stdout.write.assert_called_once_with('{"cached": true}\n')
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_copy_cache_read_error_writes_nothing(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache_file = os.path.join(cache_dir, 'clc_inv.json')
+            with open(cache_file, 'w') as f:
+                f.write('{"cached": true}\n')
+            out = StringIO()
+            with patch('clc_inv.open', create=True, side_effect=IOError('read failed')):
+                self.assertFalse(clc_inv._copy_cache(cache_file, 300, out))
+            self.assertEqual(out.getvalue(), '')
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_get_cache_file_creates_private_dir(self):
+        cache_dir = os.path.join(tempfile.mkdtemp(), 'cache')
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir}):
+                clc_inv._get_cache_file()
+            self.assertEqual(os.stat(cache_dir).st_mode & 0o777, 0o700)
+        finally:
+            shutil.rmtree(os.path.dirname(cache_dir))
+
+    @patch('clc_inv._find_inventory')
+    def test_print_inventory_json_refresh_cache(self, mock_build):
+        cache_dir = tempfile.mkdtemp()
+        hostvars = {'SERVER1': {'ansible_ssh_host': '1.2.3.4', 'clc_data': {'locationId': 'UC1'}}}
+        mock_build.return_value = ({'web': ['SERVER1']}, iter(hostvars.items()))
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_INV_CACHE_TTL': '300'}):
+                cache_file = clc_inv._get_cache_file()
+                with open(cache_file, 'w') as f:
+                    f.write('{"cached": true}\n')
+                with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                    clc_inv.print_inventory_json(refresh_cache=True)
+            self.assertTrue(mock_build.called)
+            inventory = {'_meta': {'hostvars': hostvars},
+                         'web': ['SERVER1'],
+                         'UC1': ['SERVER1']}
+            self.assertEqual(json.loads(mock_stdout.getvalue()), inventory)
+            with open(cache_file) as f:
+                self.assertEqual(f.read(), mock_stdout.getvalue())
+            with open(clc_inv._get_host_index_file(cache_file)) as f:
+                self.assertEqual(json.load(f), hostvars)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @patch.dict('os.environ', {'CLC_INV_CACHE_TTL': '0', 'CLC_INV_COMPACT': 'true'})
+    @patch('clc_inv._find_inventory')
+    def test_print_inventory_json_compact(self, mock_build):
+        mock_build.return_value = (
+            {'web': ['SERVER1']}, iter([('SERVER1', {'clc_data': {'locationId': 'UC1'}})]))
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            clc_inv.print_inventory_json()
+        self.assertEqual(
+            mock_stdout.getvalue(),
+            '{"_meta":{"hostvars":{"SERVER1":{"clc_data":{"locationId":"UC1"}}}},'
+            '"UC1":["SERVER1"],"web":["SERVER1"]}\n')
+
+    def test_write_json_object_streams_generators(self):
+        written = []
+
+        def items():
+            yield 'a', iter_items()
+            yield 'b', [1, 2]
+
+        def iter_items():
+            yield 'x', {'y': 1}
+
+        clc_inv._write_json_object(written.append, items(), False)
+        self.assertTrue(len(written) > 1)
+        self.assertEqual(json.loads(''.join(written)), {'a': {'x': {'y': 1}}, 'b': [1, 2]})
+        self.assertEqual(''.join(written),
+                         json.dumps({'a': {'x': {'y': 1}}, 'b': [1, 2]},
+                                    indent=2, separators=(',', ': '), sort_keys=True))
+
+    def test_write_json_object_empty(self):
+        written = []
+        clc_inv._write_json_object(written.append, iter([]), False)
+        self.assertEqual(''.join(written), '{}')
+
+    def test_cache_writer_abort_keeps_previous_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache_file = os.path.join(cache_dir, 'clc_inv.json')
+            clc_inv._write_cache(cache_file, '{"a": 1}')
+            cache_out = clc_inv._CacheWriter(cache_file)
+            cache_out.write('{"a": ')
+            cache_out.abort()
+            with open(cache_file) as f:
+                self.assertEqual(f.read(), '{"a": 1}')
+            self.assertEqual(os.listdir(cache_dir), ['clc_inv.json'])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @patch('clc_inv._find_hostvars_single_server')
+    @patch('clc_inv._set_clc_credentials_from_env')
+    def test_print_host_json_from_index(self, mock_creds, mock_find_hostvars):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_INV_CACHE_TTL': '300'}):
+                index_file = clc_inv._get_host_index_file(clc_inv._get_cache_file())
+                with open(index_file, 'w') as f:
+                    f.write('{"SERVER1": {"ansible_ssh_host": "1.2.3.4"}}')
+                with patch('sys.stdout') as mock_stdout:
+                    clc_inv.print_host_json('SERVER1')
+            self.assertFalse(mock_find_hostvars.called)
+            mock_stdout.write.assert_called_once_with(
+                clc_inv._to_json({'ansible_ssh_host': '1.2.3.4'}))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @patch('clc_inv._find_hostvars_single_server')
+    @patch('clc_inv._set_clc_credentials_from_env')
+    def test_print_host_json_index_miss(self, mock_creds, mock_find_hostvars):
+        cache_dir = tempfile.mkdtemp()
+        mock_find_hostvars.return_value = {'SERVER2': {'ansible_ssh_host': '5.6.7.8'}}
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_INV_CACHE_TTL': '300'}):
+                index_file = clc_inv._get_host_index_file(clc_inv._get_cache_file())
+                with open(index_file, 'w') as f:
+                    f.write('{"SERVER1": {"ansible_ssh_host": "1.2.3.4"}}')
+                with patch('sys.stdout') as mock_stdout:
+                    clc_inv.print_host_json('SERVER2')
+            mock_find_hostvars.assert_called_once_with('SERVER2')
+            mock_stdout.write.assert_called_once_with(
+                clc_inv._to_json({'ansible_ssh_host': '5.6.7.8'}))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @patch.dict('os.environ', {'CLC_INV_CACHE_TTL': '0'})
+    @patch('clc_inv._find_hostvars_single_server')
+    @patch('clc_inv._set_clc_credentials_from_env')
+    def test_print_host_json_unknown_host(self, mock_creds, mock_find_hostvars):
+        mock_find_hostvars.return_value = None
+        with patch('sys.stdout') as mock_stdout:
+            clc_inv.print_host_json('UNKNOWN')
+        mock_stdout.write.assert_called_once_with(clc_inv._to_json({}))
+
+    @patch.dict('os.environ', {'CLC_INV_CACHE_TTL': '0', 'CLC_V2_API_USERNAME': 'hansolo',
+                               'CLC_V2_API_PASSWD': 'falcon'})
+    @patch('clc_inv.clc')
+    def test_print_host_json_logs_in_for_alias(self, mock_clc_sdk):
+        mock_clc_sdk.ALIAS = False
+        mock_clc_sdk.v2.Account.GetAlias.return_value = 'TST'
+        mock_clc_sdk.v2.API.Call.side_effect = clc_sdk.APIFailedResponse('Response code 404.')
+        with patch('sys.stdout') as mock_stdout:
+            clc_inv.print_host_json('SERVER2')
+        mock_clc_sdk.v2.SetCredentials.assert_called_once_with(
+            api_username='hansolo', api_passwd='falcon')
+        mock_clc_sdk.v2.API.Call.assert_called_once_with(method='GET',
+                                                         url='servers/TST/SERVER2',
+                                                         payload={})
+        mock_stdout.write.assert_called_once_with(clc_inv._to_json({}))
+
+    def test_parse_args_host(self):
+        with patch('sys.argv', ['clc_inv.py', '--host', 'SERVER1']):
+            args = clc_inv._parse_args()
+        self.assertEqual(args.host, 'SERVER1')
+        self.assertFalse(args.refresh_cache)
+
+    def test_read_cache_expired(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache_file = os.path.join(cache_dir, 'inventory.json')
+            with open(cache_file, 'w') as f:
+                f.write('{}')
+            stale = time.time() - 600
+            os.utime(cache_file, (stale, stale))
+            self.assertIsNone(clc_inv._read_cache(cache_file, 300))
+            self.assertEqual(clc_inv._read_cache(cache_file, 900), '{}')
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_read_cache_missing(self):
+        self.assertIsNone(clc_inv._read_cache('/nonexistent/clc_inv.json', 300))
+
+    def test_write_cache_replaces_file(self):
+        cache_dir = tempfile.mkdtemp()
         try:
-            input = [mock.MagicMock()]
-            mock_flatten.return_value = 'OK'
+            cache_file = os.path.join(cache_dir, 'inventory.json')
+            clc_inv._write_cache(cache_file, '{"a": 1}')
+            clc_inv._write_cache(cache_file, '{"a": 2}')
+            with open(cache_file) as f:
+                self.assertEqual(f.read(), '{"a": 2}')
+            self.assertEqual(os.listdir(cache_dir), ['inventory.json'])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_get_cache_file_keyed_by_account(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_ACCT_ALIAS': 'AAA'}):
+                first = clc_inv._get_cache_file()
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_ACCT_ALIAS': 'BBB'}):
+                second = clc_inv._get_cache_file()
+            self.assertNotEqual(first, second)
+            self.assertEqual(os.path.dirname(first), cache_dir)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_get_cache_file_keyed_by_custom_field_groups(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_INV_CUSTOM_FIELD_GROUPS': 'Environment'}):
+                first = clc_inv._get_cache_file()
+            with patch.dict('os.environ', {'CLC_INV_CACHE_PATH': cache_dir,
+                                           'CLC_INV_CUSTOM_FIELD_GROUPS': 'Owner'}):
+                second = clc_inv._get_cache_file()
+            self.assertNotEqual(first, second)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_get_cache_ttl_invalid(self):
+        with patch.dict('os.environ', {'CLC_INV_CACHE_TTL': 'bogus'}):
+            self.assertEqual(clc_inv._get_cache_ttl(), clc_inv.CACHE_TTL_DEFAULT)
+
+    @patch('clc_inv._find_hostvars_for_server_ids')
+    def test_find_hostvars_incremental(self, mock_find_hostvars):
+        groups = {
+            'Web': {'hosts': ['UNCHANGED', 'MODIFIED', 'NEW']},
+            'Db': {'hosts': ['MOVED']}
+        }
+        details = {
+            'unchanged': {'changeInfo': {'modifiedDate': '2016-01-01T00:00:00Z'}},
+            'modified': {'changeInfo': {'modifiedDate': '2016-02-02T00:00:00Z'}},
+            'new': {'changeInfo': {'modifiedDate': '2016-03-03T00:00:00Z'}},
+            'moved': {'changeInfo': {'modifiedDate': '2016-01-01T00:00:00Z'}}
+        }
+        previous = {
+            'UNCHANGED': {'groups': ['Web'], 'modified': '2016-01-01T00:00:00Z',
+                          'hostvars': {'UNCHANGED': {'cached': True}}},
+            'MODIFIED': {'groups': ['Web'], 'modified': '2016-01-01T00:00:00Z',
+                         'hostvars': {'MODIFIED': {'cached': True}}},
+            'MOVED': {'groups': ['Web'], 'modified': '2016-01-01T00:00:00Z',
+                      'hostvars': {'MOVED': {'cached': True}}},
+            'REMOVED': {'groups': ['Web'], 'modified': '2016-01-01T00:00:00Z',
+                        'hostvars': {'REMOVED': {'cached': True}}}
+        }
+
+        def _fetch(server_ids, details):
+            return [{server_id: {'cached': False}} for server_id in server_ids]
+        mock_find_hostvars.side_effect = _fetch
+
+        hostvars, state = clc_inv._find_hostvars_incremental(groups, details, previous)
+
+        fetched = mock_find_hostvars.call_args[0][0]
+        self.assertEqual(sorted(fetched), ['MODIFIED', 'MOVED', 'NEW'])
+        self.assertEqual(hostvars['hostvars'], {
+            'UNCHANGED': {'cached': True},
+            'MODIFIED': {'cached': False},
+            'MOVED': {'cached': False},
+            'NEW': {'cached': False}
+        })
+        self.assertNotIn('REMOVED', state['servers'])
+        self.assertEqual(state['servers']['MOVED']['groups'], ['Db'])
+        self.assertEqual(state['servers']['NEW']['modified'], '2016-03-03T00:00:00Z')
+
+    @patch('clc_inv._find_hostvars_for_server_ids')
+    def test_find_hostvars_incremental_no_summary(self, mock_find_hostvars):
+        groups = {'Web': {'hosts': ['SERVER1']}}
+        previous = {
+            'SERVER1': {'groups': ['Web'], 'modified': '2016-01-01T00:00:00Z',
+                        'hostvars': {'SERVER1': {'cached': True}}}
+        }
+        mock_find_hostvars.return_value = [None]
+
+        hostvars, state = clc_inv._find_hostvars_incremental(groups, {}, previous)
+
+        mock_find_hostvars.assert_called_once_with(['SERVER1'], {})
+        self.assertEqual(hostvars, {'hostvars': {}})
+        self.assertEqual(state['servers'], {})
+
+    @patch('clc_inv.clc')
+    def test_find_server_details_for_group(self, mock_clc_sdk):
+        group = mock.MagicMock()
+        group.alias = 'TST'
+        group.id = 'group-id'
+        server_obj = {'id': 'UC1TSTWEB01', 'changeInfo': {'modifiedDate': '2016-01-01T00:00:00Z'}}
+        mock_clc_sdk.v2.API.Call.return_value = {'servers': [server_obj, {'name': 'NO_ID'}]}
+
+        details = clc_inv._find_server_details_for_group(group)
+
+        mock_clc_sdk.v2.API.Call.assert_called_once_with(method='GET',
+                                                         url='groups/TST/group-id',
+                                                         payload={'serverDetail': 'detailed'})
+        self.assertEqual(details, {'uc1tstweb01': server_obj})
+
+    @patch('clc_inv.clc')
+    def test_find_server_details_for_group_api_error(self, mock_clc_sdk):
+        mock_clc_sdk.v2.API.Call.side_effect = clc_inv.APIFailedResponse()
+        self.assertEqual(clc_inv._find_server_details_for_group(mock.MagicMock()), {})
+
+    @patch('clc_inv.clc.ALIAS', 'TST')
+    @patch('clc_inv._find_hostvars_single_server')
+    def test_find_hostvars_for_server_ids_uses_group_details(self, mock_find_hostvars):
+        complete = {
+            'id': 'uc1tstweb01',
+            'name': 'UC1TSTWEB01',
+            'os': 'ubuntu14_64Bit',
+            'locationId': 'UC1',
+            'details': {'ipAddresses': [{'internal': '10.0.0.1'}], 'customFields': []}
+        }
+        incomplete = {'id': 'uc1tstweb02', 'name': 'UC1TSTWEB02'}
+        mock_find_hostvars.return_value = {'UC1TSTWEB02': {'fetched': True}}
+
+        res = clc_inv._find_hostvars_for_server_ids(
+            ['UC1TSTWEB01', 'UC1TSTWEB02'],
+            {'uc1tstweb01': complete, 'uc1tstweb02': incomplete})
+
+        mock_find_hostvars.assert_called_once_with('UC1TSTWEB02')
+        self.assertEqual(res[0]['UC1TSTWEB01']['ansible_ssh_host'], '10.0.0.1')
+        self.assertEqual(res[0]['UC1TSTWEB01']['clc_data'], complete)
+        self.assertEqual(res[1], {'UC1TSTWEB02': {'fetched': True}})
+
+    def test_project_server_data(self):
+        data = {
+            'id': 'uc1tstweb01',
+            'os': 'ubuntu14_64Bit',
+            'locationId': 'UC1',
+            'details': {'powerState': 'started', 'cpu': 2},
+            'links': [{'rel': 'self'}]
+        }
+        res = clc_inv._project_server_data(
+            data, ['id', 'details.powerState', 'details.missing', 'missing.field', 'os.name'])
+        self.assertEqual(res, {'id': 'uc1tstweb01', 'details': {'powerState': 'started'}})
+
+    @patch.dict('os.environ', {'CLC_INV_HOSTVAR_FIELDS': ' id, details.powerState ,'})
+    def test_get_hostvar_fields(self):
+        self.assertEqual(clc_inv._get_hostvar_fields(),
+                         ['id', 'details.powerState', 'locationId', 'os', 'status', 'storageType', 'type'])
+
+    @patch.dict('os.environ', {'CLC_INV_HOSTVAR_FIELDS': ''})
+    def test_get_hostvar_fields_unset(self):
+        self.assertIsNone(clc_inv._get_hostvar_fields())
+
+    @patch.dict('os.environ', {'CLC_INV_HOSTVAR_FIELDS': 'name'})
+    @patch('clc_inv.clc.ALIAS', 'TST')
+    def test_build_hostvars_single_server_projected(self):
+        server_obj = {
+            'id': 'uc1tstwin01',
+            'name': 'UC1TSTWIN01',
+            'os': 'windows2012R2Std_64Bit',
+            'locationId': 'UC1',
+            'details': {'ipAddresses': [{'internal': '10.0.0.1'}], 'customFields': [{'name': 'a'}]}
+        }
+        res = clc_inv._build_hostvars_single_server('UC1TSTWIN01', server_obj)
+        self.assertEqual(res['UC1TSTWIN01']['clc_data'],
+                         {'name': 'UC1TSTWIN01', 'locationId': 'UC1', 'os': 'windows2012R2Std_64Bit'})
+        self.assertEqual(res['UC1TSTWIN01']['ansible_ssh_host'], '10.0.0.1')
+        self.assertEqual(res['UC1TSTWIN01']['clc_custom_fields'], [{'name': 'a'}])
+        self.assertEqual(res['UC1TSTWIN01']['ansible_connection'], 'winrm')
+
+    def _mock_group(self, name, servers, sub_groups=None):
+        group = mock.MagicMock()
+        group.name = name
+        group.type = 'default'
+        group.Servers().servers_lst = servers
+        group.Subgroups().groups = sub_groups or []
+        return group
+
+    @patch.dict('os.environ', {'CLC_FILTER_DATACENTERS': 'UC1,CA1'})
+    @patch('clc_inv._find_server_details_for_group')
+    @patch('clc_inv.clc')
+    def test_find_all_groups(self, mock_clc_sdk, mock_details):
+        mock_clc_sdk.v2.Account.GetAlias.return_value = 'TST'
+        mock_clc_sdk.v2.API.Call.return_value = [{'id': 'UC1'}, {'id': 'CA1'}, {'id': 'GB3'}]
+        trees = {
+            'UC1': [self._mock_group('Web', ['UC1WEB01'],
+                                     [self._mock_group('Db', ['UC1DB01'])])],
+            'CA1': [self._mock_group('Web', ['CA1WEB01'])]
+        }
+
+        def _datacenter(location, alias):
+            datacenter = mock.MagicMock()
+            datacenter.__str__.return_value = location
+            datacenter.Groups().groups = trees[location]
+            return datacenter
+        mock_clc_sdk.v2.Datacenter.side_effect = _datacenter
+        mock_details.side_effect = lambda group: {group.name.lower(): {'name': group.name}}
+        details = {}
+
+        res = clc_inv._find_all_groups(details)
+
+        self.assertEqual(sorted(call[1]['location'] for call in
+                                mock_clc_sdk.v2.Datacenter.call_args_list), ['CA1', 'UC1'])
+        self.assertEqual(sorted(res['Web']['hosts']), ['CA1WEB01', 'UC1WEB01'])
+        self.assertEqual(res['UC1_Db'], {'hosts': ['UC1DB01']})
+        self.assertEqual(res['CA1_Web'], {'hosts': ['CA1WEB01']})
+        self.assertEqual(mock_details.call_count, 3)
+        self.assertEqual(details, {'web': {'name': 'Web'}, 'db': {'name': 'Db'}})
+
+    @patch('clc_inv.clc')
+    def test_set_requests_session(self, mock_clc_sdk):
+        clc_inv._set_requests_session(12)
+        mock_clc_sdk.requests.adapters.HTTPAdapter.assert_called_once_with(pool_maxsize=12)
+        mock_clc_sdk.SetRequestsSession.assert_called_once_with(mock_clc_sdk.requests.Session())
+
+    def test_read_state_version_mismatch(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            state_file = clc_inv._get_state_file(os.path.join(cache_dir, 'clc_inv.json'))
+            with open(state_file, 'w') as f:
+                f.write('{"version": 0, "servers": {"SERVER1": {}}}')
+            self.assertEqual(clc_inv._read_state(state_file), {})
+            with open(state_file, 'w') as f:
+                f.write('{"version": %d, "servers": {"SERVER1": {}}}' % clc_inv.STATE_VERSION)
+            self.assertEqual(clc_inv._read_state(state_file), {'SERVER1': {}})
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_parse_groups_result_to_dict_empty(self):
+        try:
+            input = [{}]
             res = clc_inv._parse_groups_result_to_dict(input)
             self.assertEqual(res, {})
         except:
@@ -115,17 +583,56 @@ class TestClcInvFunctions(unittest.TestCase):
                     }
                 }
             }
-            res = clc_inv._build_datacenter_groups(input)
+            res = clc_inv._build_hostvars_dynamic_groups(input)
             self.assertEqual(res, {'UC1': ['server1']})
         except:
             self.fail('Exception was thrown when it was not expected')
 
-    @patch('clc_inv._build_datacenter_groups')
-    def test_build_hostvars_dynamic_groups(self, mock_build):
-            input = 'test'
-            mock_build.return_value = {'status': 'OK'}
-            res = clc_inv._build_hostvars_dynamic_groups(input)
-            self.assertEqual(res, {'status': 'OK'})
+    @patch.dict('os.environ', {'CLC_INV_CUSTOM_FIELD_GROUPS': 'Environment,role-id'})
+    def test_build_hostvars_dynamic_groups(self):
+        input = {
+            'hostvars': {
+                'server1': {
+                    'clc_data': {
+                        'locationId': 'UC1',
+                        'os': 'windows2012R2Std_64Bit',
+                        'status': 'active',
+                        'storageType': 'standard',
+                        'type': 'standard',
+                        'details': {'powerState': 'started'}
+                    },
+                    'clc_custom_fields': [
+                        {'id': 'env-id', 'name': 'Environment', 'value': 'Prod East'},
+                        {'id': 'role-id', 'name': 'Role', 'value': 'web'},
+                        {'id': 'other-id', 'name': 'Other', 'value': 'x'}
+                    ]
+                },
+                'server2': {
+                    'clc_data': {
+                        'locationId': 'UC1',
+                        'os': 'ubuntu14_64Bit',
+                        'status': 'active',
+                        'details': {'powerState': 'stopped'}
+                    },
+                    'clc_custom_fields': [{'id': 'env-id', 'name': 'Environment', 'value': ''}]
+                }
+            }
+        }
+        res = clc_inv._build_hostvars_dynamic_groups(input)
+        self.assertEqual(sorted(res['UC1']), ['server1', 'server2'])
+        self.assertEqual(sorted(res['status_active']), ['server1', 'server2'])
+        self.assertEqual(res['os_windows'], ['server1'])
+        self.assertEqual(res['os_ubuntu'], ['server2'])
+        self.assertEqual(res['power_started'], ['server1'])
+        self.assertEqual(res['power_stopped'], ['server2'])
+        self.assertEqual(res['storage_standard'], ['server1'])
+        self.assertEqual(res['type_standard'], ['server1'])
+        self.assertEqual(res['cf_environment_prod_east'], ['server1'])
+        self.assertEqual(res['cf_role_web'], ['server1'])
+        self.assertEqual(len(res), 10)
+
+    def test_sanitize_group_name(self):
+        self.assertEqual(clc_inv._sanitize_group_name(u'cf_Cost Center_R&D-1'), 'cf_cost_center_r_d_1')
 
     @patch('clc_inv._add_windows_hostvars')
     @patch('clc_inv.clc')
@@ -710,6 +710,61 @@ class TestClcModifyServerFunctions(unittest.TestCase):
         under_test._modify_servers(None)
         self.module.fail_json.assert_called_once_with(msg='server_ids should be a list of servers, aborting')
 
+    @patch.object(ClcModifyServer, '_refresh_servers')
+    @patch.object(ClcModifyServer, '_wait_for_requests')
+    @patch.object(ClcModifyServer, '_ensure_nic_present')
+    @patch.object(ClcModifyServer, '_ensure_alert_policy_present')
+    @patch.object(ClcModifyServer, '_ensure_aa_policy_present')
+    @patch.object(ClcModifyServer, '_get_aa_policy_id_by_name')
+    @patch.object(ClcModifyServer, '_ensure_server_config')
+    @patch.object(ClcModifyServer, '_get_servers_from_clc')
+    @patch.object(clc_modify_server, 'clc_sdk')
+    def test_modify_servers_one_after_another(self, mock_clc_sdk, mock_get_servers, mock_ensure_config,
+                                              mock_get_aa_policy_id, mock_ensure_aa_pol, mock_ensure_alert_pol,
+                                              mock_ensure_nic, mock_wait_for_requests, mock_refresh_servers):
+        self.module.params = {'state': 'present', 'anti_affinity_policy_name': 'aa_name'}
+        lock = clc_modify_server.clc_common.threading.Lock()
+        calls = {'active': 0, 'max_active': 0, 'order': []}
+
+        def ensure_config(server, server_params):
+            with lock:
+                calls['active'] += 1
+                calls['max_active'] = max(calls['max_active'], calls['active'])
+                calls['order'].append(server.id)
+            clc_modify_server.clc_common.time.sleep(0.05)
+            with lock:
+                calls['active'] -= 1
+            return server.id != 'server0', server.request
+
+        servers = []
+        for i in range(6):
+            server = mock.MagicMock(id='server%d' % i, data={'id': 'server%d' % i})
+            server.request = mock.MagicMock() if i else None
+            servers.append(server)
+        mock_get_servers.return_value = servers
+        mock_ensure_config.side_effect = ensure_config
+        mock_get_aa_policy_id.return_value = 'aa_id'
+        mock_ensure_aa_pol.return_value = False
+        mock_ensure_alert_pol.return_value = False
+        mock_ensure_nic.return_value = False
+        under_test = ClcModifyServer(self.module)
+        under_test.clc = mock_clc_sdk
+        with patch.dict('os.environ', {'CLC_API_CONCURRENCY': '2'}):
+            changed, server_dict_array, result_server_ids = under_test._modify_servers(
+                [server.id for server in servers])
+
+        self.assertTrue(changed)
+        self.assertEqual(calls['max_active'], 1)
+        self.assertEqual(calls['order'], [server.id for server in servers])
+        self.assertEqual(result_server_ids, ['server%d' % i for i in range(1, 6)])
+        # The policy is looked up by name once, not once for every server
+        self.assertEqual(mock_get_aa_policy_id.call_count, 1)
+        for call in mock_ensure_aa_pol.call_args_list:
+            self.assertEqual(call[0][1]['anti_affinity_policy_id'], 'aa_id')
+        # The configuration requests are waited on together, in the order of the servers
+        self.assertEqual(mock_wait_for_requests.call_args[0][1], [server.request for server in servers[1:]])
+        self.assertFalse(self.module.fail_json.called)
+
     @patch.object(ClcModifyServer, '_modify_clc_server')
     def test_ensure_server_config_change_cpu(self, mock_modify_server):
         mock_modify_server.return_value = 'OK'
@@ -892,6 +947,10 @@ class TestClcModifyServerFunctions(unittest.TestCase):
         under_test = ClcModifyServer(self.module)
         mock_request = mock.MagicMock()
         mock_request.WaitUntilComplete.return_value = 1
+        mock_failed_request = mock.MagicMock()
+        mock_failed_request.Status.return_value = 'failed'
+        mock_request.requests = [mock.MagicMock(), mock_failed_request]
+        mock_request.requests[0].Status.return_value = 'succeeded'
         under_test._wait_for_requests(self.module, [mock_request])
         self.module.fail_json.assert_called_with(msg='Unable to process modify server request')
 
@@ -51,7 +51,8 @@ class TestClcNetwork(unittest.TestCase):
 
     def test_api_set_credentials(self):
         self.network.clc.v2.SetCredentials = mock.MagicMock()
-        with patch.dict('os.environ', {'CLC_V2_API_USERNAME':'passWORD', 'CLC_V2_API_PASSWD':'UsErnaME'}):
+        with patch.dict('os.environ', {'CLC_V2_API_USERNAME':'passWORD', 'CLC_V2_API_PASSWD':'UsErnaME',
+                                       'CLC_TOKEN_CACHE_TTL': '0'}):
             try:
                 self.network.process_request()
             except:
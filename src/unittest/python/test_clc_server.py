@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
 import unittest
 import requests
 from uuid import UUID
@@ -32,6 +35,16 @@ class TestClcServerFunctions(unittest.TestCase):
         self.clc = mock.MagicMock()
         self.module = mock.MagicMock()
         self.datacenter = mock.MagicMock()
+        # Keep the lookups of each test out of the user's cache, and of the other tests
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_env = patch.dict('os.environ', {'CLC_LOOKUP_CACHE_PATH': self.cache_dir})
+        self.cache_env.start()
+
+    def tearDown(self):
+        self.cache_env.stop()
+        clc_server.clc_common._LOOKUPS.clear()
+        clc_server.clc_common._GROUP_INDEXES.clear()
+        shutil.rmtree(self.cache_dir)
 
     def test_clc_module_not_found(self):
         # Setup Mock Import Function
@@ -121,7 +134,7 @@ class TestClcServerFunctions(unittest.TestCase):
         mock_existing_server.id = "EXISTING_SERVER"
         mock_result_group = mock.MagicMock()
         mock_result_group.data = { "id":"1111111" }
-        mock_result_group.Servers().Servers.return_value = [ mock_existing_server ]
+        mock_result_group.Servers().servers_lst = [ mock_existing_server.id ]
 
         # Set Mock Group Values
         mock_group = mock.MagicMock()
@@ -135,6 +148,8 @@ class TestClcServerFunctions(unittest.TestCase):
         under_test.process_request()
 
         # Assert
+        # The servers of the group are not loaded to return their ids
+        self.assertFalse(mock_result_group.Servers().Servers.called)
         self.module.exit_json.assert_called_once_with(changed=True,
                                                       group={ "id": "1111111", "servers": [ "EXISTING_SERVER" ]},
                                                       servers=[],
@@ -179,6 +194,7 @@ class TestClcServerFunctions(unittest.TestCase):
 
         # Set Mock Request Return Values
         mock_single_request.Server.return_value = mock_server
+        mock_single_request.Status.return_value = 'succeeded'
         mock_requests.WaitUntilComplete.return_value = 0
         mock_requests.requests = [mock_single_request]
 
@@ -221,7 +237,8 @@ class TestClcServerFunctions(unittest.TestCase):
                                                                 'ipaddress': '1.2.3.4',
                                                                 'name': 'TEST_SERVER'}],
                                                       server_ids=['TEST_SERVER'],
-                                                      partially_created_server_ids=[])
+                                                      partially_created_server_ids=[],
+                                                      wait_stats=mock.ANY)
         self.assertFalse(self.module.fail_json.called)
 
     @patch.object(ClcServer, '_set_clc_credentials_from_env')
@@ -263,6 +280,7 @@ class TestClcServerFunctions(unittest.TestCase):
 
         # Set Mock Request Return Values
         mock_single_request.Server.return_value = mock_server
+        mock_single_request.Status.return_value = 'succeeded'
         mock_requests.WaitUntilComplete.return_value = 0
         mock_requests.requests = [mock_single_request]
 
@@ -339,6 +357,7 @@ class TestClcServerFunctions(unittest.TestCase):
 
         # Set Mock Request Return Values
         mock_single_request.Server.return_value = mock_server
+        mock_single_request.Status.return_value = 'succeeded'
         mock_requests.WaitUntilComplete.return_value = 0
         mock_requests.requests = [mock_single_request]
 
@@ -355,7 +374,7 @@ class TestClcServerFunctions(unittest.TestCase):
         mock_existing_server.id = "EXISTING_SERVER"
         mock_result_group = mock.MagicMock()
         mock_result_group.data = { "id":"1111111" }
-        mock_result_group.Servers().Servers.return_value = [ mock_existing_server, mock_server ]
+        mock_result_group.Servers().servers_lst = [ mock_existing_server.id, mock_server.id ]
 
         # Setup Mock API Responses
         def _api_call_return_values(*args, **kwargs):
@@ -388,7 +407,8 @@ class TestClcServerFunctions(unittest.TestCase):
                                                       servers=[{'ipaddress': '1.2.3.4',
                                                                 'name': 'TEST_SERVER'}],
                                                       server_ids=['TEST_SERVER'],
-                                                      partially_created_server_ids=[])
+                                                      partially_created_server_ids=[],
+                                                      wait_stats=mock.ANY)
 
     @patch.object(ClcServer, '_set_clc_credentials_from_env')
     @patch.object(clc_server, 'clc_sdk')
@@ -423,6 +443,7 @@ class TestClcServerFunctions(unittest.TestCase):
 
         # Set Mock Request Return Values
         mock_single_request.Server.return_value = mock_server
+        mock_single_request.Status.return_value = 'succeeded'
         mock_requests.WaitUntilComplete.return_value = 0
         mock_requests.requests = [mock_single_request]
 
@@ -439,7 +460,7 @@ class TestClcServerFunctions(unittest.TestCase):
         mock_existing_server.id = "EXISTING_SERVER"
         mock_result_group = mock.MagicMock()
         mock_result_group.data = { "id":"1111111" }
-        mock_result_group.Servers().Servers.return_value = [ mock_existing_server, mock_server ]
+        mock_result_group.Servers().servers_lst = [ mock_existing_server.id, mock_server.id ]
 
         # Setup Mock API Responses
         def _api_call_return_values(*args, **kwargs):
@@ -471,7 +492,8 @@ class TestClcServerFunctions(unittest.TestCase):
                                                       servers=[{'ipaddress': '1.2.3.4',
                                                                 'name': 'TEST_SERVER'}],
                                                       server_ids=['TEST_SERVER'],
-                                                      partially_created_server_ids=[])
+                                                      partially_created_server_ids=[],
+                                                      wait_stats=mock.ANY)
 
     @patch.object(ClcServer, '_enforce_count')
     @patch.object(ClcServer, '_set_clc_credentials_from_env')
@@ -506,7 +528,7 @@ class TestClcServerFunctions(unittest.TestCase):
         mock_existing_server.id = "EXISTING_SERVER"
         mock_result_group = mock.MagicMock()
         mock_result_group.data = { "id":"1111111" }
-        mock_result_group.Servers().Servers.return_value = [ mock_existing_server, mock_server ]
+        mock_result_group.Servers().servers_lst = [ mock_existing_server.id, mock_server.id ]
 
         mock_clc_sdk.v2.Datacenter().Groups().Get.return_value = mock_result_group
         mock_enforce_count.return_value = ([], [mock_server.id], [], True)
@@ -557,7 +579,7 @@ class TestClcServerFunctions(unittest.TestCase):
         mock_existing_server.id = "EXISTING_SERVER"
         mock_result_group = mock.MagicMock()
         mock_result_group.data = { "id":"1111111" }
-        mock_result_group.Servers().Servers.return_value = [ mock_existing_server, mock_server ]
+        mock_result_group.Servers().servers_lst = [ mock_existing_server.id, mock_server.id ]
 
         mock_request.WaitUntilComplete.return_value = 0
 
@@ -692,6 +714,22 @@ class TestClcServerFunctions(unittest.TestCase):
         # Assert
         self.module.fail_json.assert_called_with(msg='Unable to connect to the CLC API after 2 attempts. Connection Error')
 
+    @patch('clc_ansible_module.clc_common.time.sleep')
+    @patch.object(clc_server, 'clc_sdk')
+    def test_find_server_by_uuid_caps_backoff(self, mock_clc_sdk, mock_sleep):
+        error = APIFailedResponse()
+        error.response_status_code = 404
+        mock_clc_sdk.v2.API.Call.side_effect = [error] * 20 + [{'id': '12345'}]
+        under_test = ClcServer(self.module)
+        result = under_test._find_server_by_uuid_w_retry(clc=mock_clc_sdk,
+                                                         module=self.module,
+                                                         svr_uuid='12345',
+                                                         alias='TST')
+        self.assertEqual(result, mock_clc_sdk.v2.Server.return_value)
+        self.assertFalse(self.module.fail_json.called)
+        self.assertEqual(mock_sleep.call_count, 20)
+        self.assertTrue(max(c[0][0] for c in mock_sleep.call_args_list) <= 15)
+
     @patch.object(clc_server, 'clc_sdk')
     def test_find_server_by_uuid_other_api_error_response(self,
                                                           mock_clc_sdk):
@@ -865,6 +903,32 @@ class TestClcServerFunctions(unittest.TestCase):
         # Assert
         self.assertEqual(mock_group_to_find, result)
 
+    @patch.object(clc_server, 'clc_sdk')
+    def test_find_group_w_group_index(self, mock_clc_sdk):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch.dict('os.environ', {'CLC_LOOKUP_CACHE_PATH': cache_dir}):
+                mock_datacenter = mock.MagicMock(alias='TST', id='UC1')
+                mock_datacenter.RootGroup().data = {'id': 'root', 'groups': [
+                    {'id': 'g1', 'name': 'Default Group', 'groups': [
+                        {'id': 'g11', 'name': 'TEST_RECURSIVE_GRP', 'groups': []}]}]}
+                result = ClcServer._find_group(self.module, mock_datacenter, 'test_recursive_grp')
+                ClcServer._find_group(self.module, mock_datacenter, 'Default Group')
+                self.assertEqual(result, mock_clc_sdk.v2.Group.return_value)
+                mock_clc_sdk.v2.Group.assert_any_call(
+                    id='g11', alias='TST', group_obj={'id': 'g11', 'name': 'TEST_RECURSIVE_GRP', 'groups': []})
+                self.assertFalse(mock_datacenter.Groups.called)
+
+                # A group missing from the index is looked up live, and the index rebuilt next time
+                mock_datacenter.Groups().Get.return_value = 'NEW_GROUP'
+                self.assertEqual(ClcServer._find_group(self.module, mock_datacenter, 'New Group'), 'NEW_GROUP')
+                self.assertEqual(os.listdir(cache_dir), [])
+                self.assertFalse(self.module.fail_json.called)
+        finally:
+            clc_server.clc_common._LOOKUPS.clear()
+            clc_server.clc_common._GROUP_INDEXES.clear()
+            shutil.rmtree(cache_dir)
+
     def test_find_template(self):
         self.module.params = {"template": "MyCoolTemplate", "state": "present"}
         self.datacenter.Templates().Search = mock.MagicMock()
@@ -887,6 +951,33 @@ class TestClcServerFunctions(unittest.TestCase):
         self.datacenter.Templates().Search.assert_called_once_with("MyCoolTemplateNotFound")
         self.assertEqual(self.module.fail_json.called, True)
 
+    def test_find_template_and_network_w_lookup_cache(self):
+        self.module.params = {"template": "ubuntu", "state": "present"}
+        capabilities = {'templates': [{'name': 'UBUNTU-14-64-TEMPLATE'}],
+                        'deployableNetworks': [{'networkId': 'vlan1'}]}
+        datacenter = mock.MagicMock(alias='TST', id='UC1')
+        datacenter._DeploymentCapabilities.return_value = capabilities
+        datacenter.Templates().Search.return_value = [mock.MagicMock(id='UBUNTU-14-64-TEMPLATE')]
+        datacenter.Networks().networks = [mock.MagicMock(id='vlan1')]
+
+        self.assertEqual(ClcServer._find_template_id(self.module, datacenter), 'UBUNTU-14-64-TEMPLATE')
+        self.assertEqual(ClcServer._find_network_id(self.module, datacenter), 'vlan1')
+
+        # The capabilities of the datacenter are read once, and handed to the clc-sdk
+        datacenter._DeploymentCapabilities.assert_called_once_with(cached=False)
+        self.assertEqual(datacenter.deployment_capabilities, capabilities)
+        self.assertFalse(self.module.fail_json.called)
+
+    def test_find_template_none_found(self):
+        self.module.params = {"template": "MyCoolTemplateNotFound", "state": "present"}
+        self.datacenter.id = 'UC1'
+        self.datacenter.Templates().Search.return_value = []
+
+        ClcServer._find_template_id(module=self.module, datacenter=self.datacenter)
+
+        self.module.fail_json.assert_called_once_with(
+            msg='Unable to find a template: MyCoolTemplateNotFound in location: ' + str(self.datacenter.id))
+
     def test_find_network_id_default(self):
         # Setup
         mock_network = mock.MagicMock()
@@ -906,19 +997,33 @@ class TestClcServerFunctions(unittest.TestCase):
         # Setup
         mock_network = mock.MagicMock()
         mock_network.id = UUID('12345678123456781234567812345678')
+        mock_network.data = {'id': mock_network.id, 'name': 'AwesomeIdHere', 'cidr': '10.0.0.0/24'}
         self.module.params = {"network_id": "AwesomeIdHere"}
-        self.datacenter.Networks().Get = mock.MagicMock(return_value=mock_network)
+        self.datacenter.Networks().networks = [mock_network]
 
         # Function Under Test
         result = ClcServer._find_network_id(self.module, self.datacenter)
 
         # Assert Result
         self.datacenter.Networks.assert_called_with(forced_load=True)
-        self.datacenter.Networks().Get.assert_called_once_with('AwesomeIdHere')
         self.assertEqual(result, mock_network.id)
         self.assertEqual(self.module.fail_json.called, False)  
 
 
+    def test_find_network_id_given_not_found(self):
+        mock_network = mock.MagicMock()
+        mock_network.data = {'id': 'vlan1', 'name': 'Vlan 1', 'cidr': '10.0.0.0/24'}
+        self.datacenter.id = 'UC1'
+        self.datacenter.Networks().networks = [mock_network]
+        self.module.params = {"network_id": "MissingVlan"}
+
+        result = ClcServer._find_network_id(self.module, self.datacenter)
+
+        # The server is never built on the default network in place of the given one
+        self.assertNotEqual(result, 'vlan1')
+        self.module.fail_json.assert_called_once_with(
+            msg='Unable to find network: MissingVlan in location: UC1')
+
     def test_find_network_id_not_found(self):
         # Setup
         self.datacenter.Networks = mock.MagicMock(side_effect=clc_sdk.CLCException("Network not found"))
@@ -1016,6 +1121,19 @@ class TestClcServerFunctions(unittest.TestCase):
         mock_ansible_module.fail_json.assert_called_with(
             msg='No anti affinity policy was found with policy name : nothing')
 
+    @patch.object(clc_server, 'clc_sdk')
+    def test_get_anti_affinity_policy_id_w_lookup_cache(self, mock_clc_sdk):
+        mock_clc_sdk.v2.API.Call.side_effect = [
+            {'items': [{'name': 'test1', 'id': '111'}]},
+            {'items': [{'name': 'test1', 'id': '111'}, {'name': 'test2', 'id': '222'}]}]
+
+        self.assertEqual(ClcServer._get_anti_affinity_policy_id(mock_clc_sdk, None, 'alias', 'test1'), '111')
+        self.assertEqual(ClcServer._get_anti_affinity_policy_id(mock_clc_sdk, None, 'alias', 'test1'), '111')
+        self.assertEqual(mock_clc_sdk.v2.API.Call.call_count, 1)
+        # A policy created since the policies were cached is looked up again
+        self.assertEqual(ClcServer._get_anti_affinity_policy_id(mock_clc_sdk, None, 'alias', 'test2'), '222')
+        self.assertEqual(mock_clc_sdk.v2.API.Call.call_count, 2)
+
     @patch.object(clc_server, 'AnsibleModule')
     @patch.object(clc_server, 'clc_sdk')
     def test_get_anti_affinity_policy_id_duplicate_match(self, mock_clc_sdk, mock_ansible_module):
@@ -1320,7 +1438,7 @@ class TestClcServerFunctions(unittest.TestCase):
     @patch.object(ClcServer, '_wait_for_requests')
     @patch.object(ClcServer, '_create_clc_server')
     @patch.object(ClcServer, '_add_alert_policy_to_servers')
-    @patch.object(ClcServer, '_add_public_ip_to_servers')
+    @patch.object(ClcServer, '_queue_public_ips')
     @patch.object(clc_server, 'AnsibleModule')
     @patch.object(clc_server, 'clc_sdk')
     def test_create_servers_w_partial_servers(self, mock_clc_sdk, mock_ansible_module,
@@ -1328,12 +1446,12 @@ class TestClcServerFunctions(unittest.TestCase):
                                               mock_wait_for_requests):
         mock_ansible_module.check_mode = False
         mock_alert_pol.return_value = ['server2']
-        mock_wait_for_requests.return_value = 'success'
+        mock_wait_for_requests.side_effect = _complete_requests
         mock_request = mock.MagicMock()
         mock_server = mock.MagicMock()
         mock_server.id = 'server1'
         mock_request.requests[0].Server.side_effect = [mock_server]
-        mock_public_ip.return_value = [mock_server]
+        mock_public_ip.return_value = [], [mock_server]
         mock_create_server.return_value = mock_request
         under_test = ClcServer(mock_ansible_module)
         server_dict_array, created_server_ids, partial_created_servers_ids, changed = \
@@ -1341,6 +1459,124 @@ class TestClcServerFunctions(unittest.TestCase):
         self.assertEqual(changed, True)
         self.assertEqual(partial_created_servers_ids, ['server1'])
 
+    @patch.object(ClcServer, '_wait_for_requests')
+    @patch.object(ClcServer, '_create_clc_server')
+    @patch.object(ClcServer, '_add_alert_policy_to_servers')
+    @patch.object(ClcServer, '_queue_public_ips')
+    @patch.object(clc_server, 'clc_sdk')
+    def test_create_servers_in_parallel_keeps_order(self, mock_clc_sdk, mock_public_ip, mock_alert_pol,
+                                                    mock_create_server, mock_wait_for_requests):
+        self.module.check_mode = False
+        self.module.params = {'count': 5, 'add_public_ip': False, 'wait': True}
+        mock_public_ip.return_value = [], []
+        mock_wait_for_requests.side_effect = _complete_requests
+        mock_alert_pol.return_value = []
+        mock_requests = []
+        for i in range(5):
+            mock_server = mock.MagicMock()
+            mock_server.id = 'server%d' % i
+            mock_server.data = {'id': mock_server.id}
+            mock_server.details = {'ipAddresses': [{'internal': '1.2.3.%d' % i}]}
+            mock_request = mock.MagicMock()
+            mock_request.requests[0].Server.return_value = mock_server
+            mock_requests.append(mock_request)
+        mock_create_server.side_effect = mock_requests
+        mock_clc_sdk.v2.Server.side_effect = lambda server_id: [
+            r.requests[0].Server() for r in mock_requests if r.requests[0].Server().id == server_id][0]
+        under_test = ClcServer(self.module)
+        server_dict_array, created_server_ids, partial_created_servers_ids, changed = \
+            under_test._create_servers(self.module, mock_clc_sdk)
+        self.assertEqual(mock_create_server.call_count, 5)
+        self.assertEqual(created_server_ids, ['server0', 'server1', 'server2', 'server3', 'server4'])
+        # The builds are waited on together, and the servers are in the order of their builds
+        mock_wait_for_requests.assert_called_once_with(self.module, mock_requests, on_complete=mock.ANY)
+        self.assertEqual(len(server_dict_array), 5)
+        self.assertEqual([d['id'] for d in server_dict_array], created_server_ids)
+        self.assertFalse(self.module.fail_json.called)
+
+    @patch.object(ClcServer, '_wait_for_requests')
+    @patch.object(ClcServer, '_create_clc_server')
+    @patch.object(clc_server, 'clc_sdk')
+    def test_create_servers_in_parallel_reports_first_failure(self, mock_clc_sdk, mock_create_server,
+                                                              mock_wait_for_requests):
+        self.module.check_mode = False
+        self.module.params = {'count': 3}
+
+        def create_server(clc, module, server_params):
+            if mock_create_server.call_count > 1:
+                return module.fail_json(msg='Unable to create the server: %d' % mock_create_server.call_count)
+            return mock.MagicMock()
+
+        mock_create_server.side_effect = create_server
+        under_test = ClcServer(self.module)
+        under_test._create_servers(self.module, mock_clc_sdk)
+        self.assertEqual(mock_create_server.call_count, 3)
+        self.module.fail_json.assert_called_once_with(msg=mock.ANY)
+        self.assertTrue(self.module.fail_json.call_args[1]['msg'].startswith('Unable to create the server'))
+
+    @patch.object(clc_server, 'clc_sdk')
+    def test_create_servers_pipelines_each_server(self, mock_clc_sdk):
+        self.module.check_mode = False
+        self.module.params = {'count': 2, 'add_public_ip': True, 'public_ip_protocol': 'TCP',
+                              'public_ip_ports': [22], 'wait': True, 'max_in_flight': 2}
+        statuses = {'slow': ['notStarted', 'running', 'succeeded'],
+                    'fast': ['succeeded'],
+                    'slow_ip': ['succeeded'],
+                    'fast_ip': ['running', 'succeeded']}
+        polled = []
+
+        def request(name):
+            request = mock.MagicMock()
+
+            def status():
+                polled.append(name)
+                return statuses[name].pop(0) if len(statuses[name]) > 1 else statuses[name][0]
+            request.Status.side_effect = status
+            return mock.MagicMock(requests=[request])
+
+        def build(name):
+            server = mock.MagicMock(id=name, data={'id': name})
+            server.details = {'ipAddresses': [{'internal': '10.0.0.1'}]}
+            server.PublicIPs.return_value.public_ips = []
+            server.PublicIPs.return_value.Add.side_effect = lambda ports: request(name + '_ip')
+            build_request = request(name)
+            build_request.requests[0].Server.return_value = server
+            return build_request
+
+        builds = [build('slow'), build('fast')]
+        with patch.object(clc_server.ClcServer, '_create_clc_server', side_effect=builds), \
+                patch.object(clc_server.clc_common.time, 'sleep'):
+            under_test = clc_server.ClcServer(self.module)
+            server_dict_array, created_server_ids, partial_created_servers_ids, changed = \
+                under_test._create_servers(self.module, mock_clc_sdk)
+
+        self.assertEqual(created_server_ids, ['slow', 'fast'])
+        # The public ip of the fast server is queued as soon as its build completes, and its status
+        # is read in the same sweeps as the build of the slow server
+        self.assertEqual(polled, ['slow', 'fast', 'slow', 'fast_ip', 'slow', 'fast_ip', 'slow_ip'])
+        self.assertFalse(self.module.fail_json.called)
+
+    @patch.object(ClcServer, '_add_alert_policy_to_servers')
+    @patch.object(ClcServer, '_queue_public_ips')
+    @patch.object(clc_server, 'clc_sdk')
+    def test_provision_server_queues_public_ip(self, mock_clc_sdk, mock_public_ip, mock_alert_pol):
+        mock_ip_request = mock.MagicMock()
+        mock_public_ip.return_value = [mock_ip_request], []
+        mock_alert_pol.return_value = []
+        mock_server = mock.MagicMock(id='TEST_SERVER')
+        under_test = ClcServer(self.module)
+        server, ip_requests, is_partial = under_test._provision_server(clc=mock_clc_sdk,
+                                                                       module=self.module,
+                                                                       server=mock_server,
+                                                                       add_public_ip=True,
+                                                                       public_ip_protocol='TCP',
+                                                                       public_ip_ports=[22])
+        self.assertEqual(server, mock_server)
+        self.assertEqual(ip_requests, [mock_ip_request])
+        self.assertFalse(is_partial)
+        self.assertFalse(mock_server.Refresh.called)
+        self.module.debug.assert_called_once_with('Provisioned server TEST_SERVER with 0 API calls')
+
     def test_create_servers_no_change(self):
         params = {
             'state': 'present',
@@ -1418,6 +1654,141 @@ class TestClcServerFunctions(unittest.TestCase):
         self.assertEqual(changed, True)
         self.assertEqual(server_dict_array, 'test_server')
 
+    @patch.object(ClcServer, '_create_servers')
+    @patch.object(ClcServer, '_find_running_servers_by_group')
+    def test_enforce_count_creates_in_waves(self, mock_running_servers, mock_create_servers):
+        mock_running_servers.return_value = ([], [])
+        waves = iter([(['a', 'b'], ['a', 'b'], [], True), (['c', 'd'], ['c'], ['d'], True), (['e'], ['e'], [], True)])
+        mock_create_servers.side_effect = lambda module, clc, override_count: next(waves)
+        self.module.params = {'exact_count': 5, 'count_group': 'test', 'wave_size': 2}
+        under_test = ClcServer(self.module)
+        server_dict_array, changed_server_ids, partial_servers_ids, changed = \
+            under_test._enforce_count(self.module, self.clc)
+        self.assertEqual([c[1]['override_count'] for c in mock_create_servers.call_args_list], [2, 2, 1])
+        self.assertEqual(server_dict_array, ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(changed_server_ids, ['a', 'b', 'c', 'e'])
+        self.assertEqual(partial_servers_ids, ['d'])
+        self.assertTrue(changed)
+
+    @patch.object(ClcServer, '_delete_servers')
+    @patch.object(ClcServer, '_find_running_servers_by_group')
+    def test_enforce_count_deletes_in_waves(self, mock_running_servers, mock_delete_servers):
+        mock_server_list = [mock.MagicMock(id='mockid%d' % i) for i in (3, 1, 4, 2, 5)]
+        mock_running_servers.return_value = (mock_server_list, mock_server_list)
+        mock_delete_servers.side_effect = lambda module, clc, server_ids: (True, [], server_ids)
+        self.module.params = {'exact_count': 2, 'count_group': 'test', 'wave_size': 2}
+        under_test = ClcServer(self.module)
+        server_dict_array, changed_server_ids, partial_servers_ids, changed = \
+            under_test._enforce_count(self.module, self.clc)
+        self.assertEqual([c[0][2] for c in mock_delete_servers.call_args_list],
+                         [['mockid1', 'mockid2'], ['mockid3']])
+        self.assertEqual(changed_server_ids, ['mockid1', 'mockid2', 'mockid3'])
+        self.assertTrue(changed)
+
+    def test_validate_counts_wave_size(self):
+        self.module.params = {'wave_size': 0, 'max_in_flight': 5}
+        ClcServer._validate_counts(self.module)
+        self.module.fail_json.assert_called_once_with(msg='wave_size must be at least 1')
+
+    def _assert_count_group_snapshot_reused(self, group, count_group):
+        mock_group = mock.MagicMock(id='12345', data={'id': '12345', 'name': 'Web'})
+        mock_servers = [mock.MagicMock(id='server1'), mock.MagicMock(id='server2')]
+        with patch.object(clc_server.ClcServer, '_validate_module_params') as mock_validate, \
+                patch.object(clc_server.ClcServer, '_set_clc_credentials_from_env'), \
+                patch.object(clc_server.ClcServer, '_find_datacenter'), \
+                patch.object(clc_server.ClcServer, '_find_group') as mock_find_group, \
+                patch.object(clc_server.ClcServer, '_find_running_servers_by_group') as mock_running_servers, \
+                patch.object(clc_server.ClcServer, '_delete_servers') as mock_delete_servers:
+            mock_validate.return_value = {'state': 'present', 'template': 'TEST_TEMPLATE', 'group': group,
+                                          'count_group': count_group, 'exact_count': 1, 'wait': True}
+            mock_find_group.return_value = mock_group
+            mock_running_servers.return_value = (mock_servers, list(mock_servers))
+            mock_delete_servers.return_value = (True, [], ['server1'])
+
+            under_test = clc_server.ClcServer(self.module)
+            under_test.process_request()
+
+        self.module.exit_json.assert_called_once_with(changed=True,
+                                                      group={'id': '12345', 'name': 'Web', 'servers': ['server2']},
+                                                      servers=[],
+                                                      server_ids=['server1'],
+                                                      partially_created_server_ids=[])
+        # The count group is found and its servers loaded once, for the count and the result
+        self.assertEqual(mock_find_group.call_count, 1)
+        mock_running_servers.assert_called_once_with(mock.ANY, mock.ANY, count_group, group=mock_group)
+        self.assertFalse(mock_group.Servers.called)
+
+    @patch.object(clc_server, 'clc_sdk')
+    def test_process_request_reuses_count_group_snapshot(self, mock_clc_sdk):
+        # The group param was resolved to the id of the group given by name
+        self._assert_count_group_snapshot_reused(group='12345', count_group='Web')
+
+    @patch.object(clc_server, 'clc_sdk')
+    def test_process_request_reuses_count_group_snapshot_by_name(self, mock_clc_sdk):
+        self._assert_count_group_snapshot_reused(group='Web', count_group='Web')
+
+    @patch.object(clc_server, 'clc_sdk')
+    def test_process_request_loads_other_group(self, mock_clc_sdk):
+        count_group = mock.MagicMock(id='12345', data={'id': '12345'})
+        other_group = mock.MagicMock(id='67890', data={'id': '67890'})
+        other_group.Servers().servers_lst = ['server3']
+        mock_servers = [mock.MagicMock(id='server1'), mock.MagicMock(id='server2')]
+        with patch.object(clc_server.ClcServer, '_validate_module_params') as mock_validate, \
+                patch.object(clc_server.ClcServer, '_set_clc_credentials_from_env'), \
+                patch.object(clc_server.ClcServer, '_find_datacenter'), \
+                patch.object(clc_server.ClcServer, '_find_group') as mock_find_group, \
+                patch.object(clc_server.ClcServer, '_find_running_servers_by_group') as mock_running_servers, \
+                patch.object(clc_server.ClcServer, '_delete_servers') as mock_delete_servers:
+            mock_validate.return_value = {'state': 'present', 'template': 'TEST_TEMPLATE', 'group': '67890',
+                                          'count_group': 'Web', 'exact_count': 1, 'wait': True}
+            mock_find_group.side_effect = [count_group, other_group]
+            mock_running_servers.return_value = (mock_servers, list(mock_servers))
+            mock_delete_servers.return_value = (True, [], ['server1'])
+
+            under_test = clc_server.ClcServer(self.module)
+            under_test.process_request()
+
+        self.assertEqual(self.module.exit_json.call_args[1]['group'], {'id': '67890', 'servers': ['server3']})
+        self.assertEqual(mock_find_group.call_count, 2)
+
+    @patch.object(ClcServer, '_delete_servers')
+    @patch.object(ClcServer, '_find_group')
+    @patch.object(ClcServer, '_validate_module_params')
+    @patch.object(ClcServer, '_set_clc_credentials_from_env')
+    @patch.object(clc_server, 'clc_sdk')
+    def test_process_request_wo_return_group(self, mock_clc_sdk, mock_set_clc_creds, mock_validate,
+                                             mock_find_group, mock_delete_servers):
+        mock_validate.return_value = {'state': 'absent', 'server_ids': ['server1'], 'group': '12345',
+                                      'wait': True, 'return_group': False}
+        mock_delete_servers.return_value = (True, [], ['server1'])
+
+        under_test = ClcServer(self.module)
+        under_test.process_request()
+
+        self.module.exit_json.assert_called_once_with(changed=True,
+                                                      group=None,
+                                                      servers=[],
+                                                      server_ids=['server1'],
+                                                      partially_created_server_ids=[])
+        self.assertFalse(mock_find_group.called)
+
+    @patch.object(clc_server, 'clc_sdk')
+    def test_find_running_servers_by_group_loads_servers_concurrently(self, mock_clc_sdk):
+        self.module.params = {}
+        mock_group = mock.MagicMock()
+        mock_servers = mock_group.Servers.return_value
+        mock_servers.servers_lst = ['server1', 'server2', 'server3']
+        mock_servers.Servers.side_effect = lambda: mock_servers._servers
+        mock_clc_sdk.v2.Server.side_effect = lambda id, alias: mock.MagicMock(
+            id=id, status='active', powerState='started' if id != 'server2' else 'stopped')
+
+        servers, running_servers = ClcServer._find_running_servers_by_group(
+            self.module, self.datacenter, 'Default Group', group=mock_group)
+
+        self.assertEqual([s.id for s in servers], ['server1', 'server2', 'server3'])
+        self.assertEqual([s.id for s in running_servers], ['server1', 'server3'])
+        self.assertFalse(self.datacenter.Groups.called)
+
     @patch.object(ClcServer, '_delete_servers')
     @patch.object(ClcServer, '_find_running_servers_by_group')
     def test_enforce_count_max_count(self, mock_running_servers, mock_delete_servers):
@@ -1478,10 +1849,84 @@ class TestClcServerFunctions(unittest.TestCase):
         self.assertEqual(changed, True)
         self.assertEqual(result_server_ids, ['mockid1'])
 
+    @patch.object(clc_server, 'clc_sdk')
+    def test_start_stop_servers_in_parallel(self, mock_clc_sdk):
+        self.module.params = {'state': 'stopped'}
+        self.module.check_mode = False
+        lock = clc_server.clc_common.threading.Lock()
+        calls = {'active': 0, 'max_active': 0}
+
+        def shut_down(server):
+            with lock:
+                calls['active'] += 1
+                calls['max_active'] = max(calls['max_active'], calls['active'])
+            clc_server.clc_common.time.sleep(0.05)
+            with lock:
+                calls['active'] -= 1
+            return server.request
+
+        def get_server(id, alias):
+            server = mock.MagicMock(id=id, data={'id': id})
+            server.powerState = 'stopped' if id == 'server0' else 'started'
+            server.request = mock.MagicMock(requests=[mock.MagicMock()])
+            server.ShutDown.side_effect = lambda: shut_down(server)
+            return server
+
+        mock_clc_sdk.v2.Server.side_effect = get_server
+        mock_servers = mock_clc_sdk.v2.Servers.return_value
+        mock_servers.Servers.side_effect = lambda: mock_servers._servers
+        server_ids = ['server%d' % i for i in range(6)]
+        mock_servers.servers_lst = server_ids
+        with patch.dict('os.environ', {'CLC_API_CONCURRENCY': '2'}), \
+                patch.object(clc_server.ClcServer, '_wait_for_requests') as mock_wait_for_requests:
+            changed, server_dict_array, result_server_ids = \
+                clc_server.ClcServer._start_stop_servers(self.module, mock_clc_sdk, server_ids)
+
+        self.assertTrue(changed)
+        self.assertEqual(calls['max_active'], 2)
+        self.assertEqual(result_server_ids, server_ids)
+        self.assertEqual([d['id'] for d in server_dict_array], server_ids)
+        # The requests are waited on together, in the order of the servers
+        requests = mock_wait_for_requests.call_args[0][1]
+        self.assertEqual(requests, [server.request for server in mock_servers._servers[1:]])
+        self.assertFalse(mock_servers._servers[0].ShutDown.called)
+        self.assertFalse(self.module.fail_json.called)
+
+    @patch.object(clc_server, 'clc_sdk')
+    def test_delete_servers_in_parallel_reports_first_failure(self, mock_clc_sdk):
+        self.module.params = {}
+        self.module.check_mode = False
+        servers = [mock.MagicMock(id='server%d' % i) for i in range(4)]
+        mock_clc_sdk.v2.Server.side_effect = lambda id, alias: servers[int(id[-1])]
+        mock_servers = mock_clc_sdk.v2.Servers.return_value
+        mock_servers.Servers.side_effect = lambda: mock_servers._servers
+        mock_servers.servers_lst = [s.id for s in servers]
+        for server in servers[1:]:
+            server.PowerOn.side_effect = CLCException('Server is gone')
+            server.powerState = 'stopped'
+        servers[0].powerState = 'started'
+
+        with patch.object(clc_server.ClcServer, '_wait_for_requests') as mock_wait_for_requests:
+            changed, server_dict_array, terminated_server_ids = \
+                clc_server.ClcServer._delete_servers(self.module, mock_clc_sdk, [s.id for s in servers])
+            self.assertEqual(terminated_server_ids, ['server0', 'server1', 'server2', 'server3'])
+            mock_wait_for_requests.assert_called_once_with(
+                self.module, [server.Delete.return_value for server in servers])
+
+            self.module.params = {'state': 'started'}
+            clc_server.ClcServer._start_stop_servers(self.module, mock_clc_sdk, [s.id for s in servers])
+        self.module.fail_json.assert_called_once_with(msg='Unable to change power state for server server1')
+        for server in servers[1:]:
+            server.PowerOn.assert_called_once_with()
+
     def test_wait_for_requests_fail(self):
         under_test = ClcServer(self.module)
         mock_request = mock.MagicMock()
         mock_request.WaitUntilComplete.return_value = 1
+        mock_failed_request = mock.MagicMock()
+        mock_failed_request.Status.return_value = 'failed'
+        mock_request.requests = [mock.MagicMock(), mock_failed_request]
+        mock_request.requests[0].Status.return_value = 'succeeded'
         under_test._wait_for_requests(self.module, [mock_request])
         self.module.fail_json.assert_called_with(msg='Unable to process server request')
 
@@ -1507,5 +1952,11 @@ class TestClcServerFunctions(unittest.TestCase):
         self.module.fail_json.assert_called_with(msg='Unable to find account alias. Mock fail message')
 
 
+def _complete_requests(module, request_list, on_complete=None):
+    # Complete every request at once, queueing the next steps of each server
+    if on_complete:
+        on_complete(request_list)
+
+
 if __name__ == '__main__':
     unittest.main()